@@ -47,17 +47,31 @@
 #       Filename.txt    <-- Used for debugging, showing an ASCII representation
 #                           Of what pixels were processed.
 #       Filename.mtl    <-- Contains the Wavefront Material File information.
+#       Filename.stl    <-- Binary STL of the same geometry, only with --stl
+#       Filename.3mf    <-- Every OBJ of the run as one multi-material 3MF, only with --threemf
+#       Filename.glb    <-- Every OBJ of the run as one binary glTF, only with --glb
 
 import argparse                         # 'bout time I added Parsing...
 import os
 import sys
 import math
+import bisect
+import io
+import json
+import struct
+import zipfile
+from array import array
 import png
+import numpy as np
 import random
 import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
 import platform
 from pathlib import Path
 from datetime import datetime
+from fractions import Fraction
+from xml.sax.saxutils import quoteattr
 
 # Application Defaults
 DEBUG = False
@@ -73,7 +87,17 @@ Pixel_W = DEFAULT_PIXEL_WIDTH
 Pixel_H = DEFAULT_PIXEL_HEIGHT
 
 # PNG Data for Image loaded
-pattern = 0
+Loaded_Image = None
+Colour_Palette = None
+Streamed_Image = None
+
+# Reduce the palette to at most this many colours (--maxcolours), 0 keeps every colour
+Max_Colours = 0
+
+# How far a --processcolours/--excludelist colour may be from an image colour and
+# still select it (--colourtolerance), measured as RGB distance or CIE76 delta E
+Colour_Tolerance = 0.0
+Colour_Match_Metric = "rgb"
 pattern_w = 0
 pattern_h = 0
 pattern_meta = 0
@@ -378,6 +402,7 @@ default_mtl_params =    "\nKs 0.000000 0.000000 0.000000\n" \
 # Define the Colour Material Dictionary
 #
 mtl_colour_dict   = {}
+mtl_colour_index  = {}
 mtl_final_list = []
 mtl_current_index = 0
 mtl_filename = ""
@@ -444,6 +469,69 @@ Primitive_Initial_Layer_Depth = 0.0
 # provided in the Process Colour Order list
 Create_Towered_File = False
 
+# Cover each file with large same-colour rectangles (Greedy Meshing)
+Greedy_Meshing = False
+
+# Write each OBJ as one welded mesh with shared vertices and normals (not manifold, see --surface)
+Indexed_Mesh_Output = False
+
+# Write only the exterior faces of each OBJ as a single watertight surface
+Surface_Meshing = False
+
+# Trace the outline of each colour region and extrude it instead of boxes
+Contour_Meshing = False
+
+# The IndexedMeshWriter for the OBJ file currently being written
+Indexed_Mesh = None
+
+# Write a binary STL per OBJ file: None, "also" (next to the OBJ) or "only" (instead of it)
+Stl_Output_Mode = None
+
+# The StlWriter for the file currently being written
+Stl_Mesh = None
+
+# The ThreeMFPackage collecting every OBJ of the run (--3mf), or None
+Model_3MF = None
+
+# The GLBPackage collecting every OBJ of the run (--glb), or None
+Model_GLB = None
+
+# Number of worker processes writing --layered files or row bands (--jobs)
+Worker_Jobs = 1
+
+# Settings read by processFile() and meshRows() (and what they call) that are set at
+# run time, handed to each worker process by workerState(). Per file state (caches,
+# mesh writers, face counters) is built by the worker itself.
+WORKER_SETTINGS = ("CREATE_MTL_FILE", "mtl_filename", "mtl_colour_index", "WORKING_FILENAME", "FILE_COUNTER",
+                   "Colour_Exclusion_List", "Colour_Process_Only_list", "ColoursOnSingleLayerHeight",
+                   "Create_Layered_File", "Create_Towered_File", "Greedy_Meshing", "Surface_Meshing",
+                   "Contour_Meshing", "Indexed_Mesh_Output", "Stl_Output_Mode", "Debug_Txt_File",
+                   "JOINTS_REQUIRED", "Worker_Jobs", "Row_Bands",
+                   "CurrentZOffset", "Primitive_Layer_Depth", "Primitive_Initial_Layer_Depth",
+                   "Primitive_Multipler", "Primitive_Multiplier_Layers",
+                   "Image_MinX", "Image_MaxX", "Image_MinY", "Image_MaxY",
+                   "pattern_w", "pattern_h", "channels", "Pixel_W", "Pixel_H")
+
+# Number of row bands flat files are split into (--bands), 0 for none
+Row_Bands = 0
+
+# Write face indices relative to the end of each primitive (negative OBJ indices)
+Relative_Obj_Indices = False
+
+# Kinds of event found by scanLayerRuns()
+LAYER_RUN = 0
+LAYER_JOINT = 1
+
+# Text already built for create_primitive(), coordinates sit on a small grid and
+# the same normal and face lists are used for every primitive.
+COORDINATE_CACHE_LIMIT = 1 << 16
+Coordinate_Cache = {}
+Normal_Block_Cache = {}
+Face_Template_Cache = {}
+
+# OBJ text is gathered and handed to the file in chunks of this many characters
+OBJ_WRITE_CHUNK = 1 << 20
+
 # Needed for SVG File Creation.
 SVG_HEADER = (
     '<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n'
@@ -457,11 +545,33 @@ SVG_HEADER = (
     '-->\n'
 )
 
-# Contains SVG Data
-SVG_DATA_LIST = []
+# SVG file being written, fragments are streamed to it as they are generated
+SVG_Writer = None
+
+# Define each distinct tile once in <defs> and place it with <use> (--svguse)
+SVG_USE_SYMBOLS = False
+SVG_SYMBOLS = {}
+
+# Merge the pixels of each PNG colour into one <path> (--svgmerge)
+SVG_MERGE_PATHS = False
+
+# Fill the illusion grid from one repeating <pattern> tile instead of a <rect> per cell (--svgpattern)
+SVG_GRID_PATTERN = False
+
+# Path data is in user units (px), scaled so its coordinates can be given in mm
+SVG_PX_PER_MM = 96.0 / 25.4
+
+# Illusion Mask, boolean numpy array of the last illusion pattern (True = dark)
+SVG_ILLUSION_ARRAY = None
+
+# Seed for the illusion patterns (--seed), None for a new pattern every run
+ILLUSION_SEED = None
 
-# Illusion Array Data
-SVG_ILLUSION_ARRAY = []
+# Seeded illusion masks already built, keyed by (width, height, type, streak, seed)
+ILLUSION_MASK_CACHE = {}
+
+# Folder keeping seeded illusion masks as bit-packed .npy files between runs (--illusioncache)
+ILLUSION_CACHE_FOLDER = ""
 
 # Canvas Width/Height
 SVG_CANVAS_WIDTH = 0.0
@@ -519,1833 +629,5819 @@ class CaseInsensitiveArgumentParser(argparse.ArgumentParser):
 
 
 #
-# Create an Array we use for the Optical Illusion Data
+# The decoded PNG, held once in memory as a single contiguous array and
+# shared by every output mode (OBJ, SVG, Parametric).
 #
-def create_array(size :int):
+class PNGImage:
     """
-    Create a square 2D array (size x size) filled with space characters.
+    Hold a decoded 8-bit PNG as a contiguous H x W x C uint8 array.
+
+    Alongside the raw pixel data two derived planes are precomputed once at load
+    time, so consumers never need to slice channel tuples out of a row again:
+
+        opaque (H x W bool)    : True where the pixel is above the alpha cutoff.
+        packed (H x W uint32)  : 24-bit colour as 0xRRGGBB.
 
     Args:
-        size (int): The number of rows and columns for the square array.
+        pixels (np.ndarray): Pixel data shaped (height, width, channels), dtype uint8.
+        alpha_cutoff (int): Alpha values equal or below this are treated as transparent.
 
-    Returns:
-        list[list[str]]: A 2D array (list of lists) filled with ' ' (space) characters.
+    Example:
+        image = PNGImage(pixels, ALPHACUTOFF)
+        if image.opaque[y, x]:
+            colour = image.packed[y, x]
     """
-    return [[' ' for _ in range(size)] for _ in range(size)]
+
+    def __init__(self, pixels, alpha_cutoff=128):
+        self.pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+        self.height, self.width, self.channels = self.pixels.shape
+
+        if self.channels == 4:
+            self.opaque = self.pixels[:, :, 3] > alpha_cutoff
+        else:
+            self.opaque = np.ones((self.height, self.width), dtype=bool)
+
+        if self.channels >= 3:
+            rgb = self.pixels[:, :, :3].astype(np.uint32)
+            self.packed = (rgb[:, :, 0] << 16) | (rgb[:, :, 1] << 8) | rgb[:, :, 2]
+        else:
+            self.packed = self.pixels[:, :, 0].astype(np.uint32)
+
+    def row(self, y):
+        """
+        Return row y as a flat list of channel bytes, wrapping on the image height.
+
+        Args:
+            y (int): Row index; wraps modulo the image height.
+
+        Returns:
+            list[int]: Channel values for the row (width * channels entries).
+        """
+        return self.pixels[int(y % self.height)].ravel().tolist()
+
+    def bounding_box(self):
+        """
+        Find the bounding box of all pixels above the alpha cutoff.
+
+        Returns:
+            tuple: (min_x, min_y, max_x, max_y), or None if every pixel is transparent.
+        """
+        cols = np.flatnonzero(self.opaque.any(axis=0))
+        rows = np.flatnonzero(self.opaque.any(axis=1))
+
+        if cols.size == 0:
+            return None
+
+        return int(cols[0]), int(rows[0]), int(cols[-1]), int(rows[-1])
+
+    def clip(self, bounds):
+        """
+        Treat every pixel outside a bounding box as transparent.
+
+        Args:
+            bounds (tuple): (min_x, min_y, max_x, max_y), inclusive and inside the image.
+        """
+        minx, miny, maxx, maxy = bounds
+        inside = np.zeros_like(self.opaque)
+        inside[miny:maxy + 1, minx:maxx + 1] = True
+        self.opaque &= inside
+
 
 #
-# Plot Circle Points based on each quadrant and opposite faces.
+# Map every unique colour in the image to a dense integer ID once, so later
+# stages work on integer labels rather than hex strings.
 #
-def plot_circle_points(array, cx, cy, x, y):
+class ColourPalette:
     """
-    Plot a symmetrical set of 8 points around the center (cx, cy) to form part of a circle.
+    Integer label image and ID <-> hex <-> material table for a PNGImage.
 
-    This function uses Bresenham's symmetry to mark pixels on all eight octants,
-    updating the given 2D character array in-place.
+    Label 0 is reserved for transparent pixels (at or below the alpha cutoff),
+    opaque colours are numbered from 1 in the order they are first met when
+    scanning the image row by row, the same order `mtl_colour_dict` is built in.
 
-    Args:
-        array (list[list[str]]): The 2D drawing canvas.
-        cx (int): X-coordinate of the circle center.
-        cy (int): Y-coordinate of the circle center.
-        x (int): Offset from center along the X-axis.
-        y (int): Offset from center along the Y-axis.
+    Per-label lookup tables (plain lists or numpy arrays indexed by label) give
+    O(1) answers for material index, hex code or processing rules, replacing
+    the `list(...).index()` scans previously done for every pixel.
 
-    Returns:
-        None. Modifies the array in-place.
+    A palette can also be built from a colour histogram alone with
+    `ColourPalette.from_histogram()`, for streamed images that are never held in
+    memory; rows are then labelled one at a time with `labels_for()`.
+
+    Args:
+        image (PNGImage): The decoded image to label.
+
+    Attributes:
+        labels (np.ndarray): H x W label image (uint16, or uint32 for huge palettes),
+                             None when built from a histogram.
+        colours (np.ndarray): Packed 0xRRGGBB value for each label (index 0 unused).
+        counts (np.ndarray): Number of pixels carrying each label (index 0 unused).
+        hex (list[str]): Hex colour code for each label, "#000000" for label 0.
+        ids (dict): Hex colour code -> label.
+        materials (list[int]): Material index for each label, -1 if unassigned.
     """
-    max_y = len(array)
-    max_x = len(array[0])
 
-    cx = int(cx)
-    cy = int(cy)
-    x = int(x)
-    y= int(y)
+    TRANSPARENT = 0
+
+    def __init__(self, image):
+        colours = image.packed[image.opaque]
+        unique, first, inverse, counts = np.unique(colours, return_index=True,
+                                                   return_inverse=True, return_counts=True)
+
+        # Number colours by first appearance to match the row by row scan order
+        order = np.argsort(first, kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(1, len(order) + 1)
+
+        self._set_colours(unique[order], counts[order])
+
+        self.labels = np.zeros(image.opaque.shape, dtype=self.dtype)
+        self.labels[image.opaque] = rank[inverse.reshape(-1)]
+
+    @classmethod
+    def from_histogram(cls, colours, counts):
+        """
+        Build a palette without a label image from colours listed in first-seen order.
+
+        Args:
+            colours (list[int]): Packed 0xRRGGBB colours, in the order first seen.
+            counts (list[int]): Pixel count for each colour.
+
+        Returns:
+            ColourPalette: Palette with `labels` set to None.
+        """
+        palette = cls.__new__(cls)
+        palette._set_colours(np.asarray(colours, dtype=np.uint32), np.asarray(counts, dtype=np.int64))
+        palette.labels = None
+        return palette
+
+    def _set_colours(self, colours, counts):
+        self.colours = np.concatenate(([0], colours)).astype(np.uint32)
+        self.counts = np.concatenate(([0], counts)).astype(np.int64)
+        self.hex = ["#{:06x}".format(c) for c in self.colours.tolist()]
+        self.ids = {code: label for label, code in enumerate(self.hex) if label}
+        self.materials = [-1] * len(self.hex)
+        self.dtype = np.uint16 if len(self.hex) <= np.iinfo(np.uint16).max else np.uint32
+
+        # Sorted copy of the colours used to label rows with a binary search
+        self._sorted = np.argsort(self.colours[1:], kind='stable')
+        self._sorted_colours = self.colours[1:][self._sorted]
+
+    def __len__(self):
+        return len(self.hex) - 1
+
+    def quantize(self, max_colours):
+        """
+        Reduce the palette to at most max_colours colours by median cut.
+
+        The colours are split, pixel count weighted, at the median of their widest
+        channel until there are max_colours boxes. Each box becomes its count
+        weighted mean colour, numbered by the first label it takes in, so colours
+        keep their first-seen order. The label image (or, for a histogram palette,
+        the lookup used by labels_for()) is remapped to the new labels.
+
+        Args:
+            max_colours (int): Number of colours to keep.
+
+        Returns:
+            int: Number of colours before quantizing.
+        """
+        before = len(self)
+        if before <= max_colours:
+            return before
+
+        colours = self.colours[1:]
+        counts = self.counts[1:].astype(np.float64)
+        rgb = np.stack(((colours >> 16) & 0xFF, (colours >> 8) & 0xFF, colours & 0xFF), axis=1).astype(np.int64)
+
+        boxes = [np.arange(before)]
+
+        while len(boxes) < max_colours:
+            spans = [np.ptp(rgb[box], axis=0) if len(box) > 1 else np.zeros(3, dtype=np.int64) for box in boxes]
+            widest = int(np.argmax([span.max() for span in spans]))
+            if spans[widest].max() == 0:
+                break
+
+            box = boxes[widest]
+            channel = int(np.argmax(spans[widest]))
+            box = box[np.argsort(rgb[box, channel], kind='stable')]
+
+            # Split at the weighted median, keeping equal values on the same side
+            values = rgb[box, channel]
+            half = np.searchsorted(np.cumsum(counts[box]), counts[box].sum() / 2)
+            cut = np.searchsorted(values, values[half], side='right')
+            if cut == len(box):
+                cut = np.searchsorted(values, values[half], side='left')
+
+            boxes[widest:widest + 1] = [box[:cut], box[cut:]]
+
+        group = np.empty(before, dtype=np.int64)
+        for index, box in enumerate(boxes):
+            group[box] = index
+
+        totals = np.bincount(group, weights=counts)
+        mean = np.stack([np.bincount(group, weights=counts * rgb[:, channel]) for channel in range(3)], axis=1)
+        mean = np.rint(mean / totals[:, None]).astype(np.uint32)
+        packed = (mean[:, 0] << 16) | (mean[:, 1] << 8) | mean[:, 2]
+
+        # Boxes rounding to the same colour are one colour, numbered by first label
+        unique, inverse = np.unique(packed, return_inverse=True)
+        first = np.full(len(unique), before)
+        np.minimum.at(first, inverse[group], np.arange(before))
+        order = np.argsort(first, kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(1, len(order) + 1)
+
+        remap = np.zeros(before + 1, dtype=np.int64)
+        remap[1:] = rank[inverse[group]]
+
+        sorted_colours, sorted_labels = self._sorted_colours, self._sorted
+        self._set_colours(unique[order], np.bincount(remap[1:], weights=self.counts[1:], minlength=len(order) + 1)[1:])
+
+        if self.labels is not None:
+            self.labels = remap[self.labels].astype(self.dtype)
+
+        # Rows are still labelled from their original colours
+        self._sorted_colours = sorted_colours
+        self._sorted = remap[sorted_labels + 1] - 1
+
+        return before
+
+    def row(self, y):
+        """
+        Return the labels of row y as a list, wrapping on the image height.
+        """
+        return self.labels[int(y % self.labels.shape[0])].tolist()
+
+    def labels_for(self, packed, opaque):
+        """
+        Label an array of packed colours, e.g. a single streamed row.
+
+        Args:
+            packed (np.ndarray): Packed 0xRRGGBB colours.
+            opaque (np.ndarray): Matching alpha mask; False entries get label 0.
+
+        Returns:
+            np.ndarray: Labels with the same shape as packed.
+        """
+        if not len(self):
+            return np.zeros(packed.shape, dtype=self.dtype)
+
+        index = np.searchsorted(self._sorted_colours, packed)
+        index = np.minimum(index, len(self._sorted_colours) - 1)
+        labels = (self._sorted[index] + 1).astype(self.dtype)
+        labels[~opaque] = self.TRANSPARENT
+        return labels
+
+    def id_of(self, ColourCode):
+        """
+        Return the label for a hex colour code, or -1 if the colour is not in the image.
+        """
+        return self.ids.get(ColourCode.lower(), -1)
+
+    def mask(self, codes):
+        """
+        Return a boolean array indexed by label, True for labels whose hex code is in codes.
+        """
+        mask = np.zeros(len(self.hex), dtype=bool)
+        labels = [self.ids[code] for code in codes if code in self.ids]
+        mask[labels] = True
+        return mask
+
+    def nearest(self, packed, tolerance, metric="rgb"):
+        """
+        Find the closest palette colour to each of a list of colours.
+
+        Args:
+            packed (list[int]): Packed 0xRRGGBB colours to match.
+            tolerance (float): Largest distance accepted as a match.
+            metric (str): "rgb" for Euclidean RGB distance (0-441), "deltae" for
+                          CIE76 delta E in L*a*b* space (2.3 is a just noticeable difference).
+
+        Returns:
+            tuple: (labels, distances) arrays, one entry per colour. Labels are 0 where
+                   no palette colour lies within tolerance.
+        """
+        requested = np.asarray(packed, dtype=np.uint32)
+        if not len(self) or not len(requested):
+            return np.zeros(len(requested), dtype=np.int64), np.full(len(requested), np.inf)
+
+        def channels(colours):
+            return np.stack(((colours >> 16) & 0xFF, (colours >> 8) & 0xFF, colours & 0xFF), axis=1).astype(np.float64)
+
+        ours, theirs = channels(self.colours[1:]), channels(requested)
+        if metric == "deltae":
+            ours, theirs = self._lab(ours), self._lab(theirs)
+
+        distances = np.sqrt(((theirs[:, None, :] - ours[None, :, :]) ** 2).sum(axis=2))
+        closest = np.argmin(distances, axis=1)
+        distance = distances[np.arange(len(requested)), closest]
+
+        labels = np.where(distance <= tolerance, closest + 1, 0)
+        return labels, distance
+
+    @staticmethod
+    def _lab(rgb):
+        """
+        Convert an N x 3 array of 8-bit sRGB colours to CIE L*a*b* (D65 white).
+        """
+        srgb = rgb / 255.0
+        linear = np.where(srgb <= 0.04045, srgb / 12.92, ((srgb + 0.055) / 1.055) ** 2.4)
+
+        xyz = linear @ np.array([[0.4124564, 0.3575761, 0.1804375],
+                                 [0.2126729, 0.7151522, 0.0721750],
+                                 [0.0193339, 0.1191920, 0.9503041]]).T
+        xyz /= np.array([0.95047, 1.0, 1.08883])
+
+        delta = 6.0 / 29.0
+        f = np.where(xyz > delta ** 3, np.cbrt(xyz), xyz / (3 * delta ** 2) + 4.0 / 29.0)
+
+        return np.stack((116.0 * f[:, 1] - 16.0, 500.0 * (f[:, 0] - f[:, 1]), 200.0 * (f[:, 1] - f[:, 2])), axis=1)
+
+    def rgb(self, label):
+        """
+        Return the (r, g, b) tuple for a label.
+        """
+        c = int(self.colours[label])
+        return (c >> 16) & 0xFF, (c >> 8) & 0xFF, c & 0xFF
+
+    def assign_materials(self, material_order):
+        """
+        Record the material index of every label.
+
+        Args:
+            material_order (dict): Mapping of hex colour code -> material index.
+        """
+        self.materials = [material_order.get(code, -1) for code in self.hex]
+        self.materials[self.TRANSPARENT] = -1
+
+    def lookup(self, rule):
+        """
+        Evaluate a rule once per colour and return the results as a per-label list.
+
+        Args:
+            rule (callable): Called with the hex code of each opaque colour.
+
+        Returns:
+            list: rule(hex) for each label, with None for the transparent label.
+        """
+        return [None] + [rule(code) for code in self.hex[1:]]
 
-    # Bresenhams Opposite points...
-    if 0 <= cx + x < max_x and 0 <= cy + y < max_y:
-        array[cy + y][cx + x] = '*'
-    if 0 <= cx - x < max_x and 0 <= cy + y < max_y:
-        array[cy + y][cx - x] = '*'
-    if 0 <= cx + x < max_x and 0 <= cy - y < max_y:
-        array[cy - y][cx + x] = '*'
-    if 0 <= cx - x < max_x and 0 <= cy - y < max_y:
-        array[cy - y][cx - x] = '*'
-    if 0 <= cx + y < max_x and 0 <= cy + x < max_y:
-        array[cy + x][cx + y] = '*'
-    if 0 <= cx - y < max_x and 0 <= cy + x < max_y:
-        array[cy + x][cx - y] = '*'
-    if 0 <= cx + y < max_x and 0 <= cy - x < max_y:
-        array[cy - x][cx + y] = '*'
-    if 0 <= cx - y < max_x and 0 <= cy - x < max_y:
-        array[cy - x][cx - y] = '*'
 
 #
-# Use Bresenhams Algorithm to create the points
+# Decode a PNG one row at a time, for images too large to hold in memory.
 #
-def draw_circle(array, center_x, center_y, radius):
+class PNGRowStream:
     """
-    Draw a full circle on a 2D character array using Bresenham's circle algorithm.
+    Lazily decode the rows of an 8-bit PNG file.
 
-    Args:
-        array (list[list[str]]): The 2D canvas to draw the circle on (modified in-place).
-        center_x (int): X-coordinate of the circle's center.
-        center_y (int): Y-coordinate of the circle's center.
-        radius (int): Radius of the circle in array units.
+    Nothing but the current row is held in memory, so memory use is bounded by the
+    image width rather than its area. Each call to `rows()` re-opens the file and
+    starts decoding from the top again.
 
-    Returns:
-        None. Modifies the array in-place by plotting '*' at appropriate points.
+    Note:
+        pypng has to decode interlaced PNGs in full before returning any rows,
+        so save very large images non-interlaced to get the benefit of streaming.
+
+    Args:
+        filename (str): Path to the PNG file.
+        alpha_cutoff (int): Alpha values equal or below this are treated as transparent.
     """
-    x = radius
-    y = 0
-    p = 1 - radius  # Initial decision parameter
 
-    # Draw circle
-    plot_circle_points(array, center_x, center_y, x, y)
+    def __init__(self, filename, alpha_cutoff=128):
+        self.filename = filename
+        self.alpha_cutoff = alpha_cutoff
+        self.bounds = None
+
+        with open(filename, 'rb') as fp:
+            reader = png.Reader(file=fp)
+            reader.preamble()
+            self.width = reader.width
+            self.height = reader.height
+            self.meta = {'planes': reader.planes, 'alpha': reader.alpha,
+                         'bitdepth': reader.bitdepth, 'interlace': reader.interlace,
+                         'greyscale': reader.greyscale, 'size': (reader.width, reader.height)}
+
+    def clip(self, bounds):
+        """
+        Treat every pixel outside a bounding box as transparent, as PNGImage.clip().
+
+        Args:
+            bounds (tuple): (min_x, min_y, max_x, max_y), inclusive and inside the image.
+        """
+        self.bounds = bounds
+
+    def rows(self):
+        """
+        Yield (packed, opaque) arrays for each row, top to bottom.
+
+        Yields:
+            tuple: (np.ndarray uint32 packed colours, np.ndarray bool alpha mask)
+        """
+        planes = self.meta['planes']
+
+        if self.bounds:
+            minx, miny, maxx, maxy = self.bounds
+            inside = np.zeros(self.width, dtype=bool)
+            inside[minx:maxx + 1] = True
+
+        with open(self.filename, 'rb') as fp:
+            _, _, rows, _ = png.Reader(file=fp).read()
+
+            for y, row in enumerate(rows):
+                image = PNGImage(np.asarray(row, dtype=np.uint8).reshape(1, self.width, planes),
+                                 self.alpha_cutoff)
+                opaque = image.opaque[0]
+
+                if self.bounds:
+                    opaque &= inside if miny <= y <= maxy else False
+
+                yield image.packed[0], opaque
 
-    while x > y:
-        y += 1
-        if p <= 0:
-            p += 2 * y + 1
-        else:
-            x -= 1
-            p += 2 * y - 2 * x + 1
-        plot_circle_points(array, center_x, center_y, x, y)
 
-def draw_diagonals_in_array(width :int, height: int):
+#
+# Two row sliding window over a streamed PNG, giving processFile() the current
+# row and the next row (needed for joint detection) as palette labels.
+#
+class LabelRowWindow:
     """
-    Populate a global SVG_ILLUSION_ARRAY with randomly staggered diagonal lines (*) for use in pixel-based optical illusions.
+    Serve palette labelled rows from a PNGRowStream, keeping only two rows in memory.
 
-    The pattern is generated across a 2D square array, simulating visual streaks
-    that create depth illusions when layered behind or around foreground objects.
+    Rows must be requested in increasing order, which is how processFile() walks
+    the image. Asking for the row after the last one (processFile() wraps to row 0)
+    returns a fully transparent row.
 
     Args:
-        width (int): Width of the array/grid in pixels.
-        height (int): Height of the array/grid in pixels.
-
-    Returns:
-        None. Modifies global SVG_ILLUSION_ARRAY in-place.
+        stream (PNGRowStream): The streamed image.
+        palette (ColourPalette): Palette used to label each row.
     """
-    global SVG_ILLUSION_ARRAY
 
-    size = max(width, height)
-    SVG_ILLUSION_ARRAY = create_array(size)
+    def __init__(self, stream, palette):
+        self.height = stream.height
+        self.palette = palette
+        self._rows = enumerate(stream.rows())
+        self._window = {}
+        self._blank = [ColourPalette.TRANSPARENT] * stream.width
 
-    max_range = width + height + 1
-    max_y = len(SVG_ILLUSION_ARRAY)
-    max_x = len(SVG_ILLUSION_ARRAY[0])
+    def row(self, y):
+        """
+        Return the labels of row y as a list.
+        """
+        y = int(y)
+        if y >= self.height:
+            return self._blank
 
-    line_streak = none_line_streak = 0
+        while y not in self._window:
+            index, (packed, opaque) = next(self._rows)
 
-    for x in range(max_range):
-        start_y = max(0, x - width)
-        range_x = min(x, width)
+            # Rows above the window are decoded but never labelled
+            if index < y - 1:
+                continue
 
-        # Determine if a diagonal line should be drawn
-        rand = random.randint(0, 10)
-        draw_line = False
-        
-        if rand > 5:
-            line_streak, none_line_streak = line_streak + 1, 0
-            draw_line = line_streak < 2
-        else:
-            none_line_streak, line_streak = none_line_streak + 1, 0
-            draw_line = none_line_streak > 2
-            if draw_line:
-                none_line_streak = 0
-        
-        if draw_line:
-            # Lets do the work.
-            for xpos in range(range_x, -1, -1):
-                # Check if we're in range of the grid.
-                if xpos <= width and start_y <= height:
-                    if 0 <= xpos < max_x and 0 <= start_y < max_y:
-                        SVG_ILLUSION_ARRAY[start_y][xpos] = '*'
-                                
-                start_y += 1
+            self._window[index] = self.palette.labels_for(packed, opaque).tolist()
 
-#    print_array(SVG_ILLUSION_ARRAY)
+            # Only the current and next rows are needed
+            for old in [key for key in self._window if key < index - 1]:
+                del self._window[old]
+
+        return self._window[y]
 
 
 #
-# Debugging purposes to see the array...
+# Greedy meshing, merge the pixels of a file into as few same-colour rectangles
+# as possible so a solid block of colour becomes one primitive, not one per row.
 #
-def print_array(array):
+class GreedyRectangleMesher:
     """
-    Print a 2D character array row by row as a visual grid.
+    Merge the horizontal runs found by processFile() into large same-colour rectangles.
 
-    Args:
-        array (list[list[str]]): The array to print. Each sublist represents a row.
+    Runs only mark their cells on the file's (gutter adjusted) grid. Once the whole
+    file is known the grid is covered greedily: from the first uncovered cell a
+    rectangle grows along the row over cells of the same material and height
+    multiplier, then across the following rows for as long as the whole span
+    matches. The cover is made along rows and along columns and the smaller one
+    kept. Rows of different run layout still merge where they share a block of
+    colour. Gutter rows and columns are empty cells, so sprites never merge.
 
-    Returns:
-        None. Output is sent directly to standard output.
+    A greedy cover is not a minimum one. Large areas of one colour shrink to a
+    handful of boxes, while speckled or dithered pixel art saves much less. The
+    grid is held until finish(), one cell per pixel.
+
+    Example:
+        mesher = GreedyRectangleMesher()
+        mesher.add(x, y, width, material_index, multiplier)
+        fp_obj.write(mesher.end_row())
+        ...
+        fp_obj.write(mesher.finish())
     """
-    for row in array:
-        print(''.join(row))
+
+    def __init__(self):
+        self._rows = {}
+        self._keys = {}
+        self.runs = 0
+        self.primitives = 0
+
+    def add(self, x, y, width, material_index, multiplier):
+        """
+        Add a run of width pixels starting at (x, y).
+        """
+        key = self._keys.setdefault((material_index, multiplier), len(self._keys))
+        self._rows.setdefault(y, []).append((x, width, key))
+
+        self.runs += 1
+
+    def end_row(self):
+        """
+        Nothing is written until the whole file is known.
+        """
+        return ""
+
+    def finish(self):
+        """
+        Cover the grid with rectangles and return their OBJ data.
+        """
+        if not self._rows:
+            return ""
+
+        top = min(self._rows)
+        height = max(self._rows) - top + 1
+        width = max(x + run for runs in self._rows.values() for x, run, _ in runs)
+
+        grid = np.full((height, width), -1, dtype=np.int32)
+        for y, runs in self._rows.items():
+            for x, run, key in runs:
+                grid[y - top, x:x + run] = key
+
+        # Cover along rows and along columns, keeping whichever needs fewer rectangles
+        rectangles = self._cover(grid.tolist())
+        columns = self._cover(grid.T.tolist())
+
+        if len(columns) < len(rectangles):
+            rectangles = [(y, x, rows, width, key) for x, y, width, rows, key in columns]
+
+        keys = {key: material for material, key in self._keys.items()}
+        data = []
+
+        for x, y, width, rows, key in rectangles:
+            material_index, multiplier = keys[key]
+            data.append(create_primitive(x, top + y, width, rows, cube_vertices, cube_faces, cube_normals,
+                                         False, material_index, multiplier))
+
+        self.primitives += len(rectangles)
+        self._rows = {}
+
+        return "".join(data)
+
+    @staticmethod
+    def _cover(cells):
+        """
+        Greedily cover the cells of a grid (lists of keys, -1 for empty) with rectangles.
+
+        From the first uncovered cell in row order a rectangle grows right over cells
+        of the same key, then down for as long as the whole span below matches.
+
+        Returns:
+            list: (x, y, width, height, key) for each rectangle.
+        """
+        height = len(cells)
+        width = len(cells[0])
+        rectangles = []
+
+        for y in range(height):
+            row = cells[y]
+            x = 0
+
+            while x < width:
+                key = row[x]
+                if key < 0:
+                    x += 1
+                    continue
+
+                x1 = x + 1
+                while x1 < width and row[x1] == key:
+                    x1 += 1
+
+                y1 = y + 1
+                while y1 < height and cells[y1][x:x1] == [key] * (x1 - x):
+                    y1 += 1
+
+                # Covered cells are cleared so later rectangles skip them
+                for covered in range(y, y1):
+                    cells[covered][x:x1] = [-1] * (x1 - x)
+
+                rectangles.append((x, y, x1 - x, y1 - y, key))
+                x = x1
+
+        return rectangles
+
+    def summary(self):
+        """
+        Return a log line describing how many runs were merged.
+        """
+        return f"Greedy Meshing merged {self.runs} runs into {self.primitives} rectangles"
+
 
 #
-# Write the Final SVG File from Data in the List.
+# Hidden face culling, treat the runs of a file as columns of voxels standing
+# on CurrentZOffset and write only the outside surface as one welded mesh.
 #
-# TODO: Refactor to accept canvas size and data as parameters for testability
-# TODO: Externalise header and root <svg> attributes for templating flexibility
-def svg_savefile(savename):
+class VoxelSurfaceMesher:
     """
-    Save the SVG content to a file using current canvas dimensions and data.
+    Collect the runs found by processFile() and write them as a single closed surface.
 
-    This function uses global canvas size values and the accumulated SVG output
-    list, and writes the final SVG file to disk with proper error handling.
+    Every pixel becomes a column from CurrentZOffset up to its own height, giving a
+    heightfield over the (gutter adjusted) pixel grid. Only exterior faces are written:
 
-    Args:
-        savename (str): Output path and filename for the SVG file.
+        - Tops and bottoms, greedily merged into rectangles of one height and material.
+        - Walls where a column is taller than its neighbour, covering only the exposed
+          part, joined along straight edges.
 
-    Returns:
-        None. Writes the file to disk.
+    Internal walls between pixels and runs are never produced, so the triangle count
+    follows the outline of the artwork rather than its area.
 
-    Globals:
-        SVG_CANVAS_WIDTH (float): Width of the canvas in mm.
-        SVG_CANVAS_HEIGHT (float): Height of the canvas in mm.
-        SVG_DATA_LIST (list[str]): List of SVG fragments to embed in the final file.
-        SVG_HEADER (str): XML + DOCTYPE declaration.
-        DEBUG (bool): Controls detailed error output.
+    The mesh is watertight. Wherever a vertex lies part way along another face's
+    edge (a T-junction), that face gains the vertex too. Where columns only touch
+    diagonally at a height, each gets its own copy of the corner vertex so every
+    edge is shared by exactly two triangles.
+
+    Vertices, normals and faces use absolute OBJ indices following anything already
+    written by create_primitive() (e.g. joints), so the two can share a file.
+
+    Args:
+        name (str): Object name written on the `o` line.
     """
-    global SVG_CANVAS_WIDTH
-    global SVG_CANVAS_HEIGHT
 
-    try:
-        output_path = Path(savename).resolve()
+    # Outward normals in grid space: +x, -x, +y, -y, +z, -z
+    GRID_NORMALS = ((1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1))
+
+    def __init__(self, name):
+        self.name = name
+        self._cells = {}
+        self._grid = {}
+        self._points = {}
+        self.runs = 0
+        self.primitives = 0
+
+    def add(self, x, y, width, material_index, multiplier):
+        """
+        Add a run of width pixels starting at (x, y).
+        """
+        for cx in range(x, x + width):
+            self._cells[(cx, y)] = (material_index, multiplier)
+
+        self.runs += 1
+
+    def end_row(self):
+        """
+        Nothing is written until the whole surface is known.
+        """
+        return ""
+
+    def summary(self):
+        """
+        Return a log line describing the surface written.
+        """
+        return f"Surface Meshing replaced {self.runs} runs with {self.primitives} exterior triangles"
+
+    def finish(self):
+        """
+        Build the surface and return it as OBJ data.
+
+        Returns:
+            str: Vertex, normal, material and face lines for the whole surface.
+
+        Globals:
+            CurrentZOffset, Primitive_Layer_Depth (float): Z of the base and layer depth.
+        """
+        if not self._cells:
+            return ""
+
+        # Same Z arithmetic as create_primitive() so surfaces line up with cubes
+        depth = 10.0 * (Primitive_Layer_Depth / 10)
+        bottom = 0.0 + CurrentZOffset
+
+        for position, (material_index, multiplier) in self._cells.items():
+            top = (multiplier * depth if multiplier != 1.0 else depth) + CurrentZOffset
+            self._grid[position] = (material_index, top)
+
+        polygons = []
+
+        # Tops and bottoms of the columns
+        for x0, y0, x1, y1, (material_index, top) in self._rectangles(lambda cell: cell):
+            polygons.append(self._rectangle(x0, y0, x1, y1, top, material_index, 4))
+
+        for x0, y0, x1, y1, material_index in self._rectangles(lambda cell: cell[0]):
+            polygons.append(self._rectangle(x0, y0, x1, y1, bottom, material_index, 5))
+
+        # Walls, only the part of a column standing above its neighbour. Unit
+        # walls on the same line with the same extent and material are joined.
+        strips = {}
+
+        for (x, y), (material_index, top) in self._grid.items():
+            for normal, (dx, dy) in enumerate(((1, 0), (-1, 0), (0, 1), (0, -1))):
+                neighbour = self._grid.get((x + dx, y + dy))
+                low = bottom if neighbour is None else neighbour[1]
+
+                if low >= top:
+                    continue
+
+                if dx:
+                    line, position = x + max(dx, 0), y
+                else:
+                    line, position = y + max(dy, 0), x
+
+                strips.setdefault((normal, line, low, top, material_index), []).append(position)
+
+        for (normal, line, low, top, material_index), positions in strips.items():
+            positions.sort()
+            start = positions[0]
+
+            for index, position in enumerate(positions):
+                if index + 1 == len(positions) or positions[index + 1] != position + 1:
+                    polygons.append(self._wall(normal, line, start, position + 1, low, top, material_index))
+                    if index + 1 < len(positions):
+                        start = positions[index + 1]
+
+        return self._write(polygons)
+
+    def _rectangles(self, key):
+        """
+        Greedily merge cells sharing key(cell) into rectangles (x0, y0, x1, y1, key).
+        """
+        rows = {}
+        for x, y in self._grid:
+            rows.setdefault(y, []).append(x)
+
+        open_rectangles = {}
+        rectangles = []
+
+        for y in sorted(rows):
+            runs = []
+            for x in sorted(rows[y]):
+                k = key(self._grid[(x, y)])
+                if runs and runs[-1][1] == x and runs[-1][2] == k:
+                    runs[-1][1] = x + 1
+                else:
+                    runs.append([x, x + 1, k])
+
+            # A rectangle only grows into a row directly below it, rows skipped
+            # by a gutter or an empty row close it
+            continued = {}
+            for x0, x1, k in runs:
+                top, end = open_rectangles.get((x0, x1, k), (y, None))
+                if end == y:
+                    del open_rectangles[(x0, x1, k)]
+                    continued[(x0, x1, k)] = (top, y + 1)
+                else:
+                    continued[(x0, x1, k)] = (y, y + 1)
+
+            rectangles.extend((x0, top, x1, end, k) for (x0, x1, k), (top, end) in open_rectangles.items())
+            open_rectangles = continued
+
+        rectangles.extend((x0, top, x1, end, k) for (x0, x1, k), (top, end) in open_rectangles.items())
+
+        return rectangles
+
+    def _vertex(self, cx, cy, z, row):
+        """
+        Return the key of corner (cx, cy) at height z, as seen by a column on this row.
+
+        Columns standing at least z high that only meet diagonally at this corner each
+        get their own copy of it: 1 for the column above the corner, 2 for the one below.
+        """
+        present = []
+        for position in ((cx - 1, cy - 1), (cx, cy), (cx, cy - 1), (cx - 1, cy)):
+            cell = self._grid.get(position)
+            present.append(cell is not None and cell[1] >= z)
+
+        nw, se, ne, sw = present
+        side = 0
+        if nw == se and ne == sw and nw != ne:
+            side = 1 if row == cy - 1 else 2
+
+        return (cx, cy, z, side)
+
+    def _used(self, vertex):
+        return vertex[2:] in self._points.get(vertex[:2], ())
+
+    def _use(self, vertex):
+        self._points.setdefault(vertex[:2], set()).add(vertex[2:])
+
+    def _rectangle(self, x0, y0, x1, y1, z, material_index, normal):
+        """
+        Record the corners of a top or bottom rectangle and return its polygon.
+        """
+        for cx, cy in ((x0, y0), (x1, y0), (x1, y1), (x0, y1)):
+            self._use(self._vertex(cx, cy, z, cy - 1 if y0 <= cy - 1 < y1 else cy))
+
+        return ('rectangle', (x0, y0, x1, y1), z, z, material_index, normal)
+
+    def _wall(self, normal, line, start, end, low, high, material_index):
+        """
+        Record the end corners of a wall from start to end along a grid line and return its polygon.
+        """
+        # Corners from A to B, anticlockwise seen from outside
+        if normal == 0:
+            corners = [(line, t) for t in range(start, end + 1)]
+        elif normal == 1:
+            corners = [(line, t) for t in range(end, start - 1, -1)]
+        elif normal == 2:
+            corners = [(t, line) for t in range(end, start - 1, -1)]
+        else:
+            corners = [(t, line) for t in range(start, end + 1)]
 
-        with output_path.open('w', encoding="utf-8") as fp:
-            fp.write(SVG_HEADER)
-            fp.write(f'<svg width="{SVG_CANVAS_WIDTH:.2f}mm" height="{SVG_CANVAS_HEIGHT:.2f}mm" xmlns="http://www.w3.org/2000/svg">\n')
-            fp.write(''.join(SVG_DATA_LIST))
-            fp.write('</svg>\n')
+        # Rows of the columns the wall belongs to
+        if normal < 2:
+            rows = (start, end)
+        else:
+            rows = (line - 1, line) if normal == 2 else (line, line + 1)
 
-        print(f"\n✅ Written file: {output_path}")
+        corners = [(cx, cy, cy - 1 if rows[0] <= cy - 1 < rows[1] else cy) for cx, cy in corners]
 
-    except PermissionError:
-        print(f"❌ Permission denied when writing to {savename}. Is it open in another application?")
-        if DEBUG:
-            print('Error on line {}'.format(sys.exc_info()[-1].tb_lineno), type(error).__name__, error)
-    except IOError as error:
-        print(f"❌ File I/O error: {error}")
-        if DEBUG:
-            print('Error on line {}'.format(sys.exc_info()[-1].tb_lineno), type(error).__name__, error)
-    except Exception as error:
-        print(f"❌ Unexpected error: {error}")
-        if DEBUG:
-            print('Error on line {}'.format(sys.exc_info()[-1].tb_lineno), type(error).__name__, error)
+        for cx, cy, row in (corners[0], corners[-1]):
+            self._use(self._vertex(cx, cy, low, row))
+            self._use(self._vertex(cx, cy, high, row))
+
+        return ('wall', corners, low, high, material_index, normal)
+
+    def _outline(self, polygon):
+        """
+        Return the outline of a polygon as vertex keys, anticlockwise seen from
+        outside, including every vertex lying on its edges.
+        """
+        kind, shape, low, high, material_index, normal = polygon
+
+        if kind == 'wall':
+            a, b = shape[0], shape[-1]
+            heights = sorted({z for z, _ in self._points[a[:2]] if low < z < high} |
+                             {z for z, _ in self._points[b[:2]] if low < z < high})
+
+            outline = [self._vertex(cx, cy, low, row) for cx, cy, row in shape]
+            outline += [self._vertex(b[0], b[1], z, b[2]) for z in heights]
+            outline += [self._vertex(cx, cy, high, row) for cx, cy, row in reversed(shape)]
+            outline += [self._vertex(a[0], a[1], z, a[2]) for z in reversed(heights)]
+
+        else:
+            x0, y0, x1, y1 = shape
+            perimeter = [(x, y0) for x in range(x0, x1)] + [(x1, y) for y in range(y0, y1)] + \
+                        [(x, y1) for x in range(x1, x0, -1)] + [(x0, y) for y in range(y1, y0, -1)]
+
+            outline = [self._vertex(cx, cy, low, cy - 1 if y0 <= cy - 1 < y1 else cy) for cx, cy in perimeter]
+
+            # Bottoms face down
+            if normal == 5:
+                outline.reverse()
+
+        return [vertex for vertex in outline if self._used(vertex)]
+
+    @staticmethod
+    def _triangulate(outline):
+        """
+        Split a convex outline, which may have extra vertices along its edges, into
+        triangles by clipping corners. Returns index triples into outline.
+
+        A corner is only clipped when the triangle has area and what remains is
+        still a proper polygon, never a line of vertices along one edge.
+        """
+        def cross(a, b, c):
+            u = (b[0] - a[0], b[1] - a[1], b[2] - a[2])
+            v = (c[0] - a[0], c[1] - a[1], c[2] - a[2])
+            return (u[1] * v[2] - u[2] * v[1], u[2] * v[0] - u[0] * v[2], u[0] * v[1] - u[1] * v[0])
+
+        flat = (0, 0, 0)
+        remaining = list(range(len(outline)))
+        triangles = []
+        i = 0
+
+        while len(remaining) > 3:
+            i %= len(remaining)
+            a, b, c = remaining[i - 1], remaining[i], remaining[(i + 1) % len(remaining)]
+
+            if cross(outline[a], outline[b], outline[c]) != flat and \
+               any(cross(outline[a], outline[c], outline[r]) != flat for r in remaining if r != b):
+                triangles.append((a, b, c))
+                del remaining[i]
+            else:
+                i += 1
+
+        triangles.append(tuple(remaining))
+
+        return triangles
+
+    def _write(self, polygons, name=None):
+        """
+        Triangulate the polygons and return the OBJ data, grouped by material.
+
+        Args:
+            polygons (list): Polygons to triangulate.
+            name (str, optional): Object name, defaults to the mesher's name.
+
+        Globals:
+            Current_Face, Current_Opposite_Face (int): Vertices/normals already written,
+                                                       advanced past the surface.
+            Stl_Output_Mode (str): When "only", the triangles are exported and no
+                                   OBJ text is built.
+        """
+        global Current_Face
+        global Current_Opposite_Face
+
+        sx = CUBE_X * Primitive_Multipler
+        sy = CUBE_Y * Primitive_Multipler
+        mirrored = (sx < 0) != (sy < 0)
+        text = Stl_Output_Mode != "only"
+
+        myFormatter = "{0:.6f}"
+        vertices = {}
+        vertex_lines = []
+        faces = {}
+        points = []
+        triangles = []
+        materials = []
+
+        for polygon in polygons:
+            outline = self._outline(polygon)
+            if mirrored:
+                outline.reverse()
+
+            indices = []
+            for vertex in outline:
+                index = vertices.get(vertex)
+                if index is None:
+                    index = Current_Face + len(vertices) + 1
+                    vertices[vertex] = index
+                    points += (vertex[0] * sx, vertex[1] * sy, vertex[2])
+                    if text:
+                        vertex_lines.append("v " + myFormatter.format(vertex[0] * sx) + " " +
+                                            myFormatter.format(vertex[1] * sy) + " " + myFormatter.format(vertex[2]) + "\n")
+                indices.append(index)
+
+            normal = Current_Opposite_Face + polygon[5] + 1
+            for triangle in self._triangulate(outline):
+                if text:
+                    faces.setdefault(polygon[4], []).append(
+                        "f " + " ".join(f"{indices[i]}//{normal}" for i in triangle) + "\n")
+                triangles.append([indices[i] - Current_Face for i in triangle])
+                materials.append(polygon[4])
+
+        for material_index in dict.fromkeys(materials):
+            exportMesh(points, [t for t, m in zip(triangles, materials) if m == material_index], material_index)
+
+        if not text:
+            self.primitives += len(triangles)
+            return ""
+
+        data = [f"o {name or self.name}\n"]
+        data += vertex_lines
+
+        for nx, ny, nz in self.GRID_NORMALS:
+            data.append("vn " + myFormatter.format(nx * (1 if sx > 0 else -1)) + " " +
+                        myFormatter.format(ny * (1 if sy > 0 else -1)) + " " + myFormatter.format(nz) + "\n")
+
+        if CREATE_MTL_FILE:
+            data.append("mtllib " + os.path.basename(mtl_filename) + "\n")
+
+        face_count = 0
+        for material_index, lines in faces.items():
+            if CREATE_MTL_FILE:
+                data.append(f"usemtl {material_index}\n")
+            data += lines
+            face_count += len(lines)
+
+        data.append(f"# {len(vertices)} Vertices, {face_count} Faces\n")
+        self.primitives += face_count
+
+        Current_Face += len(vertices)
+        Current_Opposite_Face += len(self.GRID_NORMALS)
+
+        return "".join(data)
 
 
 #
-# Update Canvas Width/Height
+# Contour extrusion, trace the outline of each region of one material and
+# height, then extrude the traced polygon (holes included) to the layer depth.
 #
-# TODO: Remove or explain the `if width > 405: print` line
-# TODO: Consider returning updated dimensions instead of using globals
-def update_svg_canvas_dimensions(width, height):
+class ContourExtrusionMesher(VoxelSurfaceMesher):
     """
-    Update the global SVG canvas dimensions if the new dimensions are larger.
+    Collect the runs found by processFile() and write each material/height region as
+    an extruded polygon instead of a box per run.
 
-    This ensures that the final SVG canvas is large enough to accommodate all
-    generated elements across multiple operations.
+    For every (material, height) pair:
 
-    Args:
-        width (float): Proposed new canvas width in mm.
-        height (float): Proposed new canvas height in mm.
+        1. The boundary between covered and uncovered pixels is traced into closed
+           outlines, as marching squares would on the binary mask. Outer edges run
+           anticlockwise and holes clockwise. Where regions touch only at a corner
+           the trace keeps left, so they stay separate outlines.
+        2. Collinear edges are merged, leaving only the corners of each outline.
+        3. Each outer outline and its holes are triangulated directly by ear clipping
+           (_earcut) into the top and bottom caps, about one triangle per corner each.
+        4. The caps are joined by one wall (two triangles) per outline edge.
 
-    Returns:
-        None. Modifies global variables in-place.
+    Each pair is written as its own closed object, so a 529 pixel square of one colour
+    becomes 12 triangles where the cube path writes 276. Sprite gutters need no special
+    handling, the runs already arrive in gutter adjusted coordinates.
 
-    Globals:
-        SVG_CANVAS_WIDTH (float): Current maximum canvas width.
-        SVG_CANVAS_HEIGHT (float): Current maximum canvas height.
+    Args:
+        name (str): Object name prefix, each region is written as name_N.
     """
-    global SVG_CANVAS_WIDTH
-    global SVG_CANVAS_HEIGHT
 
-    if width > 405:
-        print
-    if width > SVG_CANVAS_WIDTH:
-        SVG_CANVAS_WIDTH = width
+    # Outward normal index (GRID_NORMALS) for a wall, keyed on the edge heading
+    WALL_NORMALS = {(0, 1): 0, (0, -1): 1, (-1, 0): 2, (1, 0): 3}
+
+    def __init__(self, name):
+        super().__init__(name)
+        self._runs = {}
+        self.outlines = 0
+
+    def add(self, x, y, width, material_index, multiplier):
+        """
+        Add a run of width pixels starting at (x, y).
+        """
+        rows = self._runs.setdefault((material_index, multiplier), {})
+        rows.setdefault(y, []).append((x, x + width))
+
+        self.runs += 1
+
+    def summary(self):
+        """
+        Return a log line describing the outlines traced.
+        """
+        return f"Contour Extrusion traced {self.outlines} outlines from {self.runs} runs into {self.primitives} triangles"
+
+    def finish(self):
+        """
+        Trace, triangulate and extrude every region, returning the OBJ data.
+
+        Globals:
+            CurrentZOffset, Primitive_Layer_Depth (float): Z of the base and layer depth.
+        """
+        if not self._runs:
+            return ""
+
+        # Same Z arithmetic as create_primitive() so extrusions line up with cubes
+        depth = 10.0 * (Primitive_Layer_Depth / 10)
+        bottom = 0.0 + CurrentZOffset
+        data = []
+
+        for number, ((material_index, multiplier), rows) in enumerate(self._runs.items()):
+            top = (multiplier * depth if multiplier != 1.0 else depth) + CurrentZOffset
+            rows = {y: self._union(spans) for y, spans in rows.items()}
+
+            outlines = self._trace(rows)
+            self.outlines += len(outlines)
+
+            polygons = self._extrude(rows, outlines, bottom, top, material_index)
+            data.append(self._write(polygons, f"{self.name}_{number}"))
+
+        return "".join(data)
+
+    @staticmethod
+    def _union(spans):
+        """
+        Merge touching or overlapping (x0, x1) spans into a sorted list.
+        """
+        merged = []
+        for x0, x1 in sorted(spans):
+            if merged and merged[-1][1] >= x0:
+                merged[-1][1] = max(merged[-1][1], x1)
+            else:
+                merged.append([x0, x1])
+
+        return [tuple(span) for span in merged]
+
+    @staticmethod
+    def _difference(spans, others):
+        """
+        Return the parts of spans not covered by others, both sorted and disjoint.
+        """
+        result = []
+        j = 0
+
+        for x0, x1 in spans:
+            start = x0
+            while j < len(others) and others[j][1] <= start:
+                j += 1
+
+            k = j
+            while k < len(others) and others[k][0] < x1:
+                if others[k][0] > start:
+                    result.append((start, others[k][0]))
+                start = max(start, others[k][1])
+                k += 1
+
+            if start < x1:
+                result.append((start, x1))
+
+        return result
+
+    @staticmethod
+    def _heading(a, b):
+        return ((b[0] > a[0]) - (b[0] < a[0]), (b[1] > a[1]) - (b[1] < a[1]))
+
+    def _trace(self, rows):
+        """
+        Trace the boundary of the covered spans into closed outlines of corner points.
+        """
+        edges = {}
+
+        # Pixel sides, anticlockwise around the covered area
+        for y, spans in rows.items():
+            for x0, x1 in spans:
+                edges.setdefault((x0, y + 1), []).append((x0, y))
+                edges.setdefault((x1, y), []).append((x1, y + 1))
+
+        for line in set(rows) | {y + 1 for y in rows}:
+            below = rows.get(line, [])
+            above = rows.get(line - 1, [])
+
+            for x0, x1 in self._difference(below, above):
+                edges.setdefault((x0, line), []).append((x1, line))
+            for x0, x1 in self._difference(above, below):
+                edges.setdefault((x1, line), []).append((x0, line))
+
+        # Start each outline where it cannot be a corner touch
+        starts = [point for point, targets in edges.items() if len(targets) == 1]
+        outlines = []
+
+        for start in starts + list(edges):
+            if start not in edges:
+                continue
+
+            outline = []
+            point = start
+            heading = None
+
+            while True:
+                targets = edges[point]
+                target = targets[0]
+
+                if len(targets) > 1 and heading is not None:
+                    # Regions touching at a corner, keep left to stay on this one
+                    left = (-heading[1], heading[0])
+                    target = next((t for t in targets if self._heading(point, t) == left), target)
+
+                targets.remove(target)
+                if not targets:
+                    del edges[point]
+
+                outline.append(point)
+                heading = self._heading(point, target)
+                point = target
+
+                if point == start:
+                    break
+
+            # Only keep the corners
+            corners = [outline[i] for i in range(len(outline))
+                       if self._heading(outline[i - 1], outline[i]) !=
+                          self._heading(outline[i], outline[(i + 1) % len(outline)])]
+            outlines.append(corners)
+
+        return outlines
+
+    def _extrude(self, rows, outlines, bottom, top, material_index):
+        """
+        Build the cap and wall polygons for one region.
+        """
+        def span(x, y):
+            spans = rows.get(y, [])
+            i = bisect.bisect_right(spans, (x, math.inf)) - 1
+            return spans[i] if i >= 0 and spans[i][0] <= x < spans[i][1] else None
+
+        diagonal = {}
+
+        def vertex(x, y, z, row):
+            # Where pixels only meet diagonally each keeps its own copy of the corner
+            if (x, y) not in diagonal:
+                nw, ne, sw, se = (span(cx, cy) is not None for cx, cy in ((x - 1, y - 1), (x, y - 1), (x - 1, y), (x, y)))
+                diagonal[(x, y)] = nw == se and ne == sw and nw != ne
+
+            side = 0
+            if diagonal[(x, y)]:
+                side = 1 if row == y - 1 else 2
+            return (x, y, z, side)
+
+        # Join spans overlapping the row below into 4-connected groups of pixels
+        parent = {(y, x0, x1): (y, x0, x1) for y, spans in rows.items() for x0, x1 in spans}
+
+        def find(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for y, spans in rows.items():
+            below = rows.get(y + 1, [])
+            j = 0
+            for x0, x1 in spans:
+                while j < len(below) and below[j][1] <= x0:
+                    j += 1
+                k = j
+                while k < len(below) and below[k][0] < x1:
+                    parent[find((y + 1,) + below[k])] = find((y, x0, x1))
+                    k += 1
+
+        # Each group has one outer outline (anticlockwise, positive area) and any
+        # number of holes (clockwise), found from the pixel inside their first edge
+        groups = {}
+
+        for outline in outlines:
+            (x, y), (hx, hy) = outline[0], self._heading(outline[0], outline[1])
+            cx, cy = x + (hx - hy - 1) // 2, y + (hx + hy - 1) // 2
+            group = groups.setdefault(find((cy,) + span(cx, cy)), [None])
+
+            if sum(p[0] * q[1] - q[0] * p[1] for p, q in zip(outline, outline[1:] + outline[:1])) > 0:
+                group[0] = outline
+            else:
+                group.append(outline)
+
+        polygons = []
+
+        for rings in groups.values():
+            for triangle in self._earcut(rings):
+                # Where pixels only meet diagonally the triangle decides which copy it uses
+                middle = sum(y for _, y in triangle)
+                corners = [(x, y, y - 1 if 3 * y > middle else y) for x, y in triangle]
+
+                polygons.append(('outline', [vertex(x, y, top, row) for x, y, row in corners],
+                                 None, None, material_index, 4))
+                polygons.append(('outline', [vertex(x, y, bottom, row) for x, y, row in reversed(corners)],
+                                 None, None, material_index, 5))
+
+        for outline in outlines:
+            for p, q in zip(outline, outline[1:] + outline[:1]):
+                heading = self._heading(p, q)
+
+                if p[1] == q[1]:
+                    row = p[1] if heading[0] > 0 else p[1] - 1
+                    edge = [(p[0], p[1], row), (q[0], q[1], row)]
+                else:
+                    # The pixel rows the wall covers run from lo to hi - 1
+                    lo, hi = min(p[1], q[1]), max(p[1], q[1])
+                    edge = [(p[0], p[1], lo if p[1] == lo else hi - 1), (q[0], q[1], lo if q[1] == lo else hi - 1)]
+
+                wall = [vertex(x, y, bottom, row) for x, y, row in edge] + \
+                       [vertex(x, y, top, row) for x, y, row in reversed(edge)]
+                polygons.append(('outline', wall, None, None, material_index, self.WALL_NORMALS[heading]))
+
+        return polygons
+
+    @staticmethod
+    def _earcut(rings):
+        """
+        Triangulate a polygon with holes by ear clipping, following mapbox/earcut.
+
+        Each hole is joined to the outer ring by a bridge to a vertex it can see,
+        leaving one ring to clip ears from. Collinear and repeated points are
+        filtered as earcut does, then any triangle with an outline corner part way
+        along an edge is split there, so every corner of an outline is a vertex of
+        the caps and meets its walls exactly.
+
+        Points are indexed by 8x8 cell and edges by the rows they cross, so finding
+        ears and bridges stays local on outlines with thousands of holes.
+
+        Args:
+            rings (list): The outer outline (positive area) followed by its holes, as
+                          lists of (x, y) grid points.
+
+        Returns:
+            list: Triangles as (x, y) point triples, with positive area.
+        """
+        # Linked rings of points. ids stay the same on the copies made by splits,
+        # labels say which ring a point is on (-1 once removed).
+        xs, ys, ids, labels, nxt, prv = [], [], [], [], [], []
+        cells = {}
+        crossings = {}
+        triangles = []
+
+        def add(x, y, point_id, label):
+            xs.append(x)
+            ys.append(y)
+            ids.append(point_id)
+            labels.append(label)
+            cells.setdefault((x >> 3, y >> 3), []).append(len(xs) - 1)
+            return len(xs) - 1
+
+        def track(p):
+            # Record the rows crossed by the edge from p, while holes are being bridged
+            q = nxt[p]
+            if crossings is not None and ys[p] != ys[q]:
+                for y in range(min(ys[p], ys[q]), max(ys[p], ys[q]) + 1):
+                    crossings.setdefault(y, []).append((p, q))
+
+        def link(points, label):
+            first = len(xs)
+            for x, y in points:
+                add(x, y, len(xs), label)
+                nxt.append(len(xs))
+                prv.append(len(xs) - 2)
+            nxt[-1], prv[first] = first, len(xs) - 1
+            for p in range(first, len(xs)):
+                track(p)
+            return first
+
+        def relabel(start, label):
+            p = start
+            while True:
+                labels[p] = label
+                p = nxt[p]
+                if p == start:
+                    break
+
+        def area(p, q, r):
+            # Negative where p, q, r turn the same way as the outer ring
+            return (ys[q] - ys[p]) * (xs[r] - xs[q]) - (xs[q] - xs[p]) * (ys[r] - ys[q])
+
+        def equal(p, q):
+            return xs[p] == xs[q] and ys[p] == ys[q]
+
+        def inside(ax, ay, bx, by, cx, cy, px, py):
+            return (cx - px) * (ay - py) >= (ax - px) * (cy - py) and \
+                   (ax - px) * (by - py) >= (bx - px) * (ay - py) and \
+                   (bx - px) * (cy - py) >= (cx - px) * (by - py)
+
+        def nearby(x0, y0, x1, y1, label):
+            # Points of one ring within a box
+            for cx in range(x0 >> 3, (x1 >> 3) + 1):
+                for cy in range(y0 >> 3, (y1 >> 3) + 1):
+                    for p in cells.get((cx, cy), ()):
+                        if labels[p] == label and x0 <= xs[p] <= x1 and y0 <= ys[p] <= y1:
+                            yield p
+
+        def locally_inside(a, b):
+            if area(prv[a], a, nxt[a]) < 0:
+                return area(a, b, nxt[a]) >= 0 and area(a, prv[a], b) >= 0
+            return area(a, b, prv[a]) < 0 or area(a, nxt[a], b) < 0
+
+        def intersects(p1, q1, p2, q2):
+            def sign(value):
+                return (value > 0) - (value < 0)
+
+            def on_segment(p, q, r):
+                return min(xs[p], xs[r]) <= xs[q] <= max(xs[p], xs[r]) and \
+                       min(ys[p], ys[r]) <= ys[q] <= max(ys[p], ys[r])
+
+            o1, o2 = sign(area(p1, q1, p2)), sign(area(p1, q1, q2))
+            o3, o4 = sign(area(p2, q2, p1)), sign(area(p2, q2, q1))
+
+            return (o1 != o2 and o3 != o4) or \
+                   (o1 == 0 and on_segment(p1, p2, q1)) or (o2 == 0 and on_segment(p1, q2, q1)) or \
+                   (o3 == 0 and on_segment(p2, p1, q2)) or (o4 == 0 and on_segment(p2, q1, q2))
+
+        def valid_diagonal(a, b):
+            # Inside the ring, crossing no edge and not reversing either corner
+            p = a
+            while True:
+                q = nxt[p]
+                if ids[p] != ids[a] and ids[q] != ids[a] and ids[p] != ids[b] and ids[q] != ids[b] and \
+                   intersects(p, q, a, b):
+                    return False
+                p = q
+                if p == a:
+                    break
+
+            px, py = Fraction(xs[a] + xs[b], 2), Fraction(ys[a] + ys[b], 2)
+            middle = False
+            p = a
+            while True:
+                q = nxt[p]
+                if (ys[p] > py) != (ys[q] > py) and px < (xs[q] - xs[p]) * (py - ys[p]) / (ys[q] - ys[p]) + xs[p]:
+                    middle = not middle
+                p = q
+                if p == a:
+                    break
+
+            return ids[nxt[a]] != ids[b] and ids[prv[a]] != ids[b] and \
+                   ((locally_inside(a, b) and locally_inside(b, a) and middle and
+                     (area(prv[a], a, prv[b]) or area(a, prv[b], b))) or
+                    (equal(a, b) and area(prv[a], a, nxt[a]) > 0 and area(prv[b], b, nxt[b]) > 0))
+
+        def remove(p):
+            nxt[prv[p]], prv[nxt[p]] = nxt[p], prv[p]
+            labels[p] = -1
+            track(prv[p])
+
+        def split(a, b):
+            # Join a to b, returning the copy of b on the new ring b' -> a'
+            a2, b2 = add(xs[a], ys[a], ids[a], labels[a]), add(xs[b], ys[b], ids[b], labels[a])
+            nxt.extend((nxt[a], a2))
+            prv.extend((b2, prv[b]))
+            prv[nxt[a]], nxt[prv[b]] = a2, b2
+            nxt[a], prv[b] = b, a
+            for p in (a, b2, a2, prv[b2]):
+                track(p)
+            return b2
+
+        def filter_points(start, end=None):
+            # Drop repeated and collinear points, returning a point still on the ring
+            end = start if end is None else end
+            p = start
+            while True:
+                again = False
+                if equal(p, nxt[p]) or area(prv[p], p, nxt[p]) == 0:
+                    remove(p)
+                    p = end = prv[p]
+                    if p == nxt[p]:
+                        break
+                    again = True
+                else:
+                    p = nxt[p]
+                if not again and p == end:
+                    break
+            return end
+
+        def filter_around(points):
+            # filter_points() for the few points a bridge touches
+            pending = list(points)
+            while pending:
+                p = pending.pop()
+                if labels[p] >= 0 and p != nxt[p] and (equal(p, nxt[p]) or area(prv[p], p, nxt[p]) == 0):
+                    remove(p)
+                    pending += (prv[p], nxt[p])
+                    points.append(prv[p])
+            return next(p for p in reversed(points) if labels[p] >= 0)
+
+        def bridge(hole, label):
+            # Nearest outer edge crossed by a ray from the hole to the left, its
+            # left end is the candidate
+            hx, hy = xs[hole], ys[hole]
+            qx, m = -math.inf, None
+            for p, q in crossings.get(hy, ()):
+                if labels[p] == label and nxt[p] == q and ys[q] <= hy <= ys[p] and min(xs[p], xs[q]) <= hx:
+                    x = xs[p] if xs[p] == xs[q] else xs[p] + Fraction((hy - ys[p]) * (xs[q] - xs[p]), ys[q] - ys[p])
+                    if qx < x <= hx:
+                        qx, m = x, p if xs[p] < xs[q] else q
+                        if x == hx:
+                            return m
+
+            if m is None:
+                return None
+
+            # Any point inside the triangle hole, crossing, candidate blocks the view,
+            # the one closest in angle to the ray is visible
+            mx, my = xs[m], ys[m]
+            best = math.inf
+            for p in list(nearby(mx, min(hy, my), hx - 1, max(hy, my), label)):
+                if inside(hx if hy < my else qx, hy, mx, my, qx if hy < my else hx, hy, xs[p], ys[p]):
+                    tangent = Fraction(abs(hy - ys[p]), hx - xs[p])
+                    if locally_inside(p, hole) and \
+                       (tangent < best or (tangent == best and (xs[p] > xs[m] or (xs[p] == xs[m] and
+                        area(prv[m], m, prv[p]) < 0 and area(nxt[p], m, nxt[m]) < 0)))):
+                        m, best = p, tangent
+
+            return m
+
+        def is_ear(b):
+            a, c = prv[b], nxt[b]
+            if area(a, b, c) >= 0:
+                return False
+
+            # Blocked by any reflex or collinear point in or on the triangle
+            ax, ay, bx, by, cx, cy = xs[a], ys[a], xs[b], ys[b], xs[c], ys[c]
+            x0, y0, x1, y1 = min(ax, bx, cx), min(ay, by, cy), max(ax, bx, cx), max(ay, by, cy)
+            label = labels[b]
+
+            for gx in range(x0 >> 3, (x1 >> 3) + 1):
+                for gy in range(y0 >> 3, (y1 >> 3) + 1):
+                    for p in cells.get((gx, gy), ()):
+                        px, py = xs[p], ys[p]
+                        if labels[p] == label and x0 <= px <= x1 and y0 <= py <= y1 and p != a and p != b and \
+                           p != c and inside(ax, ay, bx, by, cx, cy, px, py) and area(prv[p], p, nxt[p]) >= 0:
+                            return False
+
+            return True
+
+        def clip(ear, stage=0):
+            stop = ear
+            while prv[ear] != nxt[ear]:
+                a, c = prv[ear], nxt[ear]
+
+                if is_ear(ear):
+                    triangles.append((a, ear, c))
+                    remove(ear)
+                    ear = stop = nxt[c]
+                    continue
+
+                ear = c
+                if ear != stop:
+                    continue
+
+                # No ear left, filter points, then cure self intersections, then split
+                if stage == 0:
+                    clip(filter_points(ear), 1)
+                elif stage == 1:
+                    ear = filter_points(ear)
+                    p = start = ear
+                    while True:
+                        a, b = prv[p], nxt[nxt[p]]
+                        if not equal(a, b) and intersects(a, p, nxt[p], b) and \
+                           locally_inside(a, b) and locally_inside(b, a):
+                            triangles.append((a, p, b))
+                            remove(nxt[p])
+                            remove(p)
+                            p = start = b
+                        p = nxt[p]
+                        if p == start:
+                            break
+                    clip(filter_points(p), 2)
+                else:
+                    a = ear
+                    while True:
+                        b = nxt[nxt[a]]
+                        while b != prv[a]:
+                            if ids[a] != ids[b] and valid_diagonal(a, b):
+                                c = split(a, b)
+                                relabel(c, len(xs))
+                                clip(filter_points(a, nxt[a]))
+                                clip(filter_points(c, nxt[c]))
+                                return
+                            b = nxt[b]
+                        a = nxt[a]
+                        if a == ear:
+                            break
+                break
+
+        outer = link(rings[0], 0)
+
+        # Bridge holes from left to right, each from its leftmost point
+        starts = []
+        for label, ring in enumerate(rings[1:], 1):
+            first = link(ring, label)
+            starts.append(min(range(first, len(xs)), key=lambda p: (xs[p], ys[p])))
+
+        for hole in sorted(starts, key=lambda p: xs[p]):
+            m = bridge(hole, labels[outer])
+            if m is not None:
+                relabel(hole, labels[outer])
+                reverse = split(m, hole)
+                outer = filter_around([reverse, nxt[reverse], prv[reverse], hole, m, prv[m], nxt[hole]])
+
+        crossings = None
+        clip(outer)
+
+        # Split triangles at outline corners lying part way along an edge
+        corners = {point for ring in rings for point in ring}
+        pending = [tuple((xs[p], ys[p]) for p in triangle) for triangle in triangles]
+        result = []
+
+        while pending:
+            triangle = pending.pop()
+            for i in range(3):
+                (ax, ay), (bx, by), c = triangle[i], triangle[(i + 1) % 3], triangle[(i + 2) % 3]
+                steps = math.gcd(bx - ax, by - ay)
+                point = next(((ax + (bx - ax) * k // steps, ay + (by - ay) * k // steps) for k in range(1, steps)
+                              if (ax + (bx - ax) * k // steps, ay + (by - ay) * k // steps) in corners), None)
+                if point is not None:
+                    pending += [((ax, ay), point, c), (point, (bx, by), c)]
+                    break
+            else:
+                result.append(triangle)
+
+        return result
+
+    def _outline(self, polygon):
+        return list(polygon[1])
 
-    if height > SVG_CANVAS_HEIGHT:
-        SVG_CANVAS_HEIGHT = height
 
 #
-# Add Centred Text
+# Heightfield meshing for --tower, the whole height map is known up front so the
+# tops and walls VoxelSurfaceMesher finds cell by cell are found with array operations.
 #
-# TODO: Make font-size and stroke-width configurable parameters
-# TODO: Consider accepting a style dict or class for future flexibility
-def add_svg_centeredText(x, y, text, fill_colour):
+class HeightfieldMesher(VoxelSurfaceMesher):
     """
-    Generate a centered SVG <text> element with stroke-based outlining.
+    Write a per-pixel height map as a single closed surface.
 
-    Args:
-        x (float): The x-coordinate in mm for the text anchor point.
-        y (float): The y-coordinate in mm for the text anchor point.
-        text (str): The text content to display.
-        fill_colour (str): Stroke colour for the text outline (e.g. "#000000").
+    Produces the same surface as VoxelSurfaceMesher, from a grid handed over in one
+    go by set_heightfield() rather than run by run:
 
-    Returns:
-        str: A formatted SVG <text> tag with positioning, alignment, and stroke styling.
+        - Tops are runs of equal material and height along each row, stacked into
+          rectangles where the next row has exactly the same run.
+        - Bottoms are merged the same way by material alone.
+        - Walls are found by comparing the grid with itself shifted one cell in
+          each direction, so a wall is only written where a column stands above its
+          neighbour and is shared by the two, then joined along each grid line.
+
+    Vertex welding, T-junctions and triangulation are left to VoxelSurfaceMesher. Corner
+    lookups read the height rows directly, and outlines only visit the corners in use,
+    so large flat areas cost no more than small ones.
+
+    Args:
+        name (str): Object name written on the `o` line.
     """
-    text_str = (f'\t\t<text x="{x:.3f}mm" y="{y:.3f}mm" text-anchor="middle" '
-                f'dominant-baseline="central" fill="none" stroke = "{fill_colour}" '
-                f'stroke-width="0.5px" alignment-baseline="middle" font-size="24pt"'
-                f'>{text} </text>\n'
-    )
 
-    return text_str
+    def __init__(self, name):
+        super().__init__(name)
+        self._materials = None
+        self._multipliers = None
+
+    def set_heightfield(self, materials, multipliers):
+        """
+        Set the grid, in gutter adjusted pixel positions.
+
+        Args:
+            materials (np.ndarray): Material index of each column, -1 where there is none.
+            multipliers (np.ndarray): Height multiplier of each column, as passed to add().
+        """
+        self._materials = materials
+        self._multipliers = multipliers
+        self.runs = int(np.count_nonzero(materials >= 0))
+
+    def summary(self):
+        """
+        Return a log line describing the surface written.
+        """
+        return f"Heightfield Meshing turned {self.runs} columns into {self.primitives} exterior triangles"
+
+    @staticmethod
+    def _spans(mask, keys):
+        """
+        Find runs of set cells along each row of mask whose keys don't change.
+
+        Args:
+            mask (np.ndarray): 2D bool array.
+            keys (list): 2D arrays, a run ends wherever any of them changes.
+
+        Returns:
+            tuple: (row, start, end) arrays, end exclusive.
+        """
+        joined = mask[:, 1:] & mask[:, :-1]
+        for key in keys:
+            joined &= key[:, 1:] == key[:, :-1]
+
+        edge = np.zeros((mask.shape[0], 1), dtype=bool)
+        starts = mask & ~np.hstack((edge, joined))
+        ends = mask & ~np.hstack((joined, edge))
+
+        rows, start = np.nonzero(starts)
+        _, end = np.nonzero(ends)
+
+        return rows, start, end + 1
+
+    def finish(self):
+        """
+        Build the surface and return it as OBJ data.
+
+        Globals:
+            CurrentZOffset, Primitive_Layer_Depth (float): Z of the base and layer depth.
+        """
+        if self._materials is None or not self.runs:
+            return ""
+
+        # Same Z arithmetic as create_primitive() so surfaces line up with cubes
+        depth = 10.0 * (Primitive_Layer_Depth / 10)
+        bottom = 0.0 + CurrentZOffset
+
+        materials = self._materials
+        filled = materials >= 0
+        tops = np.where(self._multipliers != 1.0, self._multipliers * depth, depth) + CurrentZOffset
+        tops[~filled] = np.nan
+
+        # Rows of heights for _vertex(), with an empty border so every corner has four cells
+        self._rows = np.pad(tops, 1, constant_values=np.nan).tolist()
+
+        polygons = []
+
+        # Tops and bottoms of the columns, row runs stacked into rectangles
+        for keys, normal in (((materials, tops), 4), ((materials,), 5)):
+            rows, start, end = self._spans(filled, keys)
+            material = materials[rows, start]
+            height = tops[rows, start] if normal == 4 else np.full(len(rows), bottom)
+
+            order = np.lexsort((rows, end, start, height, material))
+            rows, start, end, material, height = rows[order], start[order], end[order], material[order], height[order]
+
+            same = (start[1:] == start[:-1]) & (end[1:] == end[:-1]) & (material[1:] == material[:-1]) & \
+                   (height[1:] == height[:-1]) & (rows[1:] == rows[:-1] + 1)
+            first = np.flatnonzero(np.concatenate(([True], ~same)))
+            last = np.concatenate((first[1:], [len(rows)])) - 1
+
+            for x0, y0, x1, y1, z, material_index in zip(start[first].tolist(), rows[first].tolist(), end[first].tolist(),
+                                                         (rows[last] + 1).tolist(), height[first].tolist(),
+                                                         material[first].tolist()):
+                polygons.append(self._rectangle(x0, y0, x1, y1, z, material_index, normal))
+
+        # Walls, where a column stands above its neighbour (or the base)
+        padded = np.pad(tops, 1, constant_values=np.nan)
+
+        for normal, (dx, dy) in enumerate(((1, 0), (-1, 0), (0, 1), (0, -1))):
+            neighbour = padded[1 + dy:padded.shape[0] - 1 + dy, 1 + dx:padded.shape[1] - 1 + dx]
+            low = np.where(np.isnan(neighbour), bottom, neighbour)
+            exposed = filled & (low < tops)
+
+            # Walls facing +-x run down columns, so find the spans on the transposed grid
+            if dx:
+                lines, start, end = self._spans(exposed.T, (low.T, tops.T, materials.T))
+                cells = (start, lines)
+                lines = lines + max(dx, 0)
+            else:
+                lines, start, end = self._spans(exposed, (low, tops, materials))
+                cells = (lines, start)
+                lines = lines + max(dy, 0)
+
+            for line, position, stop, z0, z1, material_index in zip(lines.tolist(), start.tolist(), end.tolist(),
+                                                                 low[cells].tolist(), tops[cells].tolist(),
+                                                                 materials[cells].tolist()):
+                polygons.append(self._wall(normal, line, position, stop, z0, z1, material_index))
+
+        # Corners in use along each grid row and column, for _outline()
+        self._corner_rows = {}
+        self._corner_columns = {}
+
+        for cx, cy in self._points:
+            self._corner_rows.setdefault(cy, []).append(cx)
+            self._corner_columns.setdefault(cx, []).append(cy)
+
+        for corners in (*self._corner_rows.values(), *self._corner_columns.values()):
+            corners.sort()
+
+        return self._write(polygons)
+
+    def _vertex(self, cx, cy, z, row):
+        """
+        As VoxelSurfaceMesher._vertex(), reading the column heights from the grid rows.
+        """
+        above, below = self._rows[cy], self._rows[cy + 1]
+
+        # Empty cells are NaN, which is never >= z
+        nw, se, ne, sw = above[cx] >= z, below[cx + 1] >= z, above[cx + 1] >= z, below[cx] >= z
+        side = 0
+        if nw == se and ne == sw and nw != ne:
+            side = 1 if row == cy - 1 else 2
+
+        return (cx, cy, z, side)
+
+    @staticmethod
+    def _between(corners, first, last):
+        """
+        Return the entries of a sorted list from first to last inclusive.
+        """
+        return corners[bisect.bisect_left(corners, first):bisect.bisect_right(corners, last)]
+
+    def _outline(self, polygon):
+        """
+        As VoxelSurfaceMesher._outline(), only visiting grid points that are corners in use.
+        """
+        kind, shape, low, high, material_index, normal = polygon
+
+        if kind == 'wall':
+            shape = [corner for corner in shape if corner[:2] in self._points]
+            return super()._outline((kind, shape, low, high, material_index, normal))
+
+        x0, y0, x1, y1 = shape
+        rows, columns = self._corner_rows, self._corner_columns
+
+        perimeter = [(x, y0) for x in self._between(rows.get(y0, []), x0, x1 - 1)] + \
+                    [(x1, y) for y in self._between(columns.get(x1, []), y0, y1 - 1)] + \
+                    [(x, y1) for x in reversed(self._between(rows.get(y1, []), x0 + 1, x1))] + \
+                    [(x0, y) for y in reversed(self._between(columns.get(x0, []), y0 + 1, y1))]
+
+        outline = [self._vertex(cx, cy, low, cy - 1 if y0 <= cy - 1 < y1 else cy) for cx, cy in perimeter]
+
+        # Bottoms face down
+        if normal == 5:
+            outline.reverse()
+
+        return [vertex for vertex in outline if self._used(vertex)]
+
 
 #
-# Add Centred Text
+# Gather OBJ text in memory and hand it to the file in large chunks, rather than
+# one small write per primitive.
 #
-def add_svg_centeredCircle(x, y, radius = 5.0, fill_colour = "#000000", stroke_width = 0.0, stroke = "#000000"):
+class ObjTextWriter:
     """
-    Generate an SVG <circle> element centered at (x, y) with optional stroke and fill.
+    Buffered text writer for OBJ files, used in place of the file object.
 
-    Args:
-        x (float): X-coordinate of the circle center in mm.
-        y (float): Y-coordinate of the circle center in mm.
-        radius (float, optional): Radius of the circle in mm. Default is 5.0.
-        fill_colour (str, optional): Fill colour of the circle (e.g. "#FF0000").
-        stroke_width (float, optional): Width of the stroke in mm. If 0.0, stroke is omitted.
-        stroke (str, optional): Stroke colour. Ignored if stroke_width is 0.
+    Strings passed to write() are collected and joined into chunks of about
+    OBJ_WRITE_CHUNK characters before being written, and the file itself is opened
+    with a buffer of the same size. The text written is exactly what was passed in.
+    SVG files are streamed through the same writer.
 
-    Returns:
-        str: A formatted SVG <circle> tag.
-    
-    TODO:
-        - Consider adding support for additional SVG attributes via kwargs or a style object.
-        - Optionally validate inputs to prevent invalid SVG formatting.
+    Args:
+        filename (str): Path of the OBJ file to create, or None to discard the text
+                        (STL only output, where little text is built at all).
+        encoding (str, optional): Text encoding of the file, the platform default if None.
     """
-    circle_str = (f'\t\t<circle cx="{x:.3f}mm" cy="{y:.3f}mm" r="{radius:.3f}mm" fill="{fill_colour}" ')
-    if stroke_width != 0.0:
-        circle_str += f'stroke="{stroke}" stroke-width="{stroke_width}mm" '
 
+    def __init__(self, filename, encoding=None):
+        self._fp = None
+        if filename is not None:
+            self._fp = open(filename, 'w', buffering=OBJ_WRITE_CHUNK, encoding=encoding)
+        self._parts = []
+        self._pending = 0
+        self.characters = 0
+        self._started = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, text):
+        """
+        Queue text for the file, writing a chunk once enough has been gathered.
+        """
+        if self._fp is None:
+            return
+
+        self._parts.append(text)
+        self._pending += len(text)
+
+        if self._pending >= OBJ_WRITE_CHUNK:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        if self._parts:
+            self._fp.write("".join(self._parts))
+            self._parts.clear()
+            self.characters += self._pending
+            self._pending = 0
+
+    def flush(self):
+        """
+        Write everything queued so far and flush the file.
+        """
+        if self._fp is not None:
+            self._write_chunk()
+            self._fp.flush()
+
+    def close(self):
+        """
+        Write everything queued and close the file, safe to call more than once.
+        """
+        if self._fp is not None and not self._fp.closed:
+            self._write_chunk()
+            self._fp.close()
+
+    def summary(self):
+        """
+        Return a log line with the amount of OBJ text written and the rate.
+        """
+        elapsed = max(time.perf_counter() - self._started, 1e-9)
+        megabytes = (self.characters + self._pending) / (1024 * 1024)
+
+        return f"Wrote {megabytes:.2f} MB of OBJ data at {megabytes / elapsed:.2f} MB/s"
 
-    return circle_str + "/> \n"
 
 #
-# Add rectangle
+# Weld every primitive written to an OBJ file into one indexed mesh, so
+# neighbouring cubes share their corner vertices.
 #
-def add_svg_rectangle(id, x, y, width, height, rx=0.0, ry=0.0, fill_colour="#000000", opacity = 100.0, stroke_width = 0.0, stroke_colour = "#000000"):
+class IndexedMeshWriter:
     """
-    Generate an SVG <rect> element with optional rounded corners, fill, and stroke.
+    Build the OBJ data for a single welded mesh, one primitive at a time.
+
+    Vertices are keyed on their formatted coordinates, so corners that land on the
+    same point are written once and shared by every face that uses them. Each normal
+    table (cube_normals, joint_normals) is written once per file, the first time a
+    primitive uses it, and faces refer back to it by offset. `usemtl` is only written
+    when the material changes.
+
+    Output is produced incrementally, every `v` and `vn` line is written before the
+    first face referencing it.
+
+    This only removes duplicate vertices and normals. Every box keeps all of its
+    faces, so the walls between neighbouring boxes now share welded vertices and
+    their edges are used by four triangles. The mesh is not manifold. Use
+    VoxelSurfaceMesher (--surface) for a closed, manifold mesh.
 
     Args:
-        id (str): Optional ID to assign to the rect.
-        x (float): X-position of the rectangle's top-left corner in mm.
-        y (float): Y-position of the rectangle's top-left corner in mm.
-        width (float): Width of the rectangle in mm.
-        height (float): Height of the rectangle in mm.
-        rx (float): Optional rounding percentage for x-radius (0–100).
-        ry (float): Optional rounding percentage for y-radius (0–100).
-        fill_colour (str): Fill colour in hex or named format.
-        opacity (float): Fill opacity as a percentage (0–100).
-        stroke_width (float): Stroke width in mm. 0 disables stroke.
-        stroke_colour (str): Stroke colour.
+        name (str): Object name written on the `o` line.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._vertices = {}
+        self._normal_tables = {}
+        self._normal_count = 0
+        self._material = None
+        self.faces = 0
+
+    def header(self):
+        """
+        Return the object and material library lines that start the mesh.
+        """
+        data = f"o {self.name}\n"
+
+        if CREATE_MTL_FILE:
+            data += "mtllib " + os.path.basename(mtl_filename) + "\n"
+
+        return data
+
+    def add_primitive(self, coords, faces, normals, material_index):
+        """
+        Weld one primitive into the mesh and return the OBJ lines it adds.
+
+        Args:
+            coords (list[str]): Formatted "x y z" coordinates for each primitive vertex.
+            faces (list): Face definitions, 1-based indices into coords.
+            normals (list): Normal table for the primitive, one normal per vertex.
+            material_index (int): Material ID for usemtl.
+
+        Returns:
+            str: New vertex, normal, usemtl and face lines.
+        """
+        data = []
+        indices = []
+
+        for coord in coords:
+            index = self._vertices.get(coord)
+            if index is None:
+                index = len(self._vertices) + 1
+                self._vertices[coord] = index
+                data.append(f"v {coord}\n")
+            indices.append(index)
+
+        offset = self._normal_tables.get(id(normals))
+        if offset is None:
+            offset = self._normal_count
+            self._normal_tables[id(normals)] = offset
+            self._normal_count += len(normals)
+            data.extend("vn {0:.6f} {1:.6f} {2:.6f}\n".format(*normal) for normal in normals)
+
+        if CREATE_MTL_FILE and material_index != self._material:
+            self._material = material_index
+            data.append(f"usemtl {material_index}\n")
+
+        for face in faces:
+            data.append("f " + " ".join(f"{indices[k - 1]}//{offset + k}" for k in face) + "\n")
+
+        self.faces += len(faces)
+
+        return "".join(data)
+
+    def summary(self):
+        """
+        Return the closing comment with the welded vertex and face totals.
+        """
+        return f"# {len(self._vertices)} Vertices, {self._normal_count} Normals, {self.faces} Faces\n"
+
+
+#
+# Start and finish the welded mesh for an OBJ file when --indexedmesh is set
+#
+def startIndexedMesh(name):
+    """
+    Begin a new IndexedMeshWriter for the OBJ file about to be written.
+
+    Args:
+        name (str): Object name for the mesh.
 
     Returns:
-        str: SVG-compliant <rect> string with given attributes.
-    
-    TODO:
-        - Allow setting stroke opacity separately.
-        - Extract style string to helper/template function.
-        - Re-enable canvas dimension tracking when refactoring.
-    """    # Base rectangle attributes
-    rect_str = ('\t\t<rect ')
+        str: Header lines to write, empty when indexed output is off.
 
-    if len(id)>0:
-        rect_str += f'id="{id}" '
+    Globals:
+        Indexed_Mesh_Output (bool): Set by --indexedmesh.
+        Stl_Output_Mode (str): No writer is needed when only the STL is written.
+        Indexed_Mesh (IndexedMeshWriter): Set to the new writer, or None.
+    """
+    global Indexed_Mesh
 
-    rect_str += (f'width="{width:.3f}mm" height="{height:.3f}mm" '
-                f'x="{x:.3f}mm" y="{y:.3f}mm" ')
-    
-    # Add rx and ry only if they're non-zero
-    if rx != 0.0:
-        fx = abs(width * (rx/100.0) / 2)
-        rect_str += f'rx="{fx:.3f}mm" '
-    if ry != 0.0:
-        fy = abs(height * (ry/100.0) / 2)
-        rect_str += f'ry="{fy:.3f}mm" '
+    Indexed_Mesh = IndexedMeshWriter(name) if Indexed_Mesh_Output and Stl_Output_Mode != "only" else None
 
-    # Add stroke attributes if stroke width is not 0
-    if stroke_width != 0.0:
-        #rect_str += f'stroke-width="{stroke_width}" stroke="{stroke_colour}" stroke-opacity="100%" '
-        rect_str += f'style="fill:none;stroke:{stroke_colour};stroke-width:{stroke_width}mm; " '
-    else:
-        # Add opacity only if it's not 100%
-        if opacity != 100.0:
-            rect_str += f'opacity="{opacity}" '
+    return Indexed_Mesh.header() if Indexed_Mesh is not None else ""
 
-        rect_str += f'fill="{fill_colour}" '
-        #style="fill:none;stroke:rgb(35,31,32);stroke-width:12.5px;"
+def finishIndexedMesh():
+    """
+    Close the current IndexedMeshWriter, returning its summary line (or "").
+    """
+    global Indexed_Mesh
+
+    if Indexed_Mesh is None:
+        return ""
+
+    summary = Indexed_Mesh.summary()
+    Indexed_Mesh = None
+
+    return summary
 
-    # Close the rect tag
-    rect_str += '/>\n'
-    
-    # Update canvas dimensions if needed
-    #update_svg_canvas_dimensions(x + width, y + height)
-    
-    return rect_str
 
 #
-# Create an SVG File sized for the Range 400mm Frames
-#   Current loading is the internal frame has a useable 397mm
-#       with 405mm on outer frame before backing board.
+# Binary STL, the same triangles as the OBJ as fixed size 50 byte records
 #
-def create_svg_frame400(Outline_Only = True, 
-                        add_PNG = False, 
-                        rect_radius_x = 25, 
-                        rect_radius_y = 25):
+class StlWriter:
     """
-    Create SVG data and cut guides for mounting art in a 400mm x 400mm frame (as sold by The Range).
+    Collect triangles for one file and write them as binary STL.
 
-    The layout includes:
-    - Usable inner area: 397mm x 397mm
-    - Outer mount board size: 405mm x 405mm
-    - Optional background and corner radius parameters
-    - Optional PNG layer
-    - Optional cut guides for MAPED mountboard cutter
+    Faces are added straight from the coordinate arrays create_primitive() and the
+    meshers work with, polygons are split into fans. Nothing is written until close(),
+    when every facet normal is computed in one go and the records are written with a
+    single call.
 
     Args:
-        Outline_Only (bool): If True, suppress SVG fill elements and render only outlines.
-        add_PNG (bool): If True, include the in-memory PNG rendering into the layout.
-        rect_radius_x (float): Horizontal corner radius as a percentage.
-        rect_radius_y (float): Vertical corner radius as a percentage.
-
-    Globals:
-        Image_Real_Width (int): Width of the loaded PNG in pixels.
-        Image_Real_Height (int): Height of the loaded PNG in pixels.
-        SVG_CANVAS_WIDTH (float): Used when placing cut guides.
-        SVG_CANVAS_HEIGHT (float): Used when placing cut guides.
-        SVG_DATA_LIST (list[str]): Appended with SVG group markup for cut guides.
+        filename (str): Path of the STL file to create.
+    """
 
-    Returns:
-        None. Appends formatted SVG elements directly to SVG_DATA_LIST.
+    HEADER = b"Binary STL created using PNG2OBJ.py - https://github.com/muckypaws/PNG2OBJ"
 
-    TODO:
-        - Generalise for other frame sizes (currently hardcoded to 400mm/405mm)
-        - Accept frame model name or dimensions as input
-        - Consider separating visual elements and guide logic
-    """
-    global SVG_DATA_LIST
+    RECORD = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
 
-    # Useable Area of the Frame
-    useableArea = 397.00
-    outerFrame  = 405.00
+    # Face lists already seen, to the positions in points of their triangle corners
+    FANS = {}
 
-    # Get the number of Pixels plus border of 2
-    if Image_Real_Width > 0:
-        multiplier = int(max (Image_Real_Width + 4, Image_Real_Height + 4))
-        if multiplier < 20: 
-            multiplier = 20
-        rect_width = useableArea / multiplier
-        rect_height = rect_width
+    def __init__(self, filename):
+        self.filename = filename
+        self._corners = array('f')
 
-    
-    # Calculate the real width
+    def add(self, points, faces):
+        """
+        Add faces indexing into a flat x, y, z list of points, OBJ style (from 1).
+        """
+        key = tuple(map(tuple, faces))
+        order = self.FANS.get(key)
 
-    offset = (outerFrame - useableArea) / 2
+        if order is None:
+            order = [(index - 1) * 3 + axis
+                     for face in key
+                     for k in range(1, len(face) - 1)
+                     for index in (face[0], face[k], face[k + 1])
+                     for axis in range(3)]
+            if len(key) <= 64:
+                self.FANS[key] = order
 
-    print(" Actual dimensions for 400mm Frame are :")
-    print("----------------------------------------")
-    print(f"       Internal Frame : {useableArea}mm x {useableArea}mm")
-    print(f"          Outer Frame : {outerFrame}mm x {outerFrame}mm")
-    print(f"   Pixel Width/Height : {rect_width:.2f}mm x {rect_height:.2f}mm")
-    #print(f"          Rect Radius : {args.svg_radius_percent_x:.2f}% x {args.svg_radius_percent_y:.2f}%")
-    print(f"          Rect Radius : {rect_radius_x:.2f}% x {rect_radius_y:.2f}%")
+        self._corners.extend([points[position] for position in order])
 
+    def close(self):
+        """
+        Write the STL file and return a log line describing it.
+        """
+        vertices = np.frombuffer(self._corners, dtype=np.float32).reshape(-1, 3, 3)
 
-    create_svg(multiplier, multiplier, Outline_Only,  True, add_PNG, offset, offset, rect_width, rect_height, rect_radius_x, rect_radius_y )
+        normals = np.cross(vertices[:, 1] - vertices[:, 0], vertices[:, 2] - vertices[:, 0])
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        np.divide(normals, lengths, out=normals, where=lengths > 0)
 
+        records = np.zeros(len(vertices), dtype=self.RECORD)
+        records['normal'] = normals
+        records['vertices'] = vertices
 
-    # Create the CUT Guides, I'm using the MAPED Mountboard Cutter, the Straight Edge needs
-    # a 60mm Offset from bottom of the ruler to the cutting point of the blade.
-    # You need 70mm if you're planning on using the 45 Degree Bevel Cutter.
-    CutGuides = [f'\t<g id="CutGuidesGroup"> \n']
-    
-    # Add 400mm border
-    CutGuides.append(add_svg_rectangle("Card Border",0.0, 0.0, 405.0, 405.0, 0.0, 0.0, "#FFFFFF", 0.0, 1, "#000000"))
+        with open(self.filename, 'wb') as fp_stl:
+            fp_stl.write(self.HEADER.ljust(80, b' '))
+            fp_stl.write(np.uint32(len(records)).tobytes())
+            records.tofile(fp_stl)
 
-    # Add Maped Cutter Marks
-    CutGuides.append(add_svg_rectangle("TopLeftGuide",0.0, 0.0, 60.0, 60.0, 0.0, 0.0, "#FFFFFF", 0.0, 1, "#000000"))
-    CutGuides.append(add_svg_rectangle("TopRightGuide",SVG_CANVAS_WIDTH - 60.0, 0.0, 60.0, 60.0, 0.0, 0.0, "#FFFFFF", 0.0, 1, "#000000"))
-    CutGuides.append(add_svg_rectangle("BottonLeftGuide",0.0, SVG_CANVAS_HEIGHT - 60.0, 60.0, 60.0, 0.0, 0.0, "#FFFFFF", 0.0, 1, "#000000"))
-    CutGuides.append(add_svg_rectangle("BottomRightGuide",SVG_CANVAS_WIDTH - 60.0, SVG_CANVAS_HEIGHT - 60.0, 60.0, 60.0, 0.0, 0.0, "#FFFFFF", 0.0, 1, "#000000"))
+        return f"Created STL File: {self.filename} ({len(records)} Triangles)"
 
-    CutGuides.append(f'\t</g>\n')
+#
+# 3MF package, one welded mesh object per OBJ file (layer, colour or frame) with
+# the palette as a base material table, for slicers that lose the MTL colours.
+#
+class ThreeMFPackage:
+    """
+    Collect the geometry of every OBJ written in a run into a single 3MF file.
 
-    SVG_DATA_LIST.append(''.join(CutGuides))
+    Each OBJ file becomes one mesh object. Vertices are welded on their exact
+    coordinates and triangles refer to them by index, so the XML is far smaller than
+    the OBJ text. The object takes the material of its first triangle, any triangle
+    using another material carries its own `pid`/`p1`. The base material table is
+    built from mtl_colour_index when the package is closed.
 
+    Objects are kept as XML text until close() numbers them and zips the model with
+    its content types and relationships.
+    """
 
+    CORE = "http://schemas.microsoft.com/3dmanufacturing/core/2015/02"
+
+    CONTENT_TYPES = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+        '</Types>\n')
+
+    RELATIONSHIPS = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Target="/3D/3dmodel.model" Id="rel0" '
+        'Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>'
+        '</Relationships>\n')
+
+    def __init__(self):
+        self._objects = []
+        self.triangles = 0
+        self.start_object(None)
+
+    def start_object(self, name):
+        """
+        Start collecting a new mesh object, None stops collecting.
+        """
+        self._name = name
+        self._vertices = {}
+        self._vertex_xml = []
+        self._triangle_xml = []
+        self._material = None
+
+    def add(self, points, faces, material_index):
+        """
+        Add faces indexing into a flat x, y, z list of points, OBJ style (from 1).
+        """
+        if self._name is None:
+            return
+
+        if self._material is None:
+            self._material = material_index
+
+        vertices = self._vertices
+        ids = []
+
+        for index in range(0, len(points), 3):
+            key = (points[index], points[index + 1], points[index + 2])
+            vertex = vertices.get(key)
+            if vertex is None:
+                vertex = vertices[key] = len(vertices)
+                x, y, z = (text.rstrip('0').rstrip('.') for text in formatCoordinates(key))
+                self._vertex_xml.append(f'<vertex x="{x}" y="{y}" z="{z}"/>\n')
+            ids.append(vertex)
+
+        material = "" if material_index == self._material else f' pid="1" p1="{material_index}"'
+
+        for face in faces:
+            for k in range(1, len(face) - 1):
+                a, b, c = ids[face[0] - 1], ids[face[k] - 1], ids[face[k + 1] - 1]
+                if a != b and b != c and a != c:
+                    self._triangle_xml.append(f'<triangle v1="{a}" v2="{b}" v3="{c}"{material}/>\n')
+
+    def finish_object(self, keep=True):
+        """
+        Close the current object, keeping its XML unless keep is False or it is empty.
+        """
+        if self._name is not None and keep and self._triangle_xml:
+            # The <object id="..." opening is completed by close()
+            self._objects.append(
+                f' type="model" name={quoteattr(self._name)} pid="1" pindex="{self._material}">\n'
+                '<mesh>\n<vertices>\n' + "".join(self._vertex_xml) + '</vertices>\n'
+                '<triangles>\n' + "".join(self._triangle_xml) + '</triangles>\n</mesh>\n</object>\n')
+            self.triangles += len(self._triangle_xml)
+
+        self.start_object(None)
+
+    def extend(self, other):
+        """
+        Append the objects collected by another package, e.g. from a layer worker.
+        """
+        self._objects += other._objects
+        self.triangles += other.triangles
+
+    def close(self, filename):
+        """
+        Write the 3MF package and return a log line describing it.
+
+        Globals:
+            mtl_colour_index (dict): Hex colour code -> material index, for the base materials.
+        """
+        colours = {index: code for code, index in mtl_colour_index.items()}
+        count = max(list(colours) + [0]) + 1
+
+        model = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n',
+            f'<model unit="millimeter" xml:lang="en-US" xmlns="{self.CORE}">\n',
+            '<metadata name="Application">PNG2OBJ.py - https://github.com/muckypaws/PNG2OBJ</metadata>\n',
+            '<resources>\n<basematerials id="1">\n']
+        model += [f'<base name="{index}" displaycolor="{colours.get(index, "#ffffff").upper()}"/>\n'
+                  for index in range(count)]
+        model.append('</basematerials>\n')
+        model += [f'<object id="{object_id}"' + body for object_id, body in enumerate(self._objects, 2)]
+        model.append('</resources>\n<build>\n')
+        model += [f'<item objectid="{object_id}"/>\n' for object_id in range(2, len(self._objects) + 2)]
+        model.append('</build>\n</model>\n')
+
+        with zipfile.ZipFile(filename, 'w', compression=zipfile.ZIP_DEFLATED) as package:
+            package.writestr('[Content_Types].xml', self.CONTENT_TYPES)
+            package.writestr('_rels/.rels', self.RELATIONSHIPS)
+            package.writestr('3D/3dmodel.model', "".join(model))
+
+        return f"Created 3MF File: {filename} ({len(self._objects)} Objects, {self.triangles} Triangles)"
 
 #
-# Create and Write an SVG Object to File with the Square Optical Illusion.
-#   savename        : Filename to Write
-#   width           : Width in pixels   (Number of Rectangles Wide)
-#   height          : Height in Pixels  (Number of Rectangles High)
-#   add_PNG         : Add the PNG loaded in Memory?, Default = No
-#   startX          : X Position Offset Start , Default = 0.0mm
-#   startY          : Y Position Offset Start , Default = 0.0 mm
-#   rect_width      : Width of Rectangles , Default = 20.0mm
-#   rect_height     : Height of Rectangles, Default = 20.0mm
-#   rect_radius_X   : Corner Radius on X  , Default = 25%
-#   rect_radius_Y   : Corner Radius on Y  , Default = 25%
+# Binary glTF (GLB) for browser previews, one node per OBJ file with a primitive per
+# material, optionally drawing the pixel boxes as instances of a single unit cube.
 #
-def create_svg(width, height, 
-               outline_only, 
-               use_real_colours = True, 
-               add_PNG = False, 
-               startX = 0.0, startY = 0.0, 
-               rect_width=20.0, rect_height=20.0, 
-               rect_radius_x = 25.0, rect_radius_y = 25.0):
+class GLBPackage:
     """
-    Create optical illusion-style SVG data using either diagonal or circular patterns.
+    Collect the geometry of every OBJ written in a run into a single GLB file.
+
+    Each OBJ file becomes a node whose mesh has one primitive per material, with
+    welded float32 positions and uint16/uint32 indices packed into the binary chunk.
+    No normals are stored, viewers compute flat normals for flat shaded boxes.
 
-    Optionally overlays a sprite image (from loaded PNG) and includes calculated offsets 
-    and styling based on real-world dimensions.
+    When instanced, boxes from create_primitive() are not unrolled: each node gets a
+    child per material drawing a shared unit cube through EXT_mesh_gpu_instancing,
+    with one translation and scale per box. Joints and meshed surfaces are still
+    written as geometry.
+
+    The scene is Z up in millimetres like the OBJ, so the root node turns it Y up and
+    scales it to metres as glTF expects.
 
     Args:
-        width (int): Grid width in number of rectangles.
-        height (int): Grid height in number of rectangles.
-        outline_only (bool): If True, omits fill colours and only renders borders.
-        use_real_colours (bool): If True, retains original pixel colour information.
-        add_PNG (bool): If True, overlays a sprite image onto the SVG illusion.
-        startX (float): Starting X offset in mm.
-        startY (float): Starting Y offset in mm.
-        rect_width (float): Width of each rectangle in mm.
-        rect_height (float): Height of each rectangle in mm.
-        rect_radius_x (float): Corner radius X (% of width).
-        rect_radius_y (float): Corner radius Y (% of height).
+        instanced (bool): Write boxes as instances of a unit cube.
+    """
 
-    Returns:
-        None. Appends data directly to SVG_DATA_LIST.
+    # Unit cube corners (bit 0 = x, bit 1 = y, bit 2 = z) and outward facing triangles
+    UNIT_CUBE_POSITIONS = tuple(float((corner >> axis) & 1) for corner in range(8) for axis in range(3))
+    UNIT_CUBE_INDICES = (0, 2, 3, 0, 3, 1, 4, 5, 7, 4, 7, 6, 0, 1, 5, 0, 5, 4,
+                         2, 6, 7, 2, 7, 3, 0, 4, 6, 0, 6, 2, 1, 3, 7, 1, 7, 5)
+
+    INSTANCING = "EXT_mesh_gpu_instancing"
+
+    def __init__(self, instanced=False):
+        self.instanced = instanced
+        self._objects = []
+        self.triangles = 0
+        self.instances = 0
+        self.start_object(None)
+
+    def start_object(self, name):
+        """
+        Start collecting a new node, None stops collecting.
+        """
+        self._name = name
+        self._meshes = {}
+        self._boxes = {}
+
+    def add(self, points, faces, material_index):
+        """
+        Add faces indexing into a flat x, y, z list of points, OBJ style (from 1).
+        """
+        if self._name is None:
+            return
+
+        mesh = self._meshes.get(material_index)
+        if mesh is None:
+            mesh = self._meshes[material_index] = ({}, array('f'), array('I'))
+
+        lookup, positions, indices = mesh
+        ids = []
+
+        for index in range(0, len(points), 3):
+            key = (points[index], points[index + 1], points[index + 2])
+            vertex = lookup.get(key)
+            if vertex is None:
+                vertex = lookup[key] = len(lookup)
+                positions.extend(key)
+            ids.append(vertex)
+
+        for face in faces:
+            for k in range(1, len(face) - 1):
+                indices.extend((ids[face[0] - 1], ids[face[k] - 1], ids[face[k + 1] - 1]))
+
+    def add_box(self, points, material_index):
+        """
+        Add the axis aligned box spanned by a flat x, y, z list of points as an instance.
+        """
+        if self._name is None:
+            return
+
+        translations, scales = self._boxes.setdefault(material_index, (array('f'), array('f')))
+
+        for axis in range(3):
+            low, high = min(points[axis::3]), max(points[axis::3])
+            translations.append(low)
+            scales.append(high - low)
+
+    def finish_object(self, keep=True):
+        """
+        Close the current node, keeping it unless keep is False or it is empty.
+        """
+        if self._name is not None and keep and (self._meshes or self._boxes):
+            meshes = {material_index: (positions, indices)
+                      for material_index, (_, positions, indices) in self._meshes.items()}
+            self._objects.append((self._name, meshes, self._boxes))
+
+        self.start_object(None)
+
+    def extend(self, other):
+        """
+        Append the nodes collected by another package, e.g. from a layer worker.
+        """
+        self._objects += other._objects
+
+    def close(self, filename):
+        """
+        Write the GLB file and return a log line describing it.
+
+        Globals:
+            mtl_colour_index (dict): Hex colour code -> material index, for the materials.
+        """
+        binary = bytearray()
+        gltf = {
+            "asset": {"version": "2.0", "generator": "PNG2OBJ.py - https://github.com/muckypaws/PNG2OBJ"},
+            "scene": 0,
+            "scenes": [{"nodes": [0]}],
+            "nodes": [{"name": Path(filename).stem, "rotation": [-math.sqrt(0.5), 0.0, 0.0, math.sqrt(0.5)],
+                       "scale": [0.001, 0.001, 0.001], "children": []}],
+            "meshes": [],
+            "materials": [],
+            "accessors": [],
+            "bufferViews": [],
+        }
+
+        def accessor(values, kind, target=None):
+            # Pack values into their own 4 byte aligned buffer view and describe them
+            offset = len(binary)
+            binary.extend(values.tobytes())
+            binary.extend(bytes(-len(binary) % 4))
+
+            view = {"buffer": 0, "byteOffset": offset, "byteLength": values.nbytes}
+            if target is not None:
+                view["target"] = target
+            gltf["bufferViews"].append(view)
+
+            description = {"bufferView": len(gltf["bufferViews"]) - 1, "count": len(values),
+                           "type": kind, "componentType": 5126}
+            if kind == "VEC3":
+                description["min"] = values.min(axis=0).tolist()
+                description["max"] = values.max(axis=0).tolist()
+            elif values.dtype == np.uint16:
+                description["componentType"] = 5123
+            else:
+                description["componentType"] = 5125
+            gltf["accessors"].append(description)
+
+            return len(gltf["accessors"]) - 1
+
+        def indices(values):
+            values = np.frombuffer(values, dtype=np.uint32) if isinstance(values, array) else np.array(values, dtype=np.uint32)
+            if values.size and values.max() < 65535:
+                values = values.astype(np.uint16)
+            return accessor(values, "SCALAR", 34963)
+
+        def vectors(values, target=None):
+            return accessor(np.frombuffer(values, dtype=np.float32).reshape(-1, 3), "VEC3", target)
+
+        # Materials follow the MTL numbering, glTF colours are linear
+        colours = {index: code for code, index in mtl_colour_index.items()}
+        for index in range(max(list(colours) + [0]) + 1):
+            code = int(colours.get(index, "#ffffff")[1:], 16)
+            srgb = [((code >> shift) & 0xFF) / 255 for shift in (16, 8, 0)]
+            linear = [c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4 for c in srgb]
+            gltf["materials"].append({"name": str(index), "pbrMetallicRoughness": {
+                "baseColorFactor": linear + [1.0], "metallicFactor": 0.0, "roughnessFactor": 1.0}})
+
+        cube_meshes = {}
+
+        for name, meshes, boxes in self._objects:
+            node = {"name": name}
+
+            if meshes:
+                primitives = []
+                for material_index, (positions, faces) in meshes.items():
+                    primitives.append({"attributes": {"POSITION": vectors(positions, 34962)},
+                                       "indices": indices(faces), "material": material_index})
+                    self.triangles += len(faces) // 3
+                gltf["meshes"].append({"name": name, "primitives": primitives})
+                node["mesh"] = len(gltf["meshes"]) - 1
+
+            children = []
+            for material_index, (translations, scales) in boxes.items():
+                if not cube_meshes:
+                    cube_meshes["POSITION"] = vectors(array('f', self.UNIT_CUBE_POSITIONS), 34962)
+                    cube_meshes["indices"] = indices(self.UNIT_CUBE_INDICES)
+
+                if material_index not in cube_meshes:
+                    gltf["meshes"].append({"name": f"Pixel_{material_index}", "primitives": [{
+                        "attributes": {"POSITION": cube_meshes["POSITION"]},
+                        "indices": cube_meshes["indices"], "material": material_index}]})
+                    cube_meshes[material_index] = len(gltf["meshes"]) - 1
+
+                gltf["nodes"].append({"name": f"{name}_{material_index}", "mesh": cube_meshes[material_index],
+                                      "extensions": {self.INSTANCING: {"attributes": {
+                                          "TRANSLATION": vectors(translations), "SCALE": vectors(scales)}}}})
+                children.append(len(gltf["nodes"]) - 1)
+                self.instances += len(translations) // 3
+
+            if children:
+                node["children"] = children
+
+            gltf["nodes"].append(node)
+            gltf["nodes"][0]["children"].append(len(gltf["nodes"]) - 1)
+
+        if self.instances:
+            gltf["extensionsUsed"] = [self.INSTANCING]
+            gltf["extensionsRequired"] = [self.INSTANCING]
+
+        gltf["buffers"] = [{"byteLength": len(binary)}]
+
+        content = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+        content += b" " * (-len(content) % 4)
+
+        with open(filename, 'wb') as fp_glb:
+            fp_glb.write(struct.pack('<III', 0x46546C67, 2, 12 + 8 + len(content) + 8 + len(binary)))
+            fp_glb.write(struct.pack('<II', len(content), 0x4E4F534A))
+            fp_glb.write(content)
+            fp_glb.write(struct.pack('<II', len(binary), 0x004E4942))
+            fp_glb.write(binary)
+
+        return f"Created GLB File: {filename} ({len(self._objects)} Objects, {self.triangles} Triangles, {self.instances} Instances)"
+
+def startMeshExports(obj_file):
+    """
+    Begin the STL file and 3MF object for the OBJ file about to be written, when enabled.
 
     Globals:
-        SVG_DATA_LIST (list[str]): The main buffer collecting final SVG fragment data.
-        ILLUSION_TYPE_CIRCLE (bool): Switch between circular vs diagonal grid illusion.
-        Image_Real_Width (int): Width of loaded PNG (for offsetting sprite overlay).
-        Image_Real_Height (int): Height of loaded PNG.
+        Stl_Output_Mode (str): Set by --stl.
+        Stl_Mesh (StlWriter): Set to the new writer, or None.
+        Model_3MF, Model_GLB: Start a new object named after the OBJ file.
+    """
+    global Stl_Mesh
 
-    TODO:
-        - Parameterise illusion type via argument instead of global
-        - Add validation for grid/offset sizes
-        - Split fill/light/dark logic into helper functions
+    Stl_Mesh = StlWriter(str(Path(obj_file).with_suffix('.stl'))) if Stl_Output_Mode else None
+
+    for package in (Model_3MF, Model_GLB):
+        if package is not None:
+            package.start_object(Path(obj_file).stem)
+
+def finishMeshExports(write=True):
     """
-    global SVG_DATA_LIST, ILLUSION_TYPE_CIRCLE
+    Write the current STL file and close the current 3MF/GLB object, unless write is False.
+    """
+    global Stl_Mesh
 
-    totalWidth = rect_width * width + abs(startX * 2)
-    totalHeight = rect_height * height + abs(startY * 2)
+    if Stl_Mesh is not None and write:
+        log(Stl_Mesh.close())
 
-    # Update the Canvas size, just incase...     
-    update_svg_canvas_dimensions(totalWidth, totalHeight)
+    for package in (Model_3MF, Model_GLB):
+        if package is not None:
+            package.finish_object(write)
 
+    Stl_Mesh = None
 
-    # Create Illusion Data
-    if ILLUSION_TYPE_CIRCLE:
-        fill_group, light_group, dark_group = create_svg_illusion_data_circular(outline_only,
-                                                                                width, height,
-                                                                                rect_width, rect_height,
-                                                                                rect_radius_x, rect_radius_y,
-                                                                                startX, startY)
-    else:
-        fill_group, light_group, dark_group = create_svg_illusion_data_diagonals(outline_only,
-                                                                                 width, height,
-                                                                                 rect_width, rect_height,
-                                                                                 rect_radius_x, rect_radius_y,
-                                                                                 startX, startY)
+def exportMesh(points, faces, material_index, box=False):
+    """
+    Pass faces on to every binary output enabled for the current OBJ file.
 
-    if not outline_only:
-        SVG_DATA_LIST.append(''.join(fill_group))
+    Args:
+        points (list): Flat x, y, z coordinates.
+        faces (list): Faces indexing points, OBJ style (from 1).
+        material_index (int): Material of the faces.
+        box (bool): True when the points are an axis aligned box (a cube primitive),
+                    which GLB output may write as an instance.
+    """
+    if Stl_Mesh is not None:
+        Stl_Mesh.add(points, faces)
 
-    SVG_DATA_LIST.append(''.join(dark_group))
-    SVG_DATA_LIST.append(''.join(light_group))
+    if Model_3MF is not None:
+        Model_3MF.add(points, faces, material_index)
+
+    if Model_GLB is not None:
+        if box and Model_GLB.instanced:
+            Model_GLB.add_box(points, material_index)
+        else:
+            Model_GLB.add(points, faces, material_index)
 
-    if add_PNG:
-        offsetX = math.ceil((width - Image_Real_Width) / 2)
-        offsetY = math.ceil((height - Image_Real_Height) / 2)
-        sprite_Data = create_svg_data_for_loaded_PNG(outline_only, use_real_colours,
-                                                     offsetX, offsetY,
-                                                     rect_width , rect_height,
-                                                     rect_radius_x, rect_radius_y,
-                                                     startX, startY)
-        SVG_DATA_LIST.append(''.join(sprite_Data))
 
 #
-# Create SVG Data for the Optical Illusion
+# Write a run of pixels, either straight away or through a mesher
 #
-def create_svg_rect_Grid(outline_only = False,
-                         width = 20, height = 20,
-                         rect_width=20.0, rect_height=20.0,
-                         rect_radius_x = 25, rect_radius_y = 25,
-                         offsetX = 0.0, offsetY = 0.0,
-                         fillcolour1 = "#020078",
-                         fillcolour2 = "#3F53FF"):
+def emitPixelRun(mesher, primitive_x, primitive_y, width, material_index, primitive_y_multiplier):
     """
-    Generate a rectangular grid of SVG <rect> elements, with alternating fill colours.
+    Return the OBJ data for a horizontal run of pixels found by processFile().
 
-    Used to build visual background or illusion patterns by alternating between two
-    colour values and separating them into 'light' and 'dark' groups.
+    Without a mesher the run is written as its own primitive. With one, the run is
+    handed over to be merged with the rows below and nothing is returned yet.
 
     Args:
-        outline_only (bool): If True, disables fill and applies stroke-only style.
-        width (int): Number of rectangles across the X-axis.
-        height (int): Number of rectangles down the Y-axis.
-        rect_width (float): Width of each rectangle in mm.
-        rect_height (float): Height of each rectangle in mm.
-        rect_radius_x (float): Rounded corner radius X (%).
-        rect_radius_y (float): Rounded corner radius Y (%).
-        offsetX (float): Horizontal offset in mm.
-        offsetY (float): Vertical offset in mm.
-        fillcolour1 (str): Primary colour hex code.
-        fillcolour2 (str): Secondary colour hex code.
+        mesher (GreedyRectangleMesher, VoxelSurfaceMesher, ContourExtrusionMesher or None):
+                                   Active mesher when --greedy, --surface or --contour is set.
+        primitive_x (int): Start X of the run.
+        primitive_y (int): Y of the run.
+        width (int): Run length in pixels.
+        material_index (int): Material ID for usemtl.
+        primitive_y_multiplier (float): Height multiplier for the run.
 
     Returns:
-        tuple: Two lists of SVG strings — (light_group, dark_group)
-
-    Globals:
-        SVG_GRID_COUNT (int): Tracks total number of rectangles generated.
-
-    TODO:
-        - Consider splitting light/dark group logic into a reusable helper
-        - Allow `fillcolour1` and `fillcolour2` to accept lists for multi-colour cycling
-        - Evaluate performance on very large grids
+        str: OBJ data to write, empty while the mesher holds the run.
     """
-    global SVG_GRID_COUNT
-    # Dark and Light Groups
-    dark_group = ['\t<g id="DarkGroup">\n']
-    light_group = ['\t<g id="LightGroup">\n']
-
-    for y in range(int(height)):
-        current_y = (y * rect_height) + offsetY
-        for x in range(int(width)):
-            current_x = (x * rect_width) + offsetX
-            fill_color = fillcolour1 if (x % 2) == (y % 2) else fillcolour2
+    if mesher is None:
+        return create_primitive(primitive_x, primitive_y, width, 1, cube_vertices, cube_faces, cube_normals,
+                                False, material_index, primitive_y_multiplier)
 
-            # Generate random base values for RGB within the range 0-63
-            #r, g, b = [random.randint(0, 63) for _ in range(3)]
+    mesher.add(primitive_x, primitive_y, width, material_index, primitive_y_multiplier)
+    return ""
 
-            # Determine the offset based on the parity of x and y
-            #offset = 16 if (x % 2) == (y % 2) else 164
 
-            # Apply the offset to each color component
-            #r, g, b = [value + offset for value in (r, g, b)]
+#
+# Decide which rings or diagonals of an Optical Illusion are drawn
+#
+def illusion_streaks(count :int, threshold :int, max_streak :int, max_gap :int, rng = random):
+    """
+    Choose on/off for count consecutive rings or diagonals, keeping the runs short.
 
-            # Format the final color as a hex string
-            #fill_color = "#{:02x}{:02x}{:02x}".format(r, g, b)
-            
-            group = dark_group if fill_color == fillcolour1 else light_group
+    One random number in 0..10 is drawn per entry, above threshold asks for the entry
+    to be drawn. Runs of drawn entries end once longer than max_streak, runs of skipped
+    entries once longer than max_gap.
 
-            if not outline_only:
-                newObj = add_svg_rectangle("",current_x, current_y, rect_width, rect_height, rect_radius_x, rect_radius_y, fill_color)
-            else:
-                newObj = add_svg_rectangle("",current_x, current_y, rect_width, rect_height, rect_radius_x, rect_radius_y, fill_color, 0, 0.25)
-            
-            group.append(newObj)
-            SVG_GRID_COUNT += 1
+    Args:
+        count (int): Number of entries to decide.
+        threshold (int): Random value an entry must exceed to be drawn.
+        max_streak (int): Longest run of drawn entries.
+        max_gap (int): Longest run of skipped entries.
+        rng (random.Random): Source of the random numbers, the random module by default.
 
-    dark_group.append("\t</g>\n")
-    light_group.append("\t</g>\n")
+    Returns:
+        numpy.ndarray: Boolean array of length count, True where drawn.
+    """
+    drawn = np.zeros(count, dtype=bool)
+    streak = gap = 0
+
+    for index in range(count):
+        if rng.randint(0, 10) > threshold:
+            streak, gap = streak + 1, 0
+            drawn[index] = streak <= max_streak
+            if not drawn[index]:
+                streak, gap = 0, 1
+        else:
+            gap, streak = gap + 1, 0
+            drawn[index] = gap > max_gap
+            if drawn[index]:
+                streak, gap = 1, 0
 
-    return light_group, dark_group
+    return drawn
 
 #
-# clip the coords for inside the canvas.
+# Circles for the Optical Illusion as a boolean mask
 #
-def ClipDimensions(rect_x, rect_y, rect_width, rect_height, offsetX, offsetY):
+def illusion_circle_mask(width :int, height :int, rng = random):
     """
-    Clip a rectangle's dimensions to ensure it stays within the valid SVG canvas boundaries.
+    Build the concentric circle pattern of the circular illusion as a boolean mask.
 
-    This function adjusts the rectangle's position and size based on the provided offset
-    and current global SVG canvas dimensions.
+    Every cell is given the radius of the Bresenham (midpoint) circle passing through
+    it from an integer distance field. With d² the squared distance from the centre and
+    m the larger of |dx| and |dy|, the circle of radius r plots the cell when
+    d² - m <= r² < d² + m, so r = isqrt(d² + m - 1). Cells between two circles have no
+    radius and are never drawn. Which radii are drawn is decided by illusion_streaks().
 
     Args:
-        rect_x (float): X-coordinate of the rectangle's top-left corner.
-        rect_y (float): Y-coordinate of the rectangle's top-left corner.
-        rect_width (float): Requested width of the rectangle in mm.
-        rect_height (float): Requested height of the rectangle in mm.
-        offsetX (float): Horizontal margin in mm.
-        offsetY (float): Vertical margin in mm.
+        width (int): Grid width in cells.
+        height (int): Grid height in cells.
+        rng (random.Random): Source of the random numbers, the random module by default.
 
     Returns:
-        tuple: (adjusted_x, adjusted_y, clipped_width, clipped_height)
+        numpy.ndarray: Boolean (height, width) array, True where a circle passes.
 
     Globals:
-        SVG_CANVAS_WIDTH (float): Total width of the SVG canvas.
-        SVG_CANVAS_HEIGHT (float): Total height of the SVG canvas.
-
-    TODO:
-        - Move SVG_CANVAS_WIDTH/HEIGHT to parameters for testability
-        - Document caller behaviour for rectangles that get fully clipped
+        ILLUSION_MAX_STREAK (int): Max run of circles before toggling.
     """
-    req_width = rect_width
-    req_height = rect_height
+    drawn = illusion_streaks(width + height, 3, ILLUSION_MAX_STREAK - 1, ILLUSION_MAX_STREAK, rng)
 
-    # Clip Illusion Squares to image when in frame mode.
-    if rect_x < offsetX:
-        rect_x = offsetX
-        req_width = rect_width - offsetX
-
-    if rect_x + req_width > SVG_CANVAS_WIDTH - offsetX:
-        req_width = SVG_CANVAS_WIDTH - offsetX - rect_x
-
-    if rect_y < offsetY:
-        rect_y = offsetY
-        req_height= rect_height - offsetY
+    dy, dx = np.ogrid[:height, :width]
+    dx = np.abs(dx - width // 2).astype(np.int64)
+    dy = np.abs(dy - height // 2).astype(np.int64)
 
-    if rect_y + req_height > SVG_CANVAS_HEIGHT - offsetY:
-        req_height = SVG_CANVAS_HEIGHT - offsetY - rect_y
+    distance = dx * dx + dy * dy
+    major = np.maximum(dx, dy)
 
-    return rect_x, rect_y, req_width, req_height
+    # Integer square root, corrected for float rounding on large values
+    limit = np.maximum(distance + major - 1, 0)
+    radius = np.sqrt(limit).astype(np.int64)
+    radius -= radius * radius > limit
+    radius += (radius + 1) * (radius + 1) <= limit
 
+    return (radius * radius >= distance - major) & drawn[radius]
 
 #
-# Create SVG Data for the Optical Illusion - circles...
+# Diagonals for the Optical Illusion as a boolean mask
 #
-def create_svg_illusion_data_circular(outline_only = False, width = 20, height = 20, rect_width=20.0, rect_height=20.0, rect_radius_x = "25%", rect_radius_y = "25%", offsetX = 0.0, offsetY = 0.0):
+def illusion_diagonal_mask(width :int, height :int, rng = random):
     """
-    Generate an SVG data grid with a circular optical illusion effect using concentric raster lines.
-    
-    Alternates between visible and skipped circles to create a vibration-like illusion.
+    Build the diagonal line pattern of the diagonal illusion as a boolean mask.
+
+    The squares of the diagonal illusion sit on the grid corners, so the mask covers
+    (width + 1) x (height + 1) cells. Cell (x, y) lies on diagonal x + y, which is
+    drawn or not as decided by illusion_streaks().
 
     Args:
-        outline_only (bool): If True, disables fill and renders stroke-only rectangles.
         width (int): Grid width in cells.
         height (int): Grid height in cells.
-        rect_width (float): Width of each rectangle in mm.
-        rect_height (float): Height of each rectangle in mm.
-        rect_radius_x (str): Corner rounding percentage on X (e.g., "25%").
-        rect_radius_y (str): Corner rounding percentage on Y (e.g., "25%").
-        offsetX (float): Horizontal offset in mm.
-        offsetY (float): Vertical offset in mm.
+        rng (random.Random): Source of the random numbers, the random module by default.
 
     Returns:
-        tuple: (fill_group, light_group, dark_group) — SVG <g> sections.
+        numpy.ndarray: Boolean (height + 1, width + 1) array, True where a line is drawn.
 
     Globals:
-        SVG_ILLUSION_ARRAY (list): 2D array of raster pattern.
-        SVG_DARK_COUNT (int): Total number of dark illusion blocks drawn.
-        SVG_LIGHT_COUNT (int): Total number of light blocks.
-        ILLUSION_MAX_STREAK (int): Max run of lines before toggling.
-        SVG_ILLUSION_COLOUR_TABLE (list): Colour palette.
-        DARK_BLOCK_INDEX (int): Index of dark block colour.
-        LIGHT_BLOCK_INDEX (int): Index of light block colour.
+        ILLUSION_MAX_STREAK (int): Controls visual rhythm of the pattern.
+    """
+    drawn = illusion_streaks(width + height + 1, 5, ILLUSION_MAX_STREAK, ILLUSION_MAX_STREAK, rng)
 
-    TODO:
-        - Parameterise ILLUSION_MAX_STREAK instead of relying on global
-        - Move ClipDimensions() and rectangle calc into reusable helper
-        - Refactor to separate illusion generation from rendering loop
+    dy, dx = np.ogrid[:height + 1, :width + 1]
+
+    return drawn[dx + dy]
+
+#
+# Fetch an Optical Illusion mask, reusing seeded masks from the cache
+#
+def illusion_mask(circular :bool, width :int, height :int):
     """
-    global SVG_ILLUSION_ARRAY, SVG_DARK_COUNT, SVG_LIGHT_COUNT
+    Return the circle or diagonal illusion mask for a width x height grid.
 
-    width = int(width)
-    height = int(height)
+    Without a seed a new pattern is drawn from the random module every time. A seeded
+    pattern only depends on grid size, type, ILLUSION_MAX_STREAK and seed, so it is built
+    once with its own random.Random(seed) and kept in ILLUSION_MASK_CACHE. With a cache
+    folder it is also saved there bit-packed (np.packbits, one bit per cell), letting
+    later runs with other colour sets or overlays reuse it.
 
-    size = max(width, height)
-    SVG_ILLUSION_ARRAY = create_array(size)
+    Args:
+        circular (bool): Circle mask if True, diagonal mask otherwise.
+        width (int): Grid width in cells.
+        height (int): Grid height in cells.
 
-    # Centre Point of Array
-    cx = width / 2
-    cy = height / 2
+    Returns:
+        numpy.ndarray: Boolean mask, see illusion_circle_mask() and illusion_diagonal_mask().
 
-    # Main Optical Illusion Drawing Group
-    fill_group = [f'\t<g id="OpticalIllusionGroup">\n']
-    
-    half_rect_width = (rect_width / 2)
-    half_rect_height = (rect_height / 2)
+    Globals:
+        ILLUSION_SEED (int): Pattern seed, None for unseeded.
+        ILLUSION_MASK_CACHE (dict): Masks built so far this run.
+        ILLUSION_CACHE_FOLDER (str): Folder for the bit-packed masks, empty to keep none.
+        ILLUSION_MAX_STREAK (int): Part of the cache key.
+    """
+    build = illusion_circle_mask if circular else illusion_diagonal_mask
 
-    totalWidth = rect_width * width + abs(offsetX)
-    totalHeight = rect_height * height + abs(offsetY)
-    update_svg_canvas_dimensions(totalWidth, totalHeight)
+    if ILLUSION_SEED is None:
+        return build(width, height)
 
-    #
-    # Create Circles of Data in Array
-    #
-    circle_streak = none_circle_streak = 0
-    draw_circles = False
+    key = (width, height, "circle" if circular else "diagonal", ILLUSION_MAX_STREAK, ILLUSION_SEED)
 
-    max_radius = width + height
-    circle_streak = none_circle_streak = 0
+    mask = ILLUSION_MASK_CACHE.get(key)
+    if mask is not None:
+        return mask
 
-    for radius in range(max_radius):
-        rand = random.randint(0,10)
+    rows, columns = (height, width) if circular else (height + 1, width + 1)
+    filename = ""
 
-        if rand > 3:
-            circle_streak, none_circle_streak = circle_streak + 1, 0
-            draw_circles = circle_streak < ILLUSION_MAX_STREAK
-            if not draw_circles:
-                circle_streak = 0
-                none_circle_streak = 1
-        else:
-            none_circle_streak, circle_streak = none_circle_streak + 1, 0
-            draw_circles = none_circle_streak > ILLUSION_MAX_STREAK
-            if draw_circles:
-                circle_streak = 1
-                none_circle_streak = 0
-
-        if draw_circles:
-            draw_circle(SVG_ILLUSION_ARRAY, cx, cy, radius)
-
-    print_array(SVG_ILLUSION_ARRAY)
-
-    fill_group = [f'\t<g id="OpticalIllusionCirclesAll">\n']
-    for y in range (height):
-        for x in range(width):
-            sample = SVG_ILLUSION_ARRAY[y][x]
-            if sample != " ":
-                fillColour = "#000000"
-                SVG_DARK_COUNT += 1
-            else:
-                fillColour = "#ffffff"
-                SVG_LIGHT_COUNT += 1
-                    
-            rect_x = x * rect_width - half_rect_width + offsetX
-            rect_y = y * rect_height - half_rect_height + offsetY
+    if ILLUSION_CACHE_FOLDER:
+        filename = os.path.join(ILLUSION_CACHE_FOLDER, "illusion_{}x{}_{}_streak{}_seed{}.npy".format(*key))
 
-            rect_x, rect_y, req_width, req_height = ClipDimensions(rect_x, rect_y, rect_width, rect_height, offsetX, offsetY)
-                
-            if not outline_only:
-                newObj = add_svg_rectangle("",rect_x, rect_y,req_width, req_height, 0, 0, fillColour)
-            else:
-                newObj = add_svg_rectangle("",rect_x, rect_y,req_width, req_height, 0, 0, fillColour, 0, 0.5)
-            fill_group.append(newObj)
+        # A damaged or stale file is rebuilt and overwritten below
+        if os.path.exists(filename):
+            try:
+                packed = np.load(filename)
+                if packed.dtype == np.uint8 and packed.shape == (rows, (columns + 7) // 8):
+                    mask = np.unpackbits(packed, axis=1, count=columns).astype(bool)
+            except (OSError, ValueError, EOFError) as error:
+                print(f"⚠️ Ignoring unreadable illusion mask {filename}: {error}")
 
-    fill_group.append('\t</g>\n')
+    if mask is None:
+        mask = build(width, height, random.Random(ILLUSION_SEED))
 
-    light_group, dark_group = create_svg_rect_Grid(outline_only, 
-                                                   width, height,
-                                                   rect_width, rect_height,
-                                                   rect_radius_x, rect_radius_y,
-                                                   offsetX, offsetY,
-                                                   SVG_ILLUSION_COLOUR_TABLE[DARK_BLOCK_INDEX],
-                                                   SVG_ILLUSION_COLOUR_TABLE[LIGHT_BLOCK_INDEX])
- 
-    return fill_group, light_group, dark_group
+        if filename:
+            try:
+                os.makedirs(ILLUSION_CACHE_FOLDER, exist_ok=True)
+                np.save(filename, np.packbits(mask, axis=1))
+            except OSError as error:
+                print(f"⚠️ Failed to save illusion mask {filename}: {error}")
 
+    ILLUSION_MASK_CACHE[key] = mask
+
+    return mask
 
 #
-# Create SVG Data for the Optical Illusion
+# Write the SVG File, streaming the content to it as it is generated.
 #
-def create_svg_illusion_data_diagonals(outline_only = False, width = 20, height = 20, rect_width=20.0, rect_height=20.0, rect_radius_x = "25%", rect_radius_y = "25%", offsetX = 0.0, offsetY = 0.0):
+# TODO: Externalise header and root <svg> attributes for templating flexibility
+def svg_savefile(savename, render):
     """
-    Generate SVG illusion data based on diagonal line patterns.
+    Write an SVG file: header first, then whatever render() generates, then the close tag.
 
-    Creates a grid of rectangles where each diagonal is conditionally filled or skipped
-    to produce a wobble or flicker illusion effect. The output is structured in groups
-    labelled by coordinate for post-processing or SVG manipulation.
+    The canvas must already be sized (see svg_canvas_for_illusion() and
+    svg_canvas_for_PNG()) as the root <svg> element is written before any content.
+    While render() runs SVG_Writer is open, and every group is streamed to the
+    file through its bounded buffer rather than being held in memory.
 
     Args:
-        outline_only (bool): If True, uses stroke-only rectangles.
-        width (int): Number of rectangles across.
-        height (int): Number of rectangles down.
-        rect_width (float): Width of each rectangle in mm.
-        rect_height (float): Height of each rectangle in mm.
-        rect_radius_x (str): Horizontal corner radius as percentage string.
-        rect_radius_y (str): Vertical corner radius as percentage string.
-        offsetX (float): Horizontal grid offset.
-        offsetY (float): Vertical grid offset.
+        savename (str): Output path and filename for the SVG file.
+        render (callable): Called with no arguments to generate the content.
 
     Returns:
-        tuple: (fill_group, light_group, dark_group)
+        None. Writes the file to disk.
 
     Globals:
-        SVG_DARK_COUNT (int): Counter for dark block rectangles.
-        SVG_LIGHT_COUNT (int): Counter for light block rectangles.
-        SVG_ILLUSION_COLOUR_TABLE (list[str]): Colour options.
-        ILLUSION_MAX_STREAK (int): Controls visual rhythm of the pattern.
-
-    TODO:
-        - Add parameter to control diagonal direction (currently fixed)
-        - Refactor inner loop and draw decision logic into helper
-        - Consider exposing fill/stroke style per-diagonal group
+        SVG_CANVAS_WIDTH (float): Width of the canvas in mm.
+        SVG_CANVAS_HEIGHT (float): Height of the canvas in mm.
+        SVG_Writer (ObjTextWriter): Set to the open file while render() runs.
+        SVG_USE_SYMBOLS (bool): Tiles are <use> references, their <defs> are written
+                                after the content once every distinct tile is known.
+        SVG_SYMBOLS (dict): Tiles defined so far, emptied for each file.
+        SVG_HEADER (str): XML + DOCTYPE declaration.
+        DEBUG (bool): Controls detailed error output.
     """
-    global SVG_LIGHT_COUNT, SVG_DARK_COUNT
-
-    width = int(width)
-    height = int(height)
+    global SVG_Writer
 
-    # Loop Counter to ensure we get all diagonals.
-    max_range = int(width + height + 1)
+    SVG_SYMBOLS.clear()
+    namespaces = 'xmlns="http://www.w3.org/2000/svg"'
+    if SVG_USE_SYMBOLS:
+        namespaces += ' xmlns:xlink="http://www.w3.org/1999/xlink"'
 
-    # Main Optical Illusion Drawing Group
-    fill_group = [f'\t<g id="OpticalIllusionGroup">\n']
-
-    half_rect_width = rect_width / 2
-    half_rect_height = rect_height / 2
-
-    totalWidth = rect_width * width + abs(offsetX)
-    totalHeight = rect_height * height + abs(offsetY)
-    update_svg_canvas_dimensions(totalWidth, totalHeight)
-
-
-    light_group, dark_group = create_svg_rect_Grid(outline_only,
-                                                   width, height, rect_width, rect_height,
-                                                   rect_radius_x, rect_radius_y,
-                                                   offsetX, offsetY,
-                                                   SVG_ILLUSION_COLOUR_TABLE[DARK_BLOCK_INDEX],
-                                                   SVG_ILLUSION_COLOUR_TABLE[LIGHT_BLOCK_INDEX])
+    try:
+        output_path = Path(savename).resolve()
 
-    if outline_only:
-        return [], light_group, dark_group
+        with ObjTextWriter(output_path, encoding="utf-8") as SVG_Writer:
+            SVG_Writer.write(SVG_HEADER)
+            SVG_Writer.write(f'<svg width="{SVG_CANVAS_WIDTH:.2f}mm" height="{SVG_CANVAS_HEIGHT:.2f}mm" {namespaces}>\n')
+            render()
+            svg_write(svg_symbol_defs())
+            SVG_Writer.write('</svg>\n')
 
-    line_streak = none_line_streak = 0
-    draw_line = False
+        print(f"\n✅ Written file: {output_path}")
 
-    # Loop Across the Object
-    for x in range(max_range):
-        # The Start Y Position will typically be Zero, when it moves to the right of the Width, 
-        # We start offseting the Y position on Grid to be max Width, Y = 0 -> HEIGHT
-        # Just a trick without additional loops.
-        # range_x is fixed to all columns up to maximum column width
-        start_y = int(max(0, x - width))
-        range_x = int(min(x, width))
-        
-        # Label up each of the Diagonal Groups with their start X,Y Coords
-        # Diagonals set from Top Right to Bottom Left
-        fill_group.append(f'\t\t<g id="DiagonalGroup{range_x}:{start_y}">\n')
-        # Set a random Colour
-        rand = random.randint(0, 10)
-        fill_color = (
-            "#000000" if rand <= 7 else
-            "#ffffff"
-        )
+    except PermissionError:
+        print(f"❌ Permission denied when writing to {savename}. Is it open in another application?")
+        if DEBUG:
+            print('Error on line {}'.format(sys.exc_info()[-1].tb_lineno), type(error).__name__, error)
+    except IOError as error:
+        print(f"❌ File I/O error: {error}")
+        if DEBUG:
+            print('Error on line {}'.format(sys.exc_info()[-1].tb_lineno), type(error).__name__, error)
+    except Exception as error:
+        print(f"❌ Unexpected error: {error}")
+        if DEBUG:
+            print('Error on line {}'.format(sys.exc_info()[-1].tb_lineno), type(error).__name__, error)
+    finally:
+        SVG_Writer = None
 
-        # Determine if a diagonal line should be drawn
+#
+# Stream SVG fragments to the file being written
+#
+def svg_write(*groups):
+    """
+    Write SVG groups to SVG_Writer as they are generated.
 
-        # Try Black if greater than five and less than streak
-        if rand > 5:
-            line_streak, none_line_streak = line_streak + 1, 0
-            draw_line = line_streak <= ILLUSION_MAX_STREAK
-            if not draw_line:
-                line_streak = 0
-                none_line_streak = 1
-                #draw_line = True
-        else:
-            none_line_streak, line_streak = none_line_streak + 1, 0
-            draw_line = none_line_streak > ILLUSION_MAX_STREAK
-            if draw_line:
-                line_streak = 1
-                none_line_streak = 0
-                draw_line = True
+    Args:
+        *groups (iterable[str]): Lists or generators of SVG fragments, written in order.
 
-        
-        fill_color = (
-            "#000000" if draw_line else
-            "#ffffff"
-        )
+    Globals:
+        SVG_Writer (ObjTextWriter): The open SVG file.
+    """
+    for group in groups:
+        for fragment in group:
+            SVG_Writer.write(fragment)
 
-        # Lets do the work.
-        for xpos in range(range_x, -1, -1):
-            # Check if we're in range of the grid.
-            if xpos <= width and start_y <= height:
-                rect_x = xpos * rect_width - half_rect_width + offsetX
-                rect_y = start_y * rect_height - half_rect_height + offsetY
+#
+# Place a tile through <use>, defining it the first time it is seen
+#
+def svg_symbol(shape, x, y):
+    """
+    Return a <use> element placing a shape at (x, y).
 
+    Args:
+        shape (str): Element name and attributes of the tile drawn at the origin,
+                     e.g. 'rect width="20.000mm" height="20.000mm" fill="#000000" '.
+        x (float): X-position in mm.
+        y (float): Y-position in mm.
 
-                rect_x, rect_y, req_width, req_height = ClipDimensions(rect_x, rect_y, rect_width, rect_height, offsetX, offsetY)
-                
+    Returns:
+        str: The <use> element.
 
-                if draw_line:
-                    SVG_DARK_COUNT += 1
-                else:
-                    SVG_LIGHT_COUNT += 1
+    Globals:
+        SVG_SYMBOLS (dict): Shape -> id, a new id is added for a new shape.
+    """
+    symbol = SVG_SYMBOLS.get(shape)
+    if symbol is None:
+        symbol = SVG_SYMBOLS[shape] = f"t{len(SVG_SYMBOLS)}"
 
-                if not outline_only:
-                    newObj = '\t'+add_svg_rectangle("",rect_x, rect_y,
-                                                    req_width, req_height,
-                                                    0, 0, fill_color)
-                else:
-                    newObj = '\t'+add_svg_rectangle("",rect_x, rect_y,
-                                                    req_width, req_height,
-                                                    0, 0, fill_color, 0, 1.0)
+    return f'\t\t<use xlink:href="#{symbol}" x="{x:.3f}mm" y="{y:.3f}mm"/>\n'
 
-                fill_group.append(newObj)
-                start_y += 1
+#
+# The <defs> block for the tiles placed by svg_symbol()
+#
+def svg_symbol_defs():
+    """
+    Return the <defs> element defining every tile used, or nothing if none were.
 
-        fill_group.append('\t\t</g>\n')
+    Returns:
+        list[str]: SVG fragments.
+    """
+    if not SVG_SYMBOLS:
+        return []
 
-    fill_group.append('\t</g>\n')
+    defs = ['\t<defs>\n']
+    for shape, symbol in SVG_SYMBOLS.items():
+        name, attributes = shape.split(' ', 1)
+        defs.append(f'\t\t<{name} id="{symbol}" {attributes}/>\n')
+    defs.append('\t</defs>\n')
 
-    return fill_group, light_group, dark_group
+    return defs
 
 #
-# Create and Write an SVG Object to File with the Square Optical Illusion.
+# Size the canvas for an illusion grid, before anything is written
 #
-def create_svg_from_PNG(outlineOnly, use_real_colours,
-                        rect_width=20.0, rect_height=20.0,
-                        rect_radius_x = 25.0, rect_radius_y = 25.0,
-                        startX = 0.0, startY = 0.0):
+def svg_canvas_for_illusion(width, height, add_PNG=False,
+                            startX=0.0, startY=0.0,
+                            rect_width=20.0, rect_height=20.0):
     """
-    Create SVG elements that represent each pixel of the loaded PNG image.
-
-    This function prepares an SVG sprite layer by converting pixel positions into
-    rounded rectangles (or outlines only). It sets up the canvas size and calls a
-    lower-level function to generate the actual drawing instructions.
+    Grow the canvas to hold the grid create_svg() draws with the same arguments.
 
     Args:
-        outlineOnly (bool): If True, renders stroke outlines only.
-        use_real_colours (bool): If False, substitutes pixel colours with illusion palette.
+        width (int): Grid width in number of rectangles.
+        height (int): Grid height in number of rectangles.
+        add_PNG (bool): Whether the loaded PNG is overlaid on the grid.
+        startX (float): Starting X offset in mm.
+        startY (float): Starting Y offset in mm.
         rect_width (float): Width of each rectangle in mm.
         rect_height (float): Height of each rectangle in mm.
-        rect_radius_x (float): Rounded corner radius on the X axis (%).
-        rect_radius_y (float): Rounded corner radius on the Y axis (%).
-        startX (float): Horizontal shift in mm.
-        startY (float): Vertical shift in mm.
+    """
+    update_svg_canvas_dimensions(rect_width * width + abs(startX * 2), rect_height * height + abs(startY * 2))
 
-    Returns:
-        None. Appends SVG group content to the global SVG_DATA_LIST.
+    if add_PNG:
+        offsetX, offsetY = svg_PNG_offset(width, height)
+        svg_canvas_for_PNG(rect_width, rect_height, offsetX, offsetY, startX, startY)
+
+#
+# Size the canvas for the loaded PNG, before anything is written
+#
+def svg_canvas_for_PNG(rect_width=20.0, rect_height=20.0,
+                       offset_X=0.0, offset_Y=0.0,
+                       start_X=0.0, start_Y=0.0):
+    """
+    Grow the canvas to hold the pixels create_svg_data_for_loaded_PNG() draws with
+    the same arguments.
 
     Globals:
-        SVG_DATA_LIST (list[str]): Aggregates the visual content of the SVG output.
         Image_Real_Width (int): Pixel width of loaded PNG.
         Image_Real_Height (int): Pixel height of loaded PNG.
-
-    TODO:
-        - Consider returning the generated SVG group instead of appending globally
-        - Parameterise input pattern image instead of assuming current global
     """
-    global SVG_DATA_LIST
-
-    width = Image_Real_Width
-    height = Image_Real_Height
+    update_svg_canvas_dimensions((rect_width * Image_Real_Width) + offset_X + abs(start_X),
+                                 rect_height * (Image_Real_Height + offset_Y) + abs(start_Y))
 
-    totalWidth = rect_width * width + abs(startX)
-    totalHeight = rect_height * height + abs(startY)
-    update_svg_canvas_dimensions(totalWidth, totalHeight)
-
-    # Main Optical Illusion Drawing Group
-    sprite_group = create_svg_data_for_loaded_PNG(outlineOnly,
-                                                  use_real_colours,
-                                                  startX, startY,
-                                                  rect_width, rect_height,
-                                                  rect_radius_x, rect_radius_y)
-
-    SVG_DATA_LIST.append(''.join(sprite_group))
+#
+# Where the PNG sits when centred on an illusion grid
+#
+def svg_PNG_offset(width, height):
+    """
+    Return the (x, y) grid offset that centres the loaded PNG on a width x height grid.
+    """
+    return math.ceil((width - Image_Real_Width) / 2), math.ceil((height - Image_Real_Height) / 2)
 
 #
-# Create SVG Data for currently Loaded PNG In memory.
+# Update Canvas Width/Height
 #
-def create_svg_data_for_loaded_PNG(outline_only = False,
-                                   use_real_colours = True,
-                                   offset_X = 0.0, offset_Y = 0.0,
-                                   rect_width=20.0, rect_height=20.0,
-                                   rect_radius_x = "25%",
-                                   rect_radius_y = "25%",
-                                   start_X = 0.0, start_Y = 0.0):
+# TODO: Remove or explain the `if width > 405: print` line
+# TODO: Consider returning updated dimensions instead of using globals
+def update_svg_canvas_dimensions(width, height):
     """
-    Create SVG data corresponding to each pixel of the loaded PNG image.
+    Update the global SVG canvas dimensions if the new dimensions are larger.
 
-    This function overlays the sprite or image grid based on real pixel data,
-    mapped to a rectangular tile grid for scalable printing or cutting. Optionally
-    uses alternating colours instead of real colours to produce illusions.
+    This ensures that the final SVG canvas is large enough to accommodate all
+    generated elements across multiple operations.
 
     Args:
-        outline_only (bool): If True, draws outlines only (circles or text instead of rectangles).
-        use_real_colours (bool): If False, replaces real colours with illusion palette.
-        offset_X (float): Horizontal shift of pixel grid in grid units.
-        offset_Y (float): Vertical shift of pixel grid in grid units.
-        rect_width (float): Width of each grid cell in mm.
-        rect_height (float): Height of each grid cell in mm.
-        rect_radius_x (str): Corner radius X (percentage).
-        rect_radius_y (str): Corner radius Y (percentage).
-        start_X (float): Additional horizontal offset in mm.
-        start_Y (float): Additional vertical offset in mm.
+        width (float): Proposed new canvas width in mm.
+        height (float): Proposed new canvas height in mm.
 
     Returns:
-        list[str]: List of SVG fragment strings forming the sprite overlay group.
+        None. Modifies global variables in-place.
 
     Globals:
-        SVG_PNG_PIXEL_COUNT (int): Accumulates the number of drawn pixels.
-        pattern, pattern_w, pattern_h: Used to read and wrap pixel data.
-        Image_MinX, Image_MinY, Image_Real_Width, Image_Real_Height: Sprite dimensions.
-        SVG_ILLUSION_COLOUR_TABLE: Used when not using real colours.
-        DARK_PIXEL_INDEX, LIGHT_PIXEL_INDEX: Used to alternate colour blocks.
-
+        SVG_CANVAS_WIDTH (float): Current maximum canvas width.
+        SVG_CANVAS_HEIGHT (float): Current maximum canvas height.
+    """
+    global SVG_CANVAS_WIDTH
+    global SVG_CANVAS_HEIGHT
+
+    if width > 405:
+        print
+    if width > SVG_CANVAS_WIDTH:
+        SVG_CANVAS_WIDTH = width
+
+    if height > SVG_CANVAS_HEIGHT:
+        SVG_CANVAS_HEIGHT = height
+
+#
+# Add Centred Text
+#
+# TODO: Make font-size and stroke-width configurable parameters
+# TODO: Consider accepting a style dict or class for future flexibility
+def add_svg_centeredText(x, y, text, fill_colour):
+    """
+    Generate a centered SVG <text> element with stroke-based outlining.
+
+    Args:
+        x (float): The x-coordinate in mm for the text anchor point.
+        y (float): The y-coordinate in mm for the text anchor point.
+        text (str): The text content to display.
+        fill_colour (str): Stroke colour for the text outline (e.g. "#000000").
+
+    Returns:
+        str: A formatted SVG <text> tag with positioning, alignment, and stroke styling.
+    """
+    text_str = (f'\t\t<text x="{x:.3f}mm" y="{y:.3f}mm" text-anchor="middle" '
+                f'dominant-baseline="central" fill="none" stroke = "{fill_colour}" '
+                f'stroke-width="0.5px" alignment-baseline="middle" font-size="24pt"'
+                f'>{text} </text>\n'
+    )
+
+    return text_str
+
+#
+# Add Centred Text
+#
+def add_svg_centeredCircle(x, y, radius = 5.0, fill_colour = "#000000", stroke_width = 0.0, stroke = "#000000"):
+    """
+    Generate an SVG <circle> element centered at (x, y) with optional stroke and fill.
+
+    Args:
+        x (float): X-coordinate of the circle center in mm.
+        y (float): Y-coordinate of the circle center in mm.
+        radius (float, optional): Radius of the circle in mm. Default is 5.0.
+        fill_colour (str, optional): Fill colour of the circle (e.g. "#FF0000").
+        stroke_width (float, optional): Width of the stroke in mm. If 0.0, stroke is omitted.
+        stroke (str, optional): Stroke colour. Ignored if stroke_width is 0.
+
+    Returns:
+        str: A formatted SVG <circle> tag.
+    
+    TODO:
+        - Consider adding support for additional SVG attributes via kwargs or a style object.
+        - Optionally validate inputs to prevent invalid SVG formatting.
+    """
+    style_str = f'r="{radius:.3f}mm" fill="{fill_colour}" '
+    if stroke_width != 0.0:
+        style_str += f'stroke="{stroke}" stroke-width="{stroke_width}mm" '
+
+    # Same circle around the origin, moved into place
+    if SVG_USE_SYMBOLS:
+        return svg_symbol('circle ' + style_str, x, y)
+
+    circle_str = (f'\t\t<circle cx="{x:.3f}mm" cy="{y:.3f}mm" ' + style_str)
+
+    return circle_str + "/> \n"
+
+#
+# Add rectangle
+#
+def add_svg_rectangle(id, x, y, width, height, rx=0.0, ry=0.0, fill_colour="#000000", opacity = 100.0, stroke_width = 0.0, stroke_colour = "#000000"):
+    """
+    Generate an SVG <rect> element with optional rounded corners, fill, and stroke.
+
+    Args:
+        id (str): Optional ID to assign to the rect.
+        x (float): X-position of the rectangle's top-left corner in mm.
+        y (float): Y-position of the rectangle's top-left corner in mm.
+        width (float): Width of the rectangle in mm.
+        height (float): Height of the rectangle in mm.
+        rx (float): Optional rounding percentage for x-radius (0–100).
+        ry (float): Optional rounding percentage for y-radius (0–100).
+        fill_colour (str): Fill colour in hex or named format.
+        opacity (float): Fill opacity as a percentage (0–100).
+        stroke_width (float): Stroke width in mm. 0 disables stroke.
+        stroke_colour (str): Stroke colour.
+
+    Returns:
+        str: SVG-compliant <rect> string with given attributes, or a <use> of the
+             same tile when SVG_USE_SYMBOLS is set and no id is given.
+    
+    TODO:
+        - Allow setting stroke opacity separately.
+        - Extract style string to helper/template function.
+        - Re-enable canvas dimension tracking when refactoring.
+    """
+    size_str = f'width="{width:.3f}mm" height="{height:.3f}mm" '
+    style_str = ''
+
+    # Add rx and ry only if they're non-zero
+    if rx != 0.0:
+        fx = abs(width * (rx/100.0) / 2)
+        style_str += f'rx="{fx:.3f}mm" '
+    if ry != 0.0:
+        fy = abs(height * (ry/100.0) / 2)
+        style_str += f'ry="{fy:.3f}mm" '
+
+    # Add stroke attributes if stroke width is not 0
+    if stroke_width != 0.0:
+        #rect_str += f'stroke-width="{stroke_width}" stroke="{stroke_colour}" stroke-opacity="100%" '
+        style_str += f'style="fill:none;stroke:{stroke_colour};stroke-width:{stroke_width}mm; " '
+    else:
+        # Add opacity only if it's not 100%
+        if opacity != 100.0:
+            style_str += f'opacity="{opacity}" '
+
+        style_str += f'fill="{fill_colour}" '
+        #style="fill:none;stroke:rgb(35,31,32);stroke-width:12.5px;"
+
+    # Tiles share one definition, only named rectangles are written out in full
+    if SVG_USE_SYMBOLS and len(id) == 0:
+        return svg_symbol('rect ' + size_str + style_str, x, y)
+
+    # Base rectangle attributes
+    rect_str = ('\t\t<rect ')
+
+    if len(id)>0:
+        rect_str += f'id="{id}" '
+
+    rect_str += size_str + f'x="{x:.3f}mm" y="{y:.3f}mm" ' + style_str
+
+    # Close the rect tag
+    rect_str += '/>\n'
+    
+    # Update canvas dimensions if needed
+    #update_svg_canvas_dimensions(x + width, y + height)
+    
+    return rect_str
+
+#
+# Grid for the Range 400mm Frames
+#   Current loading is the internal frame has a useable 397mm
+#       with 405mm on outer frame before backing board.
+#
+def frame400_layout():
+    """
+    Work out the grid that fills a 400mm frame around the loaded PNG.
+
+    Returns:
+        tuple: (multiplier, rect_width, rect_height, offset) - grid cells along each
+               side, cell size in mm and the margin in mm between the outer frame and
+               the useable area.
+
+    Globals:
+        Image_Real_Width (int): Width of the loaded PNG in pixels.
+        Image_Real_Height (int): Height of the loaded PNG in pixels.
+    """
+    # Useable Area of the Frame
+    useableArea = 397.00
+    outerFrame  = 405.00
+
+    # Get the number of Pixels plus border of 2
+    if Image_Real_Width > 0:
+        multiplier = int(max (Image_Real_Width + 4, Image_Real_Height + 4))
+        if multiplier < 20: 
+            multiplier = 20
+        rect_width = useableArea / multiplier
+        rect_height = rect_width
+
+    # Calculate the real width
+    offset = (outerFrame - useableArea) / 2
+
+    return multiplier, rect_width, rect_height, offset
+
+#
+# Create an SVG File sized for the Range 400mm Frames
+#
+def create_svg_frame400(Outline_Only = True, 
+                        add_PNG = False, 
+                        rect_radius_x = 25, 
+                        rect_radius_y = 25):
+    """
+    Create SVG data and cut guides for mounting art in a 400mm x 400mm frame (as sold by The Range).
+
+    The layout includes:
+    - Usable inner area: 397mm x 397mm
+    - Outer mount board size: 405mm x 405mm
+    - Optional background and corner radius parameters
+    - Optional PNG layer
+    - Optional cut guides for MAPED mountboard cutter
+
+    Args:
+        Outline_Only (bool): If True, suppress SVG fill elements and render only outlines.
+        add_PNG (bool): If True, include the in-memory PNG rendering into the layout.
+        rect_radius_x (float): Horizontal corner radius as a percentage.
+        rect_radius_y (float): Vertical corner radius as a percentage.
+
+    Globals:
+        Image_Real_Width (int): Width of the loaded PNG in pixels.
+        Image_Real_Height (int): Height of the loaded PNG in pixels.
+        SVG_CANVAS_WIDTH (float): Used when placing cut guides.
+        SVG_CANVAS_HEIGHT (float): Used when placing cut guides.
+        SVG_Writer (ObjTextWriter): Receives the SVG group markup for cut guides.
+
+    Returns:
+        None. Streams formatted SVG elements directly to SVG_Writer.
+
+    TODO:
+        - Generalise for other frame sizes (currently hardcoded to 400mm/405mm)
+        - Accept frame model name or dimensions as input
+        - Consider separating visual elements and guide logic
+    """
+    # Useable Area of the Frame
+    useableArea = 397.00
+    outerFrame  = 405.00
+
+    multiplier, rect_width, rect_height, offset = frame400_layout()
+
+    print(" Actual dimensions for 400mm Frame are :")
+    print("----------------------------------------")
+    print(f"       Internal Frame : {useableArea}mm x {useableArea}mm")
+    print(f"          Outer Frame : {outerFrame}mm x {outerFrame}mm")
+    print(f"   Pixel Width/Height : {rect_width:.2f}mm x {rect_height:.2f}mm")
+    #print(f"          Rect Radius : {args.svg_radius_percent_x:.2f}% x {args.svg_radius_percent_y:.2f}%")
+    print(f"          Rect Radius : {rect_radius_x:.2f}% x {rect_radius_y:.2f}%")
+
+
+    create_svg(multiplier, multiplier, Outline_Only,  True, add_PNG, offset, offset, rect_width, rect_height, rect_radius_x, rect_radius_y )
+
+
+    # Create the CUT Guides, I'm using the MAPED Mountboard Cutter, the Straight Edge needs
+    # a 60mm Offset from bottom of the ruler to the cutting point of the blade.
+    # You need 70mm if you're planning on using the 45 Degree Bevel Cutter.
+    CutGuides = [f'\t<g id="CutGuidesGroup"> \n']
+    
+    # Add 400mm border
+    CutGuides.append(add_svg_rectangle("Card Border",0.0, 0.0, 405.0, 405.0, 0.0, 0.0, "#FFFFFF", 0.0, 1, "#000000"))
+
+    # Add Maped Cutter Marks
+    CutGuides.append(add_svg_rectangle("TopLeftGuide",0.0, 0.0, 60.0, 60.0, 0.0, 0.0, "#FFFFFF", 0.0, 1, "#000000"))
+    CutGuides.append(add_svg_rectangle("TopRightGuide",SVG_CANVAS_WIDTH - 60.0, 0.0, 60.0, 60.0, 0.0, 0.0, "#FFFFFF", 0.0, 1, "#000000"))
+    CutGuides.append(add_svg_rectangle("BottonLeftGuide",0.0, SVG_CANVAS_HEIGHT - 60.0, 60.0, 60.0, 0.0, 0.0, "#FFFFFF", 0.0, 1, "#000000"))
+    CutGuides.append(add_svg_rectangle("BottomRightGuide",SVG_CANVAS_WIDTH - 60.0, SVG_CANVAS_HEIGHT - 60.0, 60.0, 60.0, 0.0, 0.0, "#FFFFFF", 0.0, 1, "#000000"))
+
+    CutGuides.append(f'\t</g>\n')
+
+    svg_write(CutGuides)
+
+
+
+#
+# Create and Write an SVG Object to File with the Square Optical Illusion.
+#   savename        : Filename to Write
+#   width           : Width in pixels   (Number of Rectangles Wide)
+#   height          : Height in Pixels  (Number of Rectangles High)
+#   add_PNG         : Add the PNG loaded in Memory?, Default = No
+#   startX          : X Position Offset Start , Default = 0.0mm
+#   startY          : Y Position Offset Start , Default = 0.0 mm
+#   rect_width      : Width of Rectangles , Default = 20.0mm
+#   rect_height     : Height of Rectangles, Default = 20.0mm
+#   rect_radius_X   : Corner Radius on X  , Default = 25%
+#   rect_radius_Y   : Corner Radius on Y  , Default = 25%
+#
+def create_svg(width, height,
+               outline_only,
+               use_real_colours = True,
+               add_PNG = False,
+               startX = 0.0, startY = 0.0,
+               rect_width=20.0, rect_height=20.0,
+               rect_radius_x = 25.0, rect_radius_y = 25.0):
+    """
+    Create optical illusion-style SVG data using either diagonal or circular patterns.
+
+    Optionally overlays a sprite image (from loaded PNG) and includes calculated offsets
+    and styling based on real-world dimensions. The canvas must already be sized with
+    svg_canvas_for_illusion() called with the same arguments.
+
+    Args:
+        width (int): Grid width in number of rectangles.
+        height (int): Grid height in number of rectangles.
+        outline_only (bool): If True, omits fill colours and only renders borders.
+        use_real_colours (bool): If True, retains original pixel colour information.
+        add_PNG (bool): If True, overlays a sprite image onto the SVG illusion.
+        startX (float): Starting X offset in mm.
+        startY (float): Starting Y offset in mm.
+        rect_width (float): Width of each rectangle in mm.
+        rect_height (float): Height of each rectangle in mm.
+        rect_radius_x (float): Corner radius X (% of width).
+        rect_radius_y (float): Corner radius Y (% of height).
+
+    Returns:
+        None. Streams data directly to SVG_Writer.
+
+    Globals:
+        SVG_Writer (ObjTextWriter): The SVG file being written.
+        ILLUSION_TYPE_CIRCLE (bool): Switch between circular vs diagonal grid illusion.
+        Image_Real_Width (int): Width of loaded PNG (for offsetting sprite overlay).
+        Image_Real_Height (int): Height of loaded PNG.
+
+    TODO:
+        - Parameterise illusion type via argument instead of global
+        - Add validation for grid/offset sizes
+        - Split fill/light/dark logic into helper functions
+    """
+    # Create Illusion Data
+    if ILLUSION_TYPE_CIRCLE:
+        fill_group, light_group, dark_group = create_svg_illusion_data_circular(outline_only,
+                                                                                width, height,
+                                                                                rect_width, rect_height,
+                                                                                rect_radius_x, rect_radius_y,
+                                                                                startX, startY)
+    else:
+        fill_group, light_group, dark_group = create_svg_illusion_data_diagonals(outline_only,
+                                                                                 width, height,
+                                                                                 rect_width, rect_height,
+                                                                                 rect_radius_x, rect_radius_y,
+                                                                                 startX, startY)
+
+    if not outline_only:
+        svg_write(fill_group)
+
+    svg_write(dark_group, light_group)
+
+    if add_PNG:
+        offsetX, offsetY = svg_PNG_offset(width, height)
+        sprite_Data = create_svg_data_for_loaded_PNG(outline_only, use_real_colours,
+                                                     offsetX, offsetY,
+                                                     rect_width , rect_height,
+                                                     rect_radius_x, rect_radius_y,
+                                                     startX, startY)
+        svg_write(sprite_Data)
+
+#
+# Create SVG Data for the Optical Illusion
+#
+def create_svg_rect_Grid(outline_only = False,
+                         width = 20, height = 20,
+                         rect_width=20.0, rect_height=20.0,
+                         rect_radius_x = 25, rect_radius_y = 25,
+                         offsetX = 0.0, offsetY = 0.0,
+                         fillcolour1 = "#020078",
+                         fillcolour2 = "#3F53FF"):
+    """
+    Generate a rectangular grid of SVG <rect> elements, with alternating fill colours.
+
+    Used to build visual background or illusion patterns by alternating between two
+    colour values and separating them into 'light' and 'dark' groups. Each group is
+    a generator, its rectangles are only formatted as it is written out.
+
+    With SVG_GRID_PATTERN set (and not outline only) the whole grid is instead one
+    rectangle filled with a <pattern>, see svg_rect_Grid_pattern(), returned as the
+    dark group with an empty light group. Outlines keep a <rect> per cell for machining.
+
+    Args:
+        outline_only (bool): If True, disables fill and applies stroke-only style.
+        width (int): Number of rectangles across the X-axis.
+        height (int): Number of rectangles down the Y-axis.
+        rect_width (float): Width of each rectangle in mm.
+        rect_height (float): Height of each rectangle in mm.
+        rect_radius_x (float): Rounded corner radius X (%).
+        rect_radius_y (float): Rounded corner radius Y (%).
+        offsetX (float): Horizontal offset in mm.
+        offsetY (float): Vertical offset in mm.
+        fillcolour1 (str): Primary colour hex code.
+        fillcolour2 (str): Secondary colour hex code.
+
+    Returns:
+        tuple: Two generators of SVG strings — (light_group, dark_group)
+
+    Globals:
+        SVG_GRID_PATTERN (bool): Draw the grid as a single pattern filled rectangle.
+
+    TODO:
+        - Allow `fillcolour1` and `fillcolour2` to accept lists for multi-colour cycling
+    """
+    if SVG_GRID_PATTERN and not outline_only:
+        return [], svg_rect_Grid_pattern(width, height, rect_width, rect_height,
+                                         rect_radius_x, rect_radius_y, offsetX, offsetY,
+                                         fillcolour1, fillcolour2)
+
+    grid = (outline_only, width, height, rect_width, rect_height,
+            rect_radius_x, rect_radius_y, offsetX, offsetY, fillcolour1, fillcolour2)
+
+    return svg_rect_Grid_group("LightGroup", False, *grid), svg_rect_Grid_group("DarkGroup", True, *grid)
+
+#
+# One colour of the rectangular grid
+#
+def svg_rect_Grid_group(group_id, dark,
+                        outline_only, width, height,
+                        rect_width, rect_height,
+                        rect_radius_x, rect_radius_y,
+                        offsetX, offsetY,
+                        fillcolour1, fillcolour2):
+    """
+    Yield the SVG group holding the dark (fillcolour1) or light rectangles of
+    create_svg_rect_Grid().
+
+    Args:
+        group_id (str): id of the <g> element.
+        dark (bool): True for the fillcolour1 rectangles, False for the rest.
+
+    Yields:
+        str: SVG fragments, the group open tag, one <rect> per cell and the close tag.
+
+    Globals:
+        SVG_GRID_COUNT (int): Tracks total number of rectangles generated.
+    """
+    global SVG_GRID_COUNT
+
+    yield f'\t<g id="{group_id}">\n'
+
+    for y in range(int(height)):
+        current_y = (y * rect_height) + offsetY
+        for x in range(int(width)):
+            fill_color = fillcolour1 if (x % 2) == (y % 2) else fillcolour2
+            if (fill_color == fillcolour1) != dark:
+                continue
+
+            current_x = (x * rect_width) + offsetX
+
+            if not outline_only:
+                newObj = add_svg_rectangle("",current_x, current_y, rect_width, rect_height, rect_radius_x, rect_radius_y, fill_color)
+            else:
+                newObj = add_svg_rectangle("",current_x, current_y, rect_width, rect_height, rect_radius_x, rect_radius_y, fill_color, 0, 0.25)
+
+            yield newObj
+            SVG_GRID_COUNT += 1
+
+    yield "\t</g>\n"
+
+#
+# The rectangular grid as a single rectangle filled with a repeating tile (--svgpattern)
+#
+def svg_rect_Grid_pattern(width, height,
+                          rect_width, rect_height,
+                          rect_radius_x, rect_radius_y,
+                          offsetX, offsetY,
+                          fillcolour1, fillcolour2):
+    """
+    Yield the checkerboard of create_svg_rect_Grid() as one <pattern> and one <rect>.
+
+    The tile is 2 x 2 cells, fillcolour1 on the diagonal and fillcolour2 off it, each
+    cell the same rounded rectangle the per-cell grid would draw. A rectangle the size
+    of the grid is filled with it, so the file size does not depend on the grid size.
+
+    Yields:
+        str: SVG fragments of the GridPatternGroup group.
+
+    Globals:
+        SVG_GRID_COUNT (int): Counts the cells covered, as if drawn one by one.
+    """
+    global SVG_GRID_COUNT
+
+    width = int(width)
+    height = int(height)
+
+    yield '\t<g id="GridPatternGroup">\n'
+    yield '\t\t<defs>\n'
+    yield (f'\t\t\t<pattern id="GridTile" patternUnits="userSpaceOnUse" '
+           f'x="{offsetX:.3f}mm" y="{offsetY:.3f}mm" width="{rect_width * 2:.3f}mm" height="{rect_height * 2:.3f}mm">\n')
+
+    for cell, (x, y) in enumerate(((0, 0), (1, 0), (0, 1), (1, 1))):
+        fill_color = fillcolour1 if x == y else fillcolour2
+        yield '\t\t' + add_svg_rectangle(f"GridTile{cell}", x * rect_width, y * rect_height,
+                                         rect_width, rect_height, rect_radius_x, rect_radius_y, fill_color)
+
+    yield '\t\t\t</pattern>\n'
+    yield '\t\t</defs>\n'
+    yield (f'\t\t<rect width="{width * rect_width:.3f}mm" height="{height * rect_height:.3f}mm" '
+           f'x="{offsetX:.3f}mm" y="{offsetY:.3f}mm" fill="url(#GridTile)" />\n')
+    yield '\t</g>\n'
+
+    SVG_GRID_COUNT += width * height
+
+#
+# clip the coords for inside the canvas.
+#
+def ClipDimensions(rect_x, rect_y, rect_width, rect_height, offsetX, offsetY):
+    """
+    Clip a rectangle's dimensions to ensure it stays within the valid SVG canvas boundaries.
+
+    This function adjusts the rectangle's position and size based on the provided offset
+    and current global SVG canvas dimensions.
+
+    Args:
+        rect_x (float): X-coordinate of the rectangle's top-left corner.
+        rect_y (float): Y-coordinate of the rectangle's top-left corner.
+        rect_width (float): Requested width of the rectangle in mm.
+        rect_height (float): Requested height of the rectangle in mm.
+        offsetX (float): Horizontal margin in mm.
+        offsetY (float): Vertical margin in mm.
+
+    Returns:
+        tuple: (adjusted_x, adjusted_y, clipped_width, clipped_height)
+
+    Globals:
+        SVG_CANVAS_WIDTH (float): Total width of the SVG canvas.
+        SVG_CANVAS_HEIGHT (float): Total height of the SVG canvas.
+
+    TODO:
+        - Move SVG_CANVAS_WIDTH/HEIGHT to parameters for testability
+        - Document caller behaviour for rectangles that get fully clipped
+    """
+    req_width = rect_width
+    req_height = rect_height
+
+    # Clip Illusion Squares to image when in frame mode.
+    if rect_x < offsetX:
+        rect_x = offsetX
+        req_width = rect_width - offsetX
+
+    if rect_x + req_width > SVG_CANVAS_WIDTH - offsetX:
+        req_width = SVG_CANVAS_WIDTH - offsetX - rect_x
+
+    if rect_y < offsetY:
+        rect_y = offsetY
+        req_height= rect_height - offsetY
+
+    if rect_y + req_height > SVG_CANVAS_HEIGHT - offsetY:
+        req_height = SVG_CANVAS_HEIGHT - offsetY - rect_y
+
+    return rect_x, rect_y, req_width, req_height
+
+
+#
+# Create SVG Data for the Optical Illusion - circles...
+#
+def create_svg_illusion_data_circular(outline_only = False, width = 20, height = 20, rect_width=20.0, rect_height=20.0, rect_radius_x = "25%", rect_radius_y = "25%", offsetX = 0.0, offsetY = 0.0):
+    """
+    Generate an SVG data grid with a circular optical illusion effect using concentric raster lines.
+
+    Alternates between visible and skipped circles to create a vibration-like illusion.
+    The mask is fetched straight away with illusion_mask(), the SVG groups are
+    generators formatted as they are written out.
+
+    Args:
+        outline_only (bool): If True, disables fill and renders stroke-only rectangles.
+        width (int): Grid width in cells.
+        height (int): Grid height in cells.
+        rect_width (float): Width of each rectangle in mm.
+        rect_height (float): Height of each rectangle in mm.
+        rect_radius_x (str): Corner rounding percentage on X (e.g., "25%").
+        rect_radius_y (str): Corner rounding percentage on Y (e.g., "25%").
+        offsetX (float): Horizontal offset in mm.
+        offsetY (float): Vertical offset in mm.
+
+    Returns:
+        tuple: (fill_group, light_group, dark_group) — SVG <g> sections.
+
+    Globals:
+        SVG_ILLUSION_ARRAY (numpy.ndarray): Boolean mask of the circles.
+        SVG_DARK_COUNT (int): Total number of dark illusion blocks drawn.
+        SVG_LIGHT_COUNT (int): Total number of light blocks.
+        ILLUSION_MAX_STREAK (int): Max run of lines before toggling.
+        SVG_ILLUSION_COLOUR_TABLE (list): Colour palette.
+        DARK_BLOCK_INDEX (int): Index of dark block colour.
+        LIGHT_BLOCK_INDEX (int): Index of light block colour.
+
+    TODO:
+        - Parameterise ILLUSION_MAX_STREAK instead of relying on global
+        - Move ClipDimensions() and rectangle calc into reusable helper
+    """
+    global SVG_ILLUSION_ARRAY, SVG_DARK_COUNT, SVG_LIGHT_COUNT
+
+    width = int(width)
+    height = int(height)
+
+    SVG_ILLUSION_ARRAY = illusion_mask(True, width, height)
+
+    dark = int(np.count_nonzero(SVG_ILLUSION_ARRAY))
+    SVG_DARK_COUNT += dark
+    SVG_LIGHT_COUNT += width * height - dark
+
+    fill_group = svg_illusion_circles_group(SVG_ILLUSION_ARRAY, outline_only,
+                                            width, height,
+                                            rect_width, rect_height,
+                                            offsetX, offsetY)
+
+    light_group, dark_group = create_svg_rect_Grid(outline_only,
+                                                   width, height,
+                                                   rect_width, rect_height,
+                                                   rect_radius_x, rect_radius_y,
+                                                   offsetX, offsetY,
+                                                   SVG_ILLUSION_COLOUR_TABLE[DARK_BLOCK_INDEX],
+                                                   SVG_ILLUSION_COLOUR_TABLE[LIGHT_BLOCK_INDEX])
+
+    return fill_group, light_group, dark_group
+
+#
+# The circles drawn by create_svg_illusion_data_circular() as SVG
+#
+def svg_illusion_circles_group(mask, outline_only, width, height, rect_width, rect_height, offsetX, offsetY):
+    """
+    Yield a black or white square for each cell of the circle illusion pattern.
+
+    Args:
+        mask (numpy.ndarray): Boolean (height, width) pattern, True where a circle was drawn.
+
+    Yields:
+        str: SVG fragments of the OpticalIllusionCirclesAll group.
+    """
+    half_rect_width = (rect_width / 2)
+    half_rect_height = (rect_height / 2)
+
+    yield f'\t<g id="OpticalIllusionCirclesAll">\n'
+    for y, row in enumerate(mask.tolist()):
+        for x, sample in enumerate(row):
+            if sample:
+                fillColour = "#000000"
+            else:
+                fillColour = "#ffffff"
+
+            rect_x = x * rect_width - half_rect_width + offsetX
+            rect_y = y * rect_height - half_rect_height + offsetY
+
+            rect_x, rect_y, req_width, req_height = ClipDimensions(rect_x, rect_y, rect_width, rect_height, offsetX, offsetY)
+
+            if not outline_only:
+                newObj = add_svg_rectangle("",rect_x, rect_y,req_width, req_height, 0, 0, fillColour)
+            else:
+                newObj = add_svg_rectangle("",rect_x, rect_y,req_width, req_height, 0, 0, fillColour, 0, 0.5)
+            yield newObj
+
+    yield '\t</g>\n'
+
+
+#
+# Create SVG Data for the Optical Illusion
+#
+def create_svg_illusion_data_diagonals(outline_only = False, width = 20, height = 20, rect_width=20.0, rect_height=20.0, rect_radius_x = "25%", rect_radius_y = "25%", offsetX = 0.0, offsetY = 0.0):
+    """
+    Generate SVG illusion data based on diagonal line patterns.
+
+    Creates a grid of rectangles where each diagonal is conditionally filled or skipped
+    to produce a wobble or flicker illusion effect. The output is structured in groups
+    labelled by coordinate for post-processing or SVG manipulation.
+
+    Args:
+        outline_only (bool): If True, uses stroke-only rectangles.
+        width (int): Number of rectangles across.
+        height (int): Number of rectangles down.
+        rect_width (float): Width of each rectangle in mm.
+        rect_height (float): Height of each rectangle in mm.
+        rect_radius_x (str): Horizontal corner radius as percentage string.
+        rect_radius_y (str): Vertical corner radius as percentage string.
+        offsetX (float): Horizontal grid offset.
+        offsetY (float): Vertical grid offset.
+
+    Returns:
+        tuple: (fill_group, light_group, dark_group), generators of SVG strings.
+               The diagonals are chosen straight away with illusion_mask().
+
+    Globals:
+        SVG_ILLUSION_ARRAY (numpy.ndarray): Boolean mask of the diagonals.
+        SVG_DARK_COUNT (int): Counter for dark block rectangles.
+        SVG_LIGHT_COUNT (int): Counter for light block rectangles.
+        SVG_ILLUSION_COLOUR_TABLE (list[str]): Colour options.
+    """
+    global SVG_ILLUSION_ARRAY, SVG_DARK_COUNT, SVG_LIGHT_COUNT
+
+    width = int(width)
+    height = int(height)
+
+    light_group, dark_group = create_svg_rect_Grid(outline_only,
+                                                   width, height, rect_width, rect_height,
+                                                   rect_radius_x, rect_radius_y,
+                                                   offsetX, offsetY,
+                                                   SVG_ILLUSION_COLOUR_TABLE[DARK_BLOCK_INDEX],
+                                                   SVG_ILLUSION_COLOUR_TABLE[LIGHT_BLOCK_INDEX])
+
+    if outline_only:
+        return [], light_group, dark_group
+
+    SVG_ILLUSION_ARRAY = illusion_mask(False, width, height)
+
+    dark = int(np.count_nonzero(SVG_ILLUSION_ARRAY))
+    SVG_DARK_COUNT += dark
+    SVG_LIGHT_COUNT += SVG_ILLUSION_ARRAY.size - dark
+
+    fill_group = svg_illusion_diagonals_group(SVG_ILLUSION_ARRAY, outline_only, width, height,
+                                              rect_width, rect_height, offsetX, offsetY)
+
+    return fill_group, light_group, dark_group
+
+#
+# The diagonals of create_svg_illusion_data_diagonals() as SVG
+#
+def svg_illusion_diagonals_group(mask, outline_only, width, height, rect_width, rect_height, offsetX, offsetY):
+    """
+    Yield the squares of each diagonal in turn, black if drawn, white if not.
+
+    Args:
+        mask (numpy.ndarray): Boolean (height + 1, width + 1) pattern, True where drawn.
+
+    Yields:
+        str: SVG fragments of the OpticalIllusionGroup group.
+
+    TODO:
+        - Add parameter to control diagonal direction (currently fixed)
+        - Consider exposing fill/stroke style per-diagonal group
+    """
+    half_rect_width = rect_width / 2
+    half_rect_height = rect_height / 2
+
+    # Main Optical Illusion Drawing Group
+    yield f'\t<g id="OpticalIllusionGroup">\n'
+
+    # Loop Across the Object, diagonal x holds the cells where column + row == x
+    for x in range(width + height + 1):
+        # The Start Y Position will typically be Zero, when it moves to the right of the Width,
+        # We start offseting the Y position on Grid to be max Width, Y = 0 -> HEIGHT
+        # range_x is fixed to all columns up to maximum column width
+        start_y = max(0, x - width)
+        range_x = min(x, width)
+
+        # Label up each of the Diagonal Groups with their start X,Y Coords
+        # Diagonals set from Top Right to Bottom Left
+        yield f'\t\t<g id="DiagonalGroup{range_x}:{start_y}">\n'
+
+        fill_color = (
+            "#000000" if mask[start_y, range_x] else
+            "#ffffff"
+        )
+
+        # Lets do the work, stopping at the bottom of the grid.
+        for xpos in range(range_x, max(-1, x - height - 1), -1):
+            rect_x = xpos * rect_width - half_rect_width + offsetX
+            rect_y = start_y * rect_height - half_rect_height + offsetY
+
+            rect_x, rect_y, req_width, req_height = ClipDimensions(rect_x, rect_y, rect_width, rect_height, offsetX, offsetY)
+
+            if not outline_only:
+                newObj = '\t'+add_svg_rectangle("",rect_x, rect_y,
+                                                req_width, req_height,
+                                                0, 0, fill_color)
+            else:
+                newObj = '\t'+add_svg_rectangle("",rect_x, rect_y,
+                                                req_width, req_height,
+                                                0, 0, fill_color, 0, 1.0)
+
+            yield newObj
+            start_y += 1
+
+        yield '\t\t</g>\n'
+
+    yield '\t</g>\n'
+
+#
+# Create and Write an SVG Object to File with the Square Optical Illusion.
+#
+def create_svg_from_PNG(outlineOnly, use_real_colours,
+                        rect_width=20.0, rect_height=20.0,
+                        rect_radius_x = 25.0, rect_radius_y = 25.0,
+                        startX = 0.0, startY = 0.0):
+    """
+    Create SVG elements that represent each pixel of the loaded PNG image.
+
+    This function prepares an SVG sprite layer by converting pixel positions into
+    rounded rectangles (or outlines only), calling a lower-level function to
+    generate the actual drawing instructions. The canvas must already be sized with
+    svg_canvas_for_PNG(rect_width, rect_height, startX, startY).
+
+    Args:
+        outlineOnly (bool): If True, renders stroke outlines only.
+        use_real_colours (bool): If False, substitutes pixel colours with illusion palette.
+        rect_width (float): Width of each rectangle in mm.
+        rect_height (float): Height of each rectangle in mm.
+        rect_radius_x (float): Rounded corner radius on the X axis (%).
+        rect_radius_y (float): Rounded corner radius on the Y axis (%).
+        startX (float): Horizontal shift in mm.
+        startY (float): Vertical shift in mm.
+
+    Returns:
+        None. Streams the SVG group to SVG_Writer.
+
+    Globals:
+        SVG_Writer (ObjTextWriter): The SVG file being written.
+
+    TODO:
+        - Parameterise input pattern image instead of assuming current global
+    """
+    # Main Optical Illusion Drawing Group
+    sprite_group = create_svg_data_for_loaded_PNG(outlineOnly,
+                                                  use_real_colours,
+                                                  startX, startY,
+                                                  rect_width, rect_height,
+                                                  rect_radius_x, rect_radius_y)
+
+    svg_write(sprite_group)
+
+#
+# Create SVG Data for currently Loaded PNG In memory.
+#
+def create_svg_data_for_loaded_PNG(outline_only = False,
+                                   use_real_colours = True,
+                                   offset_X = 0.0, offset_Y = 0.0,
+                                   rect_width=20.0, rect_height=20.0,
+                                   rect_radius_x = "25%",
+                                   rect_radius_y = "25%",
+                                   start_X = 0.0, start_Y = 0.0):
+    """
+    Create SVG data corresponding to each pixel of the loaded PNG image.
+
+    This function overlays the sprite or image grid based on real pixel data,
+    mapped to a rectangular tile grid for scalable printing or cutting. Optionally
+    uses alternating colours instead of real colours to produce illusions, the
+    dark and light tiles then being written as two passes over the image.
+
+    Args:
+        outline_only (bool): If True, draws outlines only (circles or text instead of rectangles).
+        use_real_colours (bool): If False, replaces real colours with illusion palette.
+        offset_X (float): Horizontal shift of pixel grid in grid units.
+        offset_Y (float): Vertical shift of pixel grid in grid units.
+        rect_width (float): Width of each grid cell in mm.
+        rect_height (float): Height of each grid cell in mm.
+        rect_radius_x (str): Corner radius X (percentage).
+        rect_radius_y (str): Corner radius Y (percentage).
+        start_X (float): Additional horizontal offset in mm.
+        start_Y (float): Additional vertical offset in mm.
+
+    Yields:
+        str: SVG fragment strings forming the sprite overlay group.
+
+    Globals:
+        SVG_PNG_PIXEL_COUNT (int): Accumulates the number of drawn pixels.
+        Colour_Palette (ColourPalette): Label image and hex codes of the loaded PNG.
+        Image_MinX, Image_MinY, Image_Real_Width, Image_Real_Height: Sprite dimensions.
+        SVG_ILLUSION_COLOUR_TABLE: Used when not using real colours.
+        DARK_PIXEL_INDEX, LIGHT_PIXEL_INDEX: Used to alternate colour blocks.
+
+    TODO:
+        - Move `Colour_Palette` to passed parameters
+        - Consider merging sprite draw logic into generalised SVG pixel engine
+        - Add opacity toggle or pixel thresholding
+    """
+    global SVG_PNG_PIXEL_COUNT
+
+    # Whole colours as paths, outlines stay one marker per pixel for machining
+    if SVG_MERGE_PATHS and not outline_only:
+        yield from create_svg_paths_for_loaded_PNG(use_real_colours,
+                                                   offset_X, offset_Y,
+                                                   rect_width, rect_height,
+                                                   rect_radius_x, rect_radius_y,
+                                                   start_X, start_Y)
+        return
+
+    width = Image_Real_Width
+    height = Image_Real_Height
+
+    half_w = rect_width / 2
+    half_h = rect_height / 2
+
+    radius_size = min(rect_width, rect_height) * 0.25
+
+    # Only Add Pixel if in the Allowed Colour List
+    allowed = Colour_Palette.lookup(checkColourFilters)
+    allowed[ColourPalette.TRANSPARENT] = False
+
+    # Main Optical Illusion Drawing Group
+    yield '\t<g id="SpriteImage">\n'
+
+    # Real colours in one pass, otherwise the dark then the light pixels
+    if use_real_colours:
+        passes = [(None, '')]
+    else:
+        passes = [(True, '\t\t<g id="DarkPNGGroup">\n'), (False, '\t\t<g id="LightPNGGroup">\n')]
+
+    for dark, group in passes:
+        if dark is not None:
+            yield group
+
+        # Loop Across the Object
+        for y in range(height):
+            row = Colour_Palette.row(y + Image_MinY)
+            for x in range(width):
+                label = row[x + Image_MinX]
+                if allowed[label]:
+                    fill_color = Colour_Palette.hex[label]
+                    if dark is not None:
+                        if ((x % 2) == (y % 2)) != dark:
+                            continue
+                        #fill_color = "#2f0040" if (x % 2) == (y % 2) else "#FF7f80"
+                        fill_color = SVG_ILLUSION_COLOUR_TABLE[DARK_PIXEL_INDEX] if ((x+offset_X) % 2) == ((y+offset_Y) % 2) else SVG_ILLUSION_COLOUR_TABLE[LIGHT_PIXEL_INDEX]
+
+                    rect_x = (x + offset_X) * rect_width + start_X
+                    rect_y = (y + offset_Y) * rect_height + start_Y
+
+                    SVG_PNG_PIXEL_COUNT += 1
+                    if not outline_only:
+                        newObj = add_svg_rectangle("",rect_x, rect_y, rect_width, rect_height, rect_radius_x, rect_radius_y, fill_color)
+                    else:
+                        #newObj = add_svg_centeredText(rect_x + half_w, rect_y + half_h, "X", "#000000")
+                        newObj = add_svg_centeredCircle(rect_x + half_w, rect_y + half_h, radius_size, "none", 1)
+
+                    yield newObj if dark is None else "\t" + newObj
+
+        if dark is not None:
+            yield "\t\t</g>\n"
+
+    yield '\t</g>\n'
+
+#
+# The loaded PNG as one <path> per colour rather than a <rect> per pixel (--svgmerge)
+#
+def create_svg_paths_for_loaded_PNG(use_real_colours = True,
+                                    offset_X = 0.0, offset_Y = 0.0,
+                                    rect_width=20.0, rect_height=20.0,
+                                    rect_radius_x = 25.0, rect_radius_y = 25.0,
+                                    start_X = 0.0, start_Y = 0.0):
+    """
+    Draw the same pixels as create_svg_data_for_loaded_PNG(), merged into one <path>
+    per colour with each connected region of the colour a subpath.
+
+    With square corners the regions are the row runs of the colour, one rectangle
+    each, covering exactly the pixels. With rounded corners each region is its traced
+    outline (holes included) with every corner rounded by the tile's corner radius,
+    so the region looks like one rounded piece rather than separate rounded tiles.
+
+    Args:
+        use_real_colours (bool): If False, uses the illusion palette dark/light pixels.
+        offset_X, offset_Y (float): Shift of the pixel grid in grid units.
+        rect_width, rect_height (float): Size of each pixel in mm.
+        rect_radius_x, rect_radius_y (float): Corner radius (%), as add_svg_rectangle().
+        start_X, start_Y (float): Additional offset in mm.
+
+    Yields:
+        str: SVG fragment strings forming the sprite overlay group.
+
+    Globals:
+        SVG_PNG_PIXEL_COUNT (int): Accumulates the number of drawn pixels.
+        Colour_Palette (ColourPalette): Label image and hex codes of the loaded PNG.
+        Image_MinX, Image_MinY, Image_Real_Width, Image_Real_Height: Sprite dimensions.
+        SVG_ILLUSION_COLOUR_TABLE: Used when not using real colours.
+    """
+    global SVG_PNG_PIXEL_COUNT
+
+    labels = Colour_Palette.labels[Image_MinY:Image_MinY + Image_Real_Height,
+                                   Image_MinX:Image_MinX + Image_Real_Width]
+
+    # Only Add Pixel if in the Allowed Colour List
+    allowed = np.array(Colour_Palette.lookup(checkColourFilters), dtype=object)
+    allowed[ColourPalette.TRANSPARENT] = False
+    drawn = allowed.astype(bool)[labels]
+
+    SVG_PNG_PIXEL_COUNT += int(np.count_nonzero(drawn))
+
+    # Corner radii as add_svg_rectangle() and SVG give them, a missing one copies the other
+    fx = abs(rect_width * (rect_radius_x / 100.0) / 2) if rect_radius_x != 0.0 else None
+    fy = abs(rect_height * (rect_radius_y / 100.0) / 2) if rect_radius_y != 0.0 else None
+    fx, fy = (fx if fx is not None else fy), (fy if fy is not None else fx)
+
+    def path(keys, fill_colour, indent):
+        data = svg_outline_data(keys, offset_X, offset_Y, rect_width, rect_height, start_X, start_Y, fx, fy)
+        for key, d in data.items():
+            yield (f'{indent}<path transform="scale({SVG_PX_PER_MM:.6f})" '
+                   f'fill="{fill_colour(key)}" d="{d}"/>\n')
+
+    yield '\t<g id="SpriteImage">\n'
+
+    if use_real_colours:
+        yield from path(np.where(drawn, labels.astype(np.int64), -1), lambda key: Colour_Palette.hex[key], '\t\t')
+    else:
+        ys, xs = np.indices(labels.shape)
+        dark = (xs % 2) == (ys % 2)
+
+        for is_dark, group in ((True, 'DarkPNGGroup'), (False, 'LightPNGGroup')):
+            # A group's pixels share a parity, so all take the same colour
+            x = 0 if is_dark else 1
+            fill_color = SVG_ILLUSION_COLOUR_TABLE[DARK_PIXEL_INDEX] if ((x+offset_X) % 2) == (offset_Y % 2) else SVG_ILLUSION_COLOUR_TABLE[LIGHT_PIXEL_INDEX]
+
+            yield f'\t\t<g id="{group}">\n'
+            yield from path(np.where(drawn & (dark == is_dark), 0, -1), lambda key: fill_color, '\t\t\t')
+            yield '\t\t</g>\n'
+
+    yield '\t</g>\n'
+
+#
+# Path data for every colour of a key image
+#
+def svg_outline_data(keys, offset_X, offset_Y, rect_width, rect_height, start_X, start_Y, fx, fy):
+    """
+    Build the <path> d attribute, in mm, of the pixels carrying each key.
+
+    Positions are rounded to 0.001mm and the path written with relative moves
+    between them, so long outlines close exactly and the data stays compact.
+
+    Args:
+        keys (np.ndarray): H x W integer array, -1 for pixels not drawn.
+        offset_X, offset_Y (float): Shift of the pixel grid in grid units.
+        rect_width, rect_height (float): Size of each pixel in mm.
+        start_X, start_Y (float): Additional offset in mm.
+        fx, fy (float): Corner radii in mm, None for square corners (row runs).
+
+    Returns:
+        dict: key -> path data, keys in ascending order.
+    """
+    # Grid lines and radii in thousandths of a mm
+    columns = [round(((x + offset_X) * rect_width + start_X) * 1000) for x in range(keys.shape[1] + 1)]
+    rows = [round(((y + offset_Y) * rect_height + start_Y) * 1000) for y in range(keys.shape[0] + 1)]
+
+    def number(milli):
+        text = f"{milli / 1000:.3f}".rstrip("0").rstrip(".")
+        return "0" if text == "-0" else text
+
+    data = {}
+
+    if fx is None:
+        # Row runs, each a closed rectangle
+        padded = np.pad(keys, ((0, 0), (1, 1)), constant_values=-1)
+        changes = padded[:, 1:] != padded[:, :-1]
+
+        for y in range(keys.shape[0]):
+            edges = np.flatnonzero(changes[y]).tolist()
+            row = keys[y].tolist()
+            for start, end in zip(edges, edges[1:]):
+                key = row[start]
+                if key >= 0:
+                    width = columns[end] - columns[start]
+                    data.setdefault(key, []).append(f"M{number(columns[start])} {number(rows[y])}h{number(width)}"
+                                                    f"v{number(rows[y + 1] - rows[y])}h{number(-width)}z")
+
+        return {key: "".join(data[key]) for key in sorted(data)}
+
+    rx, ry = round(fx * 1000), round(fy * 1000)
+    arc = f"a{number(rx)} {number(ry)} 0 0 "
+
+    for key, loops in sorted(trace_pixel_outlines(keys).items()):
+        parts = []
+        for corners in loops:
+            count = len(corners)
+            points = []
+
+            # Each corner is cut back by the radius along both edges and joined by an arc
+            for i in range(count):
+                (ax, ay), (bx, by), (cx, cy) = corners[i - 1], corners[i], corners[(i + 1) % count]
+                inx, iny = (bx > ax) - (bx < ax), (by > ay) - (by < ay)
+                outx, outy = (cx > bx) - (cx < bx), (cy > by) - (cy < by)
+                sweep = 1 if inx * outy - iny * outx > 0 else 0
+
+                points.append((columns[bx] - inx * rx, rows[by] - iny * ry,
+                               columns[bx] + outx * rx, rows[by] + outy * ry, sweep))
+
+            x, y = points[-1][2], points[-1][3]
+            d = [f"M{number(x)} {number(y)}"]
+            for sx, sy, ex, ey, sweep in points:
+                if sx != x:
+                    d.append(f"h{number(sx - x)}")
+                elif sy != y:
+                    d.append(f"v{number(sy - y)}")
+                d.append(f"{arc}{sweep} {number(ex - sx)} {number(ey - sy)}")
+                x, y = ex, ey
+            d.append("z")
+            parts.append("".join(d))
+
+        data[key] = "".join(parts)
+
+    return data
+
+#
+# Trace the outlines of the regions of a key image along pixel edges
+#
+def trace_pixel_outlines(keys):
+    """
+    Trace the outline of every 4-connected region of pixels sharing a key.
+
+    Outlines follow the pixel edges with the region always on the right, so they run
+    clockwise on screen around a region and anticlockwise around its holes, and a
+    nonzero fill draws exactly the region's pixels. Where two pixels only touch at a
+    corner the trace turns to stay with the pixel it is following.
+
+    Args:
+        keys (np.ndarray): H x W integer array, -1 for pixels not drawn.
+
+    Returns:
+        dict: key -> list of loops, each a list of corner points (x, y) in pixel units.
+    """
+    padded = np.pad(keys, 1, constant_values=-1)
+    core = padded[1:-1, 1:-1]
+    drawn = core >= 0
+
+    # Unit edges where a pixel meets a different key: (neighbour, start corner, direction)
+    outgoing = {}
+    for neighbour, (ox, oy), direction in ((padded[:-2, 1:-1], (0, 0), (1, 0)),
+                                           (padded[1:-1, 2:], (1, 0), (0, 1)),
+                                           (padded[2:, 1:-1], (1, 1), (-1, 0)),
+                                           (padded[1:-1, :-2], (0, 1), (0, -1))):
+        ys, xs = np.nonzero(drawn & (neighbour != core))
+        for key, x, y in zip(core[ys, xs].tolist(), (xs + ox).tolist(), (ys + oy).tolist()):
+            outgoing.setdefault((key, x, y), []).append(direction)
+
+    loops = {}
+    for start, directions in outgoing.items():
+        key, x0, y0 = start
+
+        while directions:
+            first = directions.pop()
+            dx, dy = first
+            x, y = x0, y0
+            corners = []
+
+            while True:
+                x, y = x + dx, y + dy
+                options = outgoing[(key, x, y)]
+                candidates = options + [first] if (x, y) == (x0, y0) else options
+
+                # Prefer turning right, then straight on, then left
+                for turn in ((-dy, dx), (dx, dy), (dy, -dx)):
+                    if turn in candidates:
+                        break
+
+                if turn != (dx, dy):
+                    corners.append((x, y))
+
+                if (x, y) == (x0, y0) and turn == first:
+                    break
+
+                options.remove(turn)
+                dx, dy = turn
+
+            loops.setdefault(key, []).append(corners)
+
+    return loops
+
+# Update Verticies depending on position (0 or non 0)
+# Currently Assumes, 0 - Left, non-Zero right
+#
+def update_vert(val, r1, r2):
+    """
+    Select one of two values based on whether the input is zero or positive.
+
+    This is a simple conditional utility typically used to determine which X or Y
+    coordinate to use depending on a directional sign or polarity.
+
+    Args:
+        val (float): A directional or comparative value (usually a delta or sign).
+        r1 (Any): Value returned when val is 0 or negative.
+        r2 (Any): Value returned when val is positive.
+
+    Returns:
+        Any: r2 if val > 0.0, else r1.
+
+    TODO:
+        - Rename function to clarify purpose (e.g. select_by_sign, pick_side_based_on_direction)
+    """
+    if val > 0.0:
+        return r2
+    return r1
+
+#
+# Format a batch of coordinates as OBJ does ("{0:.6f}"), reusing the text of values
+# already seen. Primitives sit on a grid so the same few values come up again and again.
+#
+def formatCoordinates(values):
+    """
+    Format a sequence of floats to six decimal places, using Coordinate_Cache.
+
+    Zero is never cached because 0.0 and -0.0 share a key but format differently.
+
+    Args:
+        values (list): Floats (or ints) to format.
+
+    Returns:
+        list: The formatted strings, in the same order as values.
+
+    Globals:
+        Coordinate_Cache (dict): Value to formatted text, cleared when it grows too large.
+    """
+    cache = Coordinate_Cache
+    if len(cache) > COORDINATE_CACHE_LIMIT:
+        cache.clear()
+
+    text = []
+    for value in values:
+        formatted = cache.get(value)
+        if formatted is None:
+            formatted = format(value, ".6f")
+            if value:
+                cache[value] = formatted
+        text.append(formatted)
+
+    return text
+
+#
+# Normal block for a primitive, the same few normal lists are used for every
+# cube and joint so the text is built once per list.
+#
+def normalBlock(primitive_normals):
+    """
+    Return the `vn` lines and normal count comment for a list of normals.
+
+    Args:
+        primitive_normals (list): List of normal vectors.
+
+    Returns:
+        str: OBJ normal lines as written by create_primitive().
+
+    Globals:
+        Normal_Block_Cache (dict): Normal values to their text.
+    """
+    key = tuple(map(tuple, primitive_normals))
+    block = Normal_Block_Cache.get(key)
+
+    if block is None:
+        text = formatCoordinates([value for normal in key for value in normal])
+        block = "".join("vn " + text[index] + " " + text[index + 1] + " " + text[index + 2] + "\n"
+                        for index in range(0, len(text), 3))
+        block += f"# {len(key)} Normals\n"
+        Normal_Block_Cache[key] = block
+
+    return block
+
+#
+# Face block template for a face list, filled in by create_primitive() with str.format
+#
+def faceTemplate(primitive_face, jointFlag):
+    """
+    Return a format template for the `f` lines of a face list.
+
+    Field {k} is the vertex index for face entry k. Normals share the vertex index,
+    except for joints where field {size + k} holds the normal index instead.
+
+    Args:
+        primitive_face (list): List of face definitions (each a list of vertex indices).
+        jointFlag (bool): True when normals are offset from the vertices (joints).
+
+    Returns:
+        tuple: (template, size) where size is one more than the highest face entry.
+
+    Globals:
+        Face_Template_Cache (dict): Face lists to their templates.
+    """
+    key = (tuple(map(tuple, primitive_face)), jointFlag)
+    entry = Face_Template_Cache.get(key)
+
+    if entry is None:
+        faces = key[0]
+        size = max((k for face in faces for k in face), default=0) + 1
+        offset = size if jointFlag else 0
+        template = "".join("f " + "".join(f"{{{k}}}//{{{offset + k}}} " for k in face) + "\n" for face in faces)
+        entry = (template, size)
+        Face_Template_Cache[key] = entry
+
+    return entry
+
+#
+# Create a Primitive, in this example a Cube, but could be swapped for
+# Any primitive type
+#
+def create_primitive(primitive_x, primitive_y,
+                     width, height,
+                     primitive_vert,
+                     primitive_face,
+                     primitive_normals,
+                     jointFlag, material_index,
+                     primitive_y_multiplier=1.0,
+                     modify_Flag = True):
+    """
+    Construct the OBJ data string for a single primitive (pixel/cube section).
+
+    including vertex definitions, normals, and faces. Supports optional extrusion,
+    join alignment logic, and material tagging.
+
+    Args:
+        primitive_x (int): X index in the pixel grid.
+        primitive_y (int): Y index in the pixel grid.
+        width (int): Width multiplier (usually 1).
+        height (int): Height multiplier (usually 1).
+        primitive_vert (list): List of vertex coordinate tuples.
+        primitive_face (list): List of face definitions (each a list of vertex indices).
+        primitive_normals (list): List of normal vectors.
+        jointFlag (int or bool): If non-zero, alters how joining faces are placed.
+        material_index (int): Material ID for usemtl.
+        primitive_y_multiplier (float): Used to scale Z for height illusion effects.
+        modify_Flag (bool): If True, apply bounding adjustments using `update_vert`.
+
+    Returns:
+        str: OBJ-format string containing vertex, normal, face, and material lines.
+
+    Globals:
+        Current_Face (int): Running counter for face IDs.
+        Current_Opposite_Face (int): Offset for alternate normal indexing.
+        Relative_Obj_Indices (bool): Write negative face indices instead, see meshRowBands().
+        CurrentZOffset (float): Z-axis depth accumulator.
+        CUBE_X, CUBE_Y (float): Global size constants.
+        Primitive_Layer_Depth (float): Used in Z extrusion.
+        Primitive_Multipler (float): Overall pixel-to-mm scale.
+        CREATE_MTL_FILE (bool): Controls whether to emit `mtllib` / `usemtl`.
+        mtl_filename (str): File basename for MTL reference.
+        Indexed_Mesh (IndexedMeshWriter): When set, the primitive is welded into it instead.
+        Stl_Mesh, Model_3MF, Model_GLB: When any is set, the primitive is also
+            passed to exportMesh().
+        Stl_Output_Mode (str): When "only", nothing but exportMesh() is done.
+        Coordinate_Cache, Normal_Block_Cache, Face_Template_Cache (dict): Text reused
+            between primitives, see formatCoordinates(), normalBlock() and faceTemplate().
+
+    TODO:
+        - Clean up legacy commented face logic
+        - Clarify jointFlag meaning and ensure 0/1 vs signed int is consistent
+    """
+    global Current_Face
+    global Current_Opposite_Face
+    global CurrentZOffset
+    global Primitive_Multipler
+
+  #  if not jointFlag:
+  #      return ""
+
+    # Get the number of entries for Cube Vertices
+    # For future where primitive may change
+    vert_len = len(primitive_vert)
+    face_len = len(primitive_face)
+
+    rx = primitive_x * CUBE_X * Primitive_Multipler
+    ry = primitive_y * CUBE_Y * Primitive_Multipler
+    rx2 = rx + (CUBE_X * width * Primitive_Multipler)
+    ry2 = ry + (CUBE_Y * height * Primitive_Multipler)
+
+    #
+    # Generate the Basic Primitive for the Model, all coordinates of the
+    # primitive are computed first and formatted in one batch
+    #
+    depth_scale = Primitive_Layer_Depth/10
+    values = []
+
+    for vertex in primitive_vert:
+        v1 = vertex[0] * Primitive_Multipler
+        v2 = vertex[1] * Primitive_Multipler
+        v3 = vertex[2] * depth_scale #* Primitive_Multipler
+
+        if v3 != 0.0 and primitive_y_multiplier != 1.0:
+            v4 = primitive_y_multiplier * v3
+            v3 = v4 + CurrentZOffset
+        else:
+            v3 += CurrentZOffset
+
+        # Yeah, quick and dirty, I need to think this through
+        if not jointFlag:
+            if modify_Flag:
+                v1 = update_vert(v1, rx, rx2)
+                v2 = update_vert(v2, ry, ry2)
+
+        else:
+            # Invert Jointer Piece Depending on Direction set
+            v1 = (jointFlag * v1) + rx + (CUBE_X * Primitive_Multipler)
+            v2 = v2 + ry
+
+        values += (v1, v2, v3)
+
+    # Binary STL, 3MF and GLB alongside (or instead of) the OBJ
+    if Stl_Mesh is not None or Model_3MF is not None or Model_GLB is not None:
+        exportMesh(values, primitive_face, material_index, primitive_vert is cube_vertices and not jointFlag)
+
+    # No OBJ file is written for STL only output, so no text is needed
+    if Stl_Output_Mode == "only":
+        return ""
+
+    text = formatCoordinates(values)
+    coords = [text[index] + " " + text[index + 1] + " " + text[index + 2] for index in range(0, len(text), 3)]
+
+    # Welding into a shared mesh for this file, it writes its own vertices and faces
+    if Indexed_Mesh is not None:
+        return Indexed_Mesh.add_primitive(coords, primitive_face, primitive_normals, material_index)
+
+    mtl_string=""
+
+    if CREATE_MTL_FILE:
+        mtl_string = "mtllib "+os.path.basename(mtl_filename) + "\n" + \
+            f"usemtl {material_index}\n"
+
+    #
+    # Face List may contain variable length face lists, the template for them
+    # is built once per face list and filled with this primitive's indices.
+    #
+    face_template, face_ids = faceTemplate(primitive_face, bool(jointFlag))
+    if Relative_Obj_Indices:
+        # Counted back from this primitive's last v and vn lines, whatever was written before it
+        ids = [str(k - vert_len - 1) for k in range(face_ids)]
+        if jointFlag:
+            ids += [str(k - len(primitive_normals) - 1) for k in range(face_ids)]
+    else:
+        ids = list(map(str, range(Current_Face, Current_Face + face_ids)))
+        if jointFlag:
+            ids += map(str, range(Current_Opposite_Face + Current_Face, Current_Opposite_Face + Current_Face + face_ids))
+
+    Primitive_String = "".join((
+        f"o Pixel_{primitive_x}_{primitive_y}\n",
+        "".join(["v " + coord + "\n" for coord in coords]),
+        f"# {vert_len} Vertices\n",
+        normalBlock(primitive_normals),
+        mtl_string,
+        f"g ACIS Pixel_{primitive_x}_{primitive_y}_F\n",
+        face_template.format(*ids),
+        f"# {face_len} Faces\n\n"))
+
+    # update face Index Counter to next set 
+    #Current_Face += (face_len * 2)
+    #Current_Face += 8
+    Current_Face += len(primitive_vert)
+    Current_Opposite_Face += (len(primitive_normals))
+    return Primitive_String
+
+#
+# Define Material Colour
+#
+def MaterialColourAsString(r,g,b):
+    """
+    Generate an MTL-format material string from RGB values, scaled to 0.0–1.0.
+
+    This defines the 'Kd' (diffuse) property of a new material and appends it to the
+    global material list. Colour values are converted from 0–255 to floating point.
+
+    Args:
+        r (int): Red component (0–255)
+        g (int): Green component (0–255)
+        b (int): Blue component (0–255)
+
+    Returns:
+        str: A formatted MTL material string including diffuse colour and default parameters.
+
+    Globals:
+        mtl_final_list (list): Global list of all emitted material strings.
+        mtl_current_index (int): Name label for the material.
+        default_mtl_params (str): Standard trailing parameters for every material block.
+
+    TODO:
+        - Move formatter and multiplier to reusable helper
+        - Add alpha support or named material aliasing
+        - Remove reliance on global mtl_final_list for testability
+    """
+    global mtl_final_list
+
+    myFormatter = "{0:.6f}"
+
+    mult = 1.0/255.0
+
+    Material = f"\nnewmtl {mtl_current_index}\n" + \
+            f"Kd " + str(myFormatter.format(mult * r)) + " " + \
+            str(myFormatter.format(mult * g)) + " " + \
+            str(myFormatter.format(mult * b)) + " " + \
+            default_mtl_params + "\n"
+    
+    mtl_final_list.append(Material)
+    return Material
+
+#
+# Add material colour to Material File
+#
+def addMaterialToFile(r, g, b, pixel =-1):
+    """
+    Register a new material colour (RGB) if not already in use or excluded.
+
+    This function converts an RGB colour to hex, checks inclusion/exclusion lists,
+    and optionally creates a new material block via `MaterialColourAsString()`.
+
+    Args:
+        r (int): Red component (0–255)
+        g (int): Green component (0–255)
+        b (int): Blue component (0–255)
+        pixel (int): Index of pixel for material tracking. Required for material creation.
+
+    Returns:
+        tuple:
+            - bool: True if material was registered or already present; False if excluded.
+            - str: The hex colour code of the material.
+
+    Globals:
+        mtl_current_index (int): Tracks the active material index.
+        Colour_Exclusion_List (list[str]): Colours to skip during processing.
+        Colour_Process_Only_list (list[str]): Optional allowlist of colours to include.
+        mtl_colour_dict (dict): Tracks known registered colour codes.
+        mtl_colour_index (dict): Position of each colour code in mtl_colour_dict.
+
+    TODO:
+        - Refactor to separate logic for inclusion checks and material creation
+        - Make exclusion lists injectable or passed as arguments
+        - Move ColourCode generation to shared utility
+    """
+    global mtl_current_index
+
+    # Check to see if we already have this material.
+    ColourCode = "#"+'{:02x}'.format(r)+'{:02x}'.format(g)+'{:02x}'.format(b)
+
+    # Is Pixel in excluded list or missing from the process list?
+    if not checkColourFilters(ColourCode):
+        return False, ColourCode
+
+    if not ColourCode in mtl_colour_dict and not ColourCode in Colour_Exclusion_List:
+        mtl_colour_index[ColourCode] = len(mtl_colour_dict)
+        mtl_colour_dict[ColourCode] = 0
+
+
+        #if CREATE_MTL_FILE == True and pixel >= 0:
+        if pixel >= 0:
+            
+            Material = MaterialColourAsString(r,g,b)
+            mtl_current_index += 1
+            #WriteToMTLFile(Material)
+            return True, ColourCode
+        
+    return True, ColourCode
+
+#
+# Check a colour against the Exclusion and Process Only lists
+#
+def checkColourFilters(ColourCode, excludedColours=None):
+    """
+    Determine if a colour survives the user's exclusion and process-only lists.
+
+    Args:
+        ColourCode (str): Hex colour code (e.g. "#ffcc00").
+        excludedColours (list[str], optional): Exclusion list to use instead of
+                                               Colour_Exclusion_List.
+
+    Returns:
+        bool: False if the colour is excluded, or a process list is set and the
+              colour is not on it; True otherwise.
+
+    Globals:
+        Colour_Exclusion_List (list[str]): Colours to skip during processing.
+        Colour_Process_Only_list (list[str]): Optional allowlist of colours to include.
+    """
+    if ColourCode in (Colour_Exclusion_List if excludedColours is None else excludedColours):
+        return False
+
+    if len(Colour_Process_Only_list) > 0:
+        if ColourCode not in Colour_Process_Only_list:
+            return False
+
+    return True
+
+#
+# Process a simple set of rules to determine if a Jointer Block is required.
+# That is missing diagonal pixes.  It's crude and needs refinement.
+#
+def CheckJointRequired(x ,y ,row, nextRow, occupied, pattern_w):
+    """
+    Check if a pixel joint is needed to strengthen corner-only diagonal connections in the print.
+
+    This is used to detect weak diagonals where two pixels only touch at the corner,
+    with adjacent spaces in between. Such configurations (e.g. XO/OX or OX/XO)
+    result in fragile prints, especially on flat or thin-layered models.
+
+    The function inspects a 2x2 pixel area and identifies situations where a
+    small strengthening joint should be added between opposing corners.
+
+    Args:
+        x (int): Pixel's X-coordinate in the current row.
+        y (int): Pixel's Y-coordinate in the image.
+        row (list[int]): Palette labels for the current row.
+        nextRow (list[int]): Palette labels for the next row.
+        occupied (list[bool]): Per-label flag, True where a label counts as a solid pixel.
+        pattern_w (int): Width of the pixel row.
+
+    Returns:
+        int:
+            - 0 = No joint needed
+            - 1 = Add joint (↘ diagonal from top-left to bottom-right)
+            - -1 = Add joint (↙ diagonal from top-right to bottom-left)
+
+    Globals:
+        Pixel_W (int): Width of a sprite frame (used to avoid placing joints at sprite edges).
+        Pixel_H (int): Height of a sprite frame.
+
+    Note:
+        This logic is used regardless of print mode (flat, layered, or towered) to ensure print
+        strength and prevent brittle isolated pixels with corner-only contact. The meshing
+        loops use findJoints(), the same rules applied to whole blocks of rows.
+
     TODO:
-        - Move `pattern`/image data to passed parameters
-        - Consider merging sprite draw logic into generalised SVG pixel engine
-        - Add opacity toggle or pixel thresholding
+        - Make `Pixel_W` and `Pixel_H` configurable or passed in
+        - Consider returning a label/enum for joint type instead of int
+        - Add optional debug visual output to preview joints pre-print
+    """
+    isJointRequired = 0
+
+    # Check if we've Reached the boundary of the Sprite Sheet Sprite
+    if y > 0 and not (y+1) % Pixel_H:
+        return 0
+    
+    if x>0 and not (x+1) % Pixel_W:
+        return 0
+
+    # Not Checking last pixel as this is covered 
+    if x >= (pattern_w-1): 
+        return isJointRequired
+
+    a = occupied[row[x]]
+    b = occupied[row[x+1]]
+    c = occupied[nextRow[x]]
+    d = occupied[nextRow[x+1]]
+
+    if (a and d and not b and not c):
+        isJointRequired = 1
+
+    if (b and c and not a and not d):
+        isJointRequired = -1
+
+    return isJointRequired
+
+#
+# And this is where all that magic happens.
+#   A real Python Programmer can probably optimise this using some Python Magic.
+#
+def main(noframeRequired):
+    """
+    Execute the main program logic for layered PNG-to-OBJ conversion.
+
+    Depending on the selected mode, this function optionally generates a flat background layer,
+    sorts colour layers by count or explicit order, filters colours based on inclusion/exclusion
+    lists, and processes the image into multiple 3D printable OBJ layers.
+
+    Args:
+        noframeRequired (bool): If True, skips generating the flat background OBJ.
+
+    Globals:
+        WORKING_FILENAME (str): Base filename for output OBJ files.
+        Colour_Exclusion_List (list[str]): Colours to skip.
+        Colour_Process_Only_list (list[str]): Colours to force inclusion.
+        Sort_Colours_Flag (bool): Whether to sort colours by count.
+        Sort_Direction (bool): If True, sort descending; otherwise ascending.
+        FILE_COUNTER (int): Counter to track how many layers have been generated.
+        Primitive_Multiplier_Background (float): Z depth multiplier for background layer.
+        Primitive_Multiplier_Layers (float): Z depth multiplier for each coloured layer.
+        Create_Layered_File (bool): Whether to generate OBJ per colour.
+        ColoursOnSingleLayerHeight (bool): Treat all layers as same height.
+        mtl_colour_dict (dict): Maps colour hex codes to pixel counts.
+
+    Returns:
+        None. Writes OBJ files to disk.
+    
+    TODO:
+        - Move layer selection and sorting logic to a helper
+        - Refactor background flat layer creation into `write_background_layer()`
+        - Separate print output from logic for clean testing
+    """
+    global WORKING_FILENAME
+    global Colour_Exclusion_List
+    global Debug_Txt_File
+    global Sort_Colours_Flag
+    global Sort_Direction
+    global FILE_COUNTER
+    global Primitive_Multiplier_Background
+    global Primitive_Multiplier_Layers
+    global CurrentZOffset
+
+    # Create the Background Object File 
+    # Flat Structure width and height of PNG Image.
+    obj_file = os.path.join(PATTERNS, "{}.obj".format(WORKING_FILENAME))
+
+    if not noframeRequired:
+        try:
+            # TODO: Add some error checking here, rather than rely on TRY/CATCH Scenarios.
+            with ObjTextWriter(None if Stl_Output_Mode == "only" else obj_file) as fp_obj:
+                    startMeshExports(obj_file)
+                    if Contour_Meshing:
+                        # Frame as a single extruded rectangle
+                        frame = ContourExtrusionMesher(Path(obj_file).stem)
+                        for y in range(pattern_h):
+                            frame.add(0, y, pattern_w, 0, Primitive_Multiplier_Background)
+                        fp_obj.write(frame.finish())
+                    else:
+                        fp_obj.write(startIndexedMesh(Path(obj_file).stem))
+                        fp_obj.write(create_primitive(0, 0, pattern_w, pattern_h, cube_vertices, cube_faces, cube_normals, 0, 0, Primitive_Multiplier_Background))
+                        fp_obj.write(finishIndexedMesh())
+                    finishMeshExports()
+                    fp_obj.flush()
+                    fp_obj.close()
+                    # Update Current Offset with multiplier requested
+                    #CurrentZOffset += (abs(CUBE_Y*Primitive_Multiplier_Background)) # Shift Vertices Up a Layer...
+                    #CurrentZOffset += (abs(CUBE_Y*Primitive_Multiplier_Background*Primitive_Multipler)) # Shift Vertices Up a Layer...
+                    CurrentZOffset += Primitive_Layer_Depth*Primitive_Multiplier_Background # Shift Vertices Up a Layer...
+                
+        except Exception as error:
+        # Bad Practice I know...
+            print(f"Failed to create Initial file: {obj_file}, error: {error}")
+            exit(0)
+
+
+    ToSort = {}
+
+    if len(Colour_Process_Only_list) > 0:
+        SortedColours = list(Colour_Process_Only_list)
+        for x in range(0,len(Colour_Process_Only_list)):
+            ToSort[Colour_Process_Only_list[x]] = x
+    else:
+        # Set the Sorted Colours Dictionary to Default
+        # Remove any layes that have no pixels
+        # Colour layers that are all below the Alpha Threshold will have a count of 0
+        for key in mtl_colour_dict:
+            if mtl_colour_dict[key] > 0:
+                ToSort[key] = mtl_colour_dict[key]
+            else:
+                print(f"Removing Colour: {key} from processing, pixel count of Zero Detected (Check Alpha Threshold If Required)")
+
+    # Check if we want to sort by Highest Colour Count First
+    if Sort_Colours_Flag:
+        #SortedColours = {key: val for key, val in sorted(mtl_colour_dict.items(), key = lambda ele: ele[1], reverse=Sort_Direction)}
+        SortedColours = {key: val for key, val in sorted(ToSort.items(), key = lambda ele: ele[1], reverse=Sort_Direction)}
+    else:
+        SortedColours = dict(ToSort)
+
+    # Remove Colours from Excluded List 
+    for excluded in Colour_Exclusion_List:
+        if excluded in SortedColours:
+            del SortedColours[excluded]
+
+    print("Layer Order:")
+    for nextLayer in SortedColours:
+        print(f"{nextLayer}")
+
+    print(f"       Found : {len(mtl_colour_dict)} Colours")
+    print(f"Working with : {len(SortedColours)} Colours\n")
+
+    FILE_COUNTER +=1
+
+    if Create_Layered_File:
+        # Work out what each layer selects first, so the image is scanned once for
+        # all of them. Each layer excludes the colours of the layers before it.
+        layers = []
+        excluded = list(Colour_Exclusion_List)
+        order = list(SortedColours)
+
+        for index, nextLayer in enumerate(order):
+            if nextLayer in mtl_colour_dict:
+                if ColoursOnSingleLayerHeight:
+                    allowed = nextLayer
+                else:
+                    allowed = {code: SortedColours[code] for code in order[index:]}
+                layers.append((nextLayer, allowed, excluded, selectLayerLabels(allowed, excluded, excluded)))
+            excluded = excluded + [nextLayer]
+
+        # The debug text file is drawn by the pixel loop itself
+        if Debug_Txt_File:
+            layerRuns = {}
+        else:
+            layerRuns = dict(zip([layer[0] for layer in layers], scanLayerRuns([layer[3] for layer in layers])))
+
+        # Layers are independent once their runs and Z are known, write them side by side
+        if Worker_Jobs > 1 and layerRuns:
+            processLayersInParallel(layers, layerRuns)
+
+            for nextLayer in order:
+                if nextLayer not in mtl_colour_dict:
+                    print(f"Colour: {nextLayer} is not present, skipping...")
+            Colour_Exclusion_List += order
+            SortedColours.clear()
+
+        while len(SortedColours) > 0:
+            nextLayer = list(SortedColours.keys())[0]
+            log(f"Processing Colour: {nextLayer}")
+
+            if nextLayer in mtl_colour_dict:
+                if ColoursOnSingleLayerHeight:
+                    resp = processFile(nextLayer, nextLayer, Colour_Exclusion_List, Primitive_Multiplier_Layers, layerRuns.get(nextLayer))
+                else:
+                    resp = processFile(nextLayer, SortedColours, Colour_Exclusion_List, Primitive_Multiplier_Layers, layerRuns.get(nextLayer))
+                
+                if resp == False:
+                    print("Failed to process file:")
+                    exit (0)
+            else:
+                print(f"Colour: {nextLayer} is not present, skipping...")
+            # Add colour to excluded list to avoid repeat processing
+            Colour_Exclusion_List+=[nextLayer]
+            del SortedColours[nextLayer]
+    else:
+        resp = processFile(list(SortedColours.keys())[0], SortedColours, Colour_Exclusion_List)
+
+    # Every OBJ of the run goes into the one 3MF and GLB package
+    if Model_3MF is not None:
+        log(Model_3MF.close(os.path.join(PATTERNS, "{}.3mf".format(WORKING_FILENAME))))
+    if Model_GLB is not None:
+        log(Model_GLB.close(os.path.join(PATTERNS, "{}.glb".format(WORKING_FILENAME))))
+
+#
+# Load PNG File to Memory and perform some initial processing
+#   Check number of Channels, is Alpha Available, discover all colours in image
+#
+def loadPNGToMemory(Filename, bounds=None):
+    """
+    Load a PNG file from disk into memory and validate its structure.
+
+    This function reads the image file, checks the bit depth, detects alpha channel presence,
+    and assigns the global PNGImage shared by every output mode. It also triggers
+    discovery of colour layers used for slicing or object generation.
+
+    Args:
+        Filename (str): Path to the PNG file to load.
+        bounds (list[int], optional): User supplied bounding box (min_x, min_y, max_x, max_y),
+                                      pixels outside it are treated as transparent.
+
+    Returns:
+        bool: True if file loaded and passed basic checks; False if unsupported or missing.
+
+    Globals:
+        Loaded_Image (PNGImage): Decoded pixel array, alpha mask and packed colour plane.
+        pattern_w (int): Width in pixels.
+        pattern_h (int): Height in pixels.
+        pattern_meta (dict): Metadata including planes and alpha presence.
+        channels (int): Number of channels (3 = RGB, 4 = RGBA).
+
+    TODO:
+        - Refactor to return pattern metadata instead of using globals
+        - Consider supporting more colour modes or bit depths
+        - Expand error reporting to include file format and image mode issues
+    """
+    # Load the PNG File, Check if Valid
+    global Loaded_Image, pattern_w, pattern_h, pattern_meta, channels
+
+    Loaded_Image, pattern_w, pattern_h, pattern_meta = load_pattern(Filename)
+
+    # If File Wasn't Found Time to Quit
+    if Loaded_Image is None:
+        return False
+    
+    # Check we're dealing with 8 Bits per channel.
+    if pattern_meta['planes'] < 3:
+        log(f"PNG File Unsupported, convert to 8 Bits per Channel - 24 bit")
+        return False
+
+    # Check to see if Alpha Byte Present and set number of channels accordingly
+    alpha = pattern_meta['alpha']
+    channels = 4 if alpha else 3
+
+    if bounds:
+        Loaded_Image.clip(clampImageBounds(bounds, pattern_w, pattern_h))
+
+    discoverPixelLayers()
+
+    return True
+
+#
+# Stream the PNG File rather than loading it, for images too large for memory
+#   A cheap first pass discovers the colours and bounding box, OBJ generation
+#   then decodes the rows again as it goes.
+#
+def loadPNGAsStream(Filename, bounds=None):
+    """
+    Open a PNG file for streamed, row by row processing and run the analysis pass.
+
+    Only the OBJ modes use the streamed image; memory stays bounded by the image
+    width rather than its area.
+
+    Args:
+        Filename (str): Path to the PNG file to stream.
+        bounds (list[int], optional): User supplied bounding box (min_x, min_y, max_x, max_y),
+                                      pixels outside it are treated as transparent.
+
+    Returns:
+        bool: True if file opened and passed basic checks; False if unsupported or missing.
+
+    Globals:
+        Streamed_Image (PNGRowStream): Set to the opened stream.
+        pattern_w, pattern_h, pattern_meta, channels: Image details from the PNG header.
     """
-    global SVG_PNG_PIXEL_COUNT
-    
-    width = Image_Real_Width
-    height = Image_Real_Height
+    global Streamed_Image, pattern_w, pattern_h, pattern_meta, channels
 
-    half_w = rect_width / 2
-    half_h = rect_height / 2
-    
-    totalWidth = (rect_width * width) + offset_X + abs(start_X)
-    totalHeight = rect_height * (height + offset_Y) + abs(start_Y)
+    pattern_file = os.path.join(PATTERNS, "{}.png".format(Path(Filename).with_suffix('')))
 
-    update_svg_canvas_dimensions(totalWidth, totalHeight)
+    log(f"Attempting to stream file: {pattern_file}")
+    if not os.path.isfile(pattern_file):
+        log("Invalid PNG file: {}".format(pattern_file))
+        return False
 
-    # Main Optical Illusion Drawing Group
-    sprite_group = ['\t<g id="SpriteImage">\n']
+    stream = PNGRowStream(pattern_file, ALPHACUTOFF)
+    pattern_w, pattern_h, pattern_meta = stream.width, stream.height, stream.meta
 
-    radius_size = min(rect_width, rect_height) * 0.25
-    
-    dark_group = ['\t\t<g id="DarkPNGGroup">\n']
-    light_group = ['\t\t<g id="LightPNGGroup">\n']
-    
-    # Loop Across the Object
-    for y in range(height):
-        row = pattern[int((y+Image_MinY) % pattern_h)]
-        for x in range(width):
-            pixel, index, fill_color = getPixelFromRow(x + Image_MinX,row,channels, pattern_w )
-            # Only Add Pixel if in the Allowed Colour List
-            if pixel >=0:
-                if not use_real_colours:
-                    #fill_color = "#2f0040" if (x % 2) == (y % 2) else "#FF7f80"
-                    fill_color = SVG_ILLUSION_COLOUR_TABLE[DARK_PIXEL_INDEX] if ((x+offset_X) % 2) == ((y+offset_Y) % 2) else SVG_ILLUSION_COLOUR_TABLE[LIGHT_PIXEL_INDEX]
-                    group = dark_group if (x % 2) == (y % 2) else light_group
-
-                rect_x = (x + offset_X) * rect_width + start_X
-                rect_y = (y + offset_Y) * rect_height + start_Y
-
-                SVG_PNG_PIXEL_COUNT += 1
-                if not outline_only:
-                    newObj = add_svg_rectangle("",rect_x, rect_y, rect_width, rect_height, rect_radius_x, rect_radius_y, fill_color)
-                else:
-                    #newObj = add_svg_centeredText(rect_x + half_w, rect_y + half_h, "X", "#000000")
-                    newObj = add_svg_centeredCircle(rect_x + half_w, rect_y + half_h, radius_size, "none", 1)
+    # Check we're dealing with 8 Bits per channel.
+    if pattern_meta['planes'] < 3 or pattern_meta['bitdepth'] > 8:
+        log(f"PNG File Unsupported, convert to 8 Bits per Channel - 24 bit")
+        return False
 
-                if use_real_colours:
-                    sprite_group.append(newObj)
-                else:
-                    group.append("\t"+newObj)
-    if not use_real_colours:
-        dark_group.append("\t\t</g>\n")
-        light_group.append("\t\t</g>\n")
-        sprite_group.append(''.join(dark_group))
-        sprite_group.append(''.join(light_group))
-    
-    sprite_group.append('\t</g>\n')
+    channels = 4 if pattern_meta['alpha'] else 3
 
-    return sprite_group
+    if bounds:
+        stream.clip(clampImageBounds(bounds, pattern_w, pattern_h))
+
+    discoverPixelLayersStreaming(stream)
+    Streamed_Image = stream
+
+    return True
 
-# Update Verticies depending on position (0 or non 0)
-# Currently Assumes, 0 - Left, non-Zero right
 #
-def update_vert(val, r1, r2):
+# Single streamed pass over the rows to count colours and find the bounding box
+#
+def discoverPixelLayersStreaming(stream):
     """
-    Select one of two values based on whether the input is zero or positive.
+    Analyse a streamed PNG one row at a time: colour histogram, materials and bounding box.
 
-    This is a simple conditional utility typically used to determine which X or Y
-    coordinate to use depending on a directional sign or polarity.
+    The streamed equivalent of discoverPixelLayers(). Colours are counted per row and
+    merged in first-seen order so materials are numbered exactly as they would be for
+    an image loaded into memory. No label image is kept.
 
     Args:
-        val (float): A directional or comparative value (usually a delta or sign).
-        r1 (Any): Value returned when val is 0 or negative.
-        r2 (Any): Value returned when val is positive.
+        stream (PNGRowStream): The streamed image. When clipped, no rows below the
+                               clip box are decoded.
 
     Returns:
-        Any: r2 if val > 0.0, else r1.
+        None. Updates the palette, material tables and image bounds.
+
+    Globals:
+        Colour_Palette (ColourPalette): Set to a histogram-only palette.
+    """
+    global Colour_Palette
+
+    histogram = {}
+    minx, miny, maxx, maxy = stream.width, stream.height, -1, -1
+    last_row = stream.bounds[3] if stream.bounds else stream.height - 1
+
+    for y, (packed, opaque) in enumerate(stream.rows()):
+        if y > last_row:
+            break
+
+        cols = np.flatnonzero(opaque)
+        if cols.size == 0:
+            continue
+
+        minx = min(minx, int(cols[0]))
+        maxx = max(maxx, int(cols[-1]))
+        miny = min(miny, y)
+        maxy = y
+
+        unique, first, counts = np.unique(packed[opaque], return_index=True, return_counts=True)
+        order = np.argsort(first, kind='stable')
+
+        for colour, count in zip(unique[order].tolist(), counts[order].tolist()):
+            histogram[colour] = histogram.get(colour, 0) + count
+
+    Colour_Palette = ColourPalette.from_histogram(list(histogram), list(histogram.values()))
+    quantizePalette(Colour_Palette)
+    registerPaletteMaterials(Colour_Palette)
+    setImageBounds((minx, miny, maxx, maxy) if maxy >= 0 else None)
+
+#
+# Keep a user supplied bounding box inside the image
+#
+def clampImageBounds(bounds, width, height):
+    """
+    Clip a (min_x, min_y, max_x, max_y) bounding box to the image dimensions.
+
+    Returns:
+        tuple: The clipped bounding box.
+    """
+    minx, miny, maxx, maxy = bounds
+    return (max(0, minx), max(0, miny), min(width - 1, maxx), min(height - 1, maxy))
+
+#
+# Where processFile() reads its palette labelled rows from
+#
+def labelRowSource():
+    """
+    Return the object processFile() reads palette labelled rows from.
+
+    For an image held in memory this is the palette itself. For a streamed image a
+    fresh two row window is opened, decoding the file again from the top.
+
+    Returns:
+        ColourPalette or LabelRowWindow: Anything with a `row(y)` method.
+
+    Globals:
+        Streamed_Image (PNGRowStream): Set when the PNG is being streamed.
+        Colour_Palette (ColourPalette): Palette and label image.
+    """
+    if Streamed_Image is not None:
+        return LabelRowWindow(Streamed_Image, Colour_Palette)
+
+    return Colour_Palette
+
+# Work out the number of colours in the PNG
+# Also the True Width/Height taking out Pixels with Alpha Channels
+def discoverPixelLayers():
+    """
+    Analyse the loaded PNG in a single pass: colour histogram, materials and bounding box.
+
+    The palette is built from the packed colour plane with one np.unique() sweep,
+    giving the exact pixel count of every opaque colour. Colours are registered as
+    materials in the order they first appear, and the bounding box of all visible
+    pixels (i.e., those above the alpha cutoff) is taken from the alpha mask.
+
+    This is the only pass that writes to the material tables; every later stage
+    reads the results without changing them. Transparent pixels are not counted
+    and never register a material.
+
+    Returns:
+        None. Updates global image metrics in-place.
+
+    Globals:
+        Loaded_Image (PNGImage): Loaded image data and alpha mask.
+        Colour_Palette (ColourPalette): Set to the label image and colour table,
+                                        quantized when --maxcolours is set.
+        mtl_colour_dict (dict): Filled with hex colour code -> pixel count.
+        mtl_colour_index (dict): Filled with hex colour code -> material index.
+        mtl_current_index (int): Advanced for each material created.
+        Image_MinX (int): Minimum X of visible area.
+        Image_MaxX (int): Maximum X of visible area.
+        Image_MinY (int): Minimum Y of visible area.
+        Image_MaxY (int): Maximum Y of visible area.
+        Image_Real_Width (int): Width of bounding box.
+        Image_Real_Height (int): Height of bounding box.
 
     TODO:
-        - Rename function to clarify purpose (e.g. select_by_sign, pick_side_based_on_direction)
+        - Support trimming transparent borders automatically
+        - Consider returning a bounding box object
     """
-    if val > 0.0:
-        return r2
-    return r1
+    global Colour_Palette
+
+    # Label every pixel and count each colour in one sweep
+    Colour_Palette = ColourPalette(Loaded_Image)
+    quantizePalette(Colour_Palette)
+    registerPaletteMaterials(Colour_Palette)
+
+    # Bounding box comes straight from the alpha mask
+    setImageBounds(Loaded_Image.bounding_box())
 
 #
-# Create a Primitive, in this example a Cube, but could be swapped for
-# Any primitive type
+# Bound the number of colours (and so layers and materials) with --maxcolours
 #
-def create_primitive(primitive_x, primitive_y,
-                     width, height,
-                     primitive_vert,
-                     primitive_face,
-                     primitive_normals,
-                     jointFlag, material_index,
-                     primitive_y_multiplier=1.0,
-                     modify_Flag = True):
+def quantizePalette(palette):
     """
-    Construct the OBJ data string for a single primitive (pixel/cube section).
+    Quantize a palette to Max_Colours colours before any materials are registered.
 
-    including vertex definitions, normals, and faces. Supports optional extrusion,
-    join alignment logic, and material tagging.
+    Args:
+        palette (ColourPalette): Palette produced by the analysis pass.
+
+    Globals:
+        Max_Colours (int): Set by --maxcolours, 0 to keep every colour.
+    """
+    if Max_Colours < 1:
+        return
+
+    before = palette.quantize(Max_Colours)
+    if before > len(palette):
+        log(f"Reduced {before} colours to {len(palette)} (--maxcolours {Max_Colours})")
+
+#
+# Turn the colours given to --processcolours and --excludelist into palette colours
+#
+def resolveColourSelectors(palette):
+    """
+    Replace each requested colour with the nearest image colour within Colour_Tolerance.
+
+    Requested colours are matched case-insensitively, with or without the leading #.
+    A colour with nothing close enough in the image is kept as given and reported,
+    rather than quietly producing an empty layer. Colours resolving to the same
+    image colour are only listed once.
 
     Args:
-        primitive_x (int): X index in the pixel grid.
-        primitive_y (int): Y index in the pixel grid.
-        width (int): Width multiplier (usually 1).
-        height (int): Height multiplier (usually 1).
-        primitive_vert (list): List of vertex coordinate tuples.
-        primitive_face (list): List of face definitions (each a list of vertex indices).
-        primitive_normals (list): List of normal vectors.
-        jointFlag (int or bool): If non-zero, alters how joining faces are placed.
-        material_index (int): Material ID for usemtl.
-        primitive_y_multiplier (float): Used to scale Z for height illusion effects.
-        modify_Flag (bool): If True, apply bounding adjustments using `update_vert`.
+        palette (ColourPalette): Palette of the loaded image.
+
+    Globals:
+        Colour_Exclusion_List (list[str]): Rewritten with the matching palette codes.
+        Colour_Process_Only_list (list[str]): Rewritten with the matching palette codes.
+        Colour_Tolerance (float): Largest distance accepted, set by --colourtolerance.
+        Colour_Match_Metric (str): "rgb" or "deltae", set by --colourmatch.
+    """
+    global Colour_Exclusion_List
+    global Colour_Process_Only_list
+
+    Colour_Exclusion_List = matchPaletteColours(palette, Colour_Exclusion_List, "--excludelist")
+    Colour_Process_Only_list = matchPaletteColours(palette, Colour_Process_Only_list, "--processcolours")
+
+def matchPaletteColours(palette, codes, option):
+    """
+    Resolve a list of hex colour codes to palette hex codes, see resolveColourSelectors().
 
     Returns:
-        str: OBJ-format string containing vertex, normal, face, and material lines.
+        list[str]: The resolved colour codes, in the order requested.
+    """
+    if not codes:
+        return codes
+
+    packed = []
+    for code in codes:
+        digits = code.strip().lstrip("#")
+        try:
+            packed.append(int(digits, 16) if len(digits) == 6 else -1)
+        except ValueError:
+            packed.append(-1)
+
+    valid = [colour for colour in packed if colour >= 0]
+    labels, distances = palette.nearest(valid, Colour_Tolerance, Colour_Match_Metric)
+    matches = iter(zip(labels.tolist(), distances.tolist()))
+
+    resolved = []
+    for code, colour in zip(codes, packed):
+        if colour < 0:
+            print(f"{option}: {code} is not a colour code (#rrggbb), ignored")
+            continue
+
+        label, distance = next(matches)
+        if label:
+            match = palette.hex[label]
+            if match != code:
+                print(f"{option}: {code} matched image colour {match} (distance {distance:.2f})")
+        else:
+            match = code
+            print(f"{option}: {code} not found in the image within a tolerance of {Colour_Tolerance:g} "
+                  f"(nearest distance {distance:.2f})")
+
+        if match not in resolved:
+            resolved.append(match)
+
+    return resolved
+
+#
+# Register every palette colour as a material, in the order first seen
+#
+def registerPaletteMaterials(palette):
+    """
+    Add each colour of a palette to the material tables along with its pixel count.
+
+    Args:
+        palette (ColourPalette): Palette produced by the analysis pass.
+
+    Returns:
+        None. Updates the material tables and the palette's material indices.
 
     Globals:
-        Current_Face (int): Running counter for face IDs.
-        Current_Opposite_Face (int): Offset for alternate normal indexing.
-        CurrentZOffset (float): Z-axis depth accumulator.
-        CUBE_X, CUBE_Y (float): Global size constants.
-        Primitive_Layer_Depth (float): Used in Z extrusion.
-        Primitive_Multipler (float): Overall pixel-to-mm scale.
-        CREATE_MTL_FILE (bool): Controls whether to emit `mtllib` / `usemtl`.
-        mtl_filename (str): File basename for MTL reference.
+        mtl_colour_dict (dict): Filled with hex colour code -> pixel count.
+        mtl_colour_index (dict): Filled with hex colour code -> material index.
+        mtl_current_index (int): Advanced for each material created.
+    """
+    global mtl_current_index
+
+    for label in range(1, len(palette) + 1):
+        ColourCode = palette.hex[label]
+
+        if ColourCode not in mtl_colour_dict:
+            mtl_colour_index[ColourCode] = len(mtl_colour_dict)
+            mtl_colour_dict[ColourCode] = 0
+            MaterialColourAsString(*palette.rgb(label))
+            mtl_current_index += 1
+
+        mtl_colour_dict[ColourCode] += int(palette.counts[label])
+
+    palette.assign_materials(mtl_colour_index)
+
+#
+# Set the bounding box of the visible pixels
+#
+def setImageBounds(bounds):
+    """
+    Store the bounding box of the visible pixels and the real image size.
+
+    Args:
+        bounds (tuple): (min_x, min_y, max_x, max_y), or None for an empty image.
+
+    Returns:
+        None. Updates global image metrics in-place.
+
+    Globals:
+        Image_MinX, Image_MaxX, Image_MinY, Image_MaxY (int): Bounding box.
+        Image_Real_Width, Image_Real_Height (int): Size of the bounding box.
+    """
+    global Image_MinX
+    global Image_MaxX
+    global Image_MinY
+    global Image_MaxY
+    global Image_Real_Width
+    global Image_Real_Height
+
+    if bounds is None:
+        # Nothing above the Alpha Cutoff, report an empty image
+        minx, miny, maxx, maxy = 0, 0, -1, -1
+    else:
+        minx, miny, maxx, maxy = bounds
+
+    Image_MinX = minx
+    Image_MaxX = maxx
+    Image_MinY = miny
+    Image_MaxY = maxy
+    Image_Real_Width = maxx - minx + 1
+    Image_Real_Height = maxy - miny + 1
+
+def displayColourInformation():
+    """
+    Print a summary of all detected colours and their associated pixel counts.
+
+    This function sorts the colours found in the loaded PNG based on how frequently
+    they occur, and displays the hex code alongside the pixel count for each.
+
+    Returns:
+        None. Output is printed to stdout.
+
+    Globals:
+        mtl_colour_dict (dict): Dictionary mapping hex colour codes to pixel usage counts.
 
     TODO:
-        - Clean up legacy commented face logic
-        - Clarify jointFlag meaning and ensure 0/1 vs signed int is consistent
-        - Replace raw string formatting with f-string block builders for clarity
-        - Split into helper functions for face block, normal block, and vertex block
+        - Add CSV or JSON export option for colour statistics
+        - Allow filtering or sorting by hex code
+        - Consider aligning this with layer preview generation
     """
-    global Current_Face
-    global Current_Opposite_Face
-    global CurrentZOffset
-    global Primitive_Multipler
+    SortedColours = {key: val for key, val in sorted(mtl_colour_dict.items(), key = lambda ele: ele[1], reverse=True)}
+    
+    print("         Layer Order :")
+    print("         -------------")
+    print()
+    print("         Colour Code : Number of Pixels")
+    print("         -----------   ----------------\n")   
+    for nextLayer in SortedColours:
+        print(f"             {nextLayer} : {SortedColours[nextLayer]}")
 
-  #  if not jointFlag:
-  #      return ""
+    print(f"\n               Found : {len(mtl_colour_dict)} Colours")
 
-    strVertices = f"o Pixel_{primitive_x}_{primitive_y}\n"
-    strFaces = ""
 
-    # Get the number of entries for Cube Vertices
-    # For future where primitive may change
-    vert_len = len(primitive_vert)
-    face_len = len(primitive_face)
+#
+# Colour rules for one layer (or the flat/tower file) as per-label lookups
+#
+def selectLayerLabels(allowedDictionary, excludedColours, filteredColours):
+    """
+    Evaluate the processing rules once per palette colour.
 
-    rx = primitive_x * CUBE_X * Primitive_Multipler
-    ry = primitive_y * CUBE_Y * Primitive_Multipler
-    rx2 = rx + (CUBE_X * width * Primitive_Multipler)
-    ry2 = ry + (CUBE_Y * height * Primitive_Multipler)
+    Args:
+        allowedDictionary (dict): Colour keys allowed in this file.
+        excludedColours (list): Hex codes excluded by the processing rules.
+        filteredColours (list): Exclusion list for checkColourFilters(), normally
+                                Colour_Exclusion_List as it stands for this file.
 
-    myFormatter = "{0:.6f}"
+    Returns:
+        tuple: (selected, occupied) lists indexed by label. selected marks the pixels
+               written to the file, occupied the pixels counting towards a joint
+               (black reports a pixel value of 0 so never does).
+    """
+    # checkColourFilters() for every label at once
+    passes = ~Colour_Palette.mask(filteredColours)
+    if len(Colour_Process_Only_list) > 0:
+        passes &= Colour_Palette.mask(Colour_Process_Only_list)
+    passes[ColourPalette.TRANSPARENT] = False
 
-    #
-    # Generate the Basic Primitive for the Model
-    #
-    for index in range(vert_len):
-        v1 = primitive_vert[index][0] * Primitive_Multipler
-        v2 = primitive_vert[index][1] * Primitive_Multipler
-        v3 = primitive_vert[index][2] * (Primitive_Layer_Depth/10) #* Primitive_Multipler
+    selected = [bool(keep) and checkProcessingRules(allowedDictionary, code, excludedColours, 0)
+                for keep, code in zip(passes.tolist(), Colour_Palette.hex)]
 
-        if v3 != 0.0 and primitive_y_multiplier != 1.0:
-            v4 = primitive_y_multiplier * v3
-            v3 = v4 + CurrentZOffset
-        else:
-            v3 += CurrentZOffset
+    occupied = (passes & (Colour_Palette.colours != 0)).tolist()
 
-        # Yeah, quick and dirty, I need to think this through
-        if not jointFlag:
-            if modify_Flag:
-                v1 = update_vert(v1, rx, rx2)
-                v2 = update_vert(v2, ry, ry2)
+    return selected, occupied
 
-        else:
-            # Invert Jointer Piece Depending on Direction set
-            v1 = (jointFlag * v1) + rx + (CUBE_X * Primitive_Multipler)
-            v2 = v2 + ry
+#
+# Layered mode, find the runs and joints of every layer in one pass over the image
+# rather than one pass per colour.
+#
+def scanLayerRuns(layers):
+    """
+    Scan the image once and split each row into the runs and joints of every layer.
 
-        strVertices = strVertices + "v " + str(myFormatter.format(v1)) + " " + \
-                        str(myFormatter.format(v2)) + " " + str(myFormatter.format(v3)) + "\n"
+    This gives exactly what processFile() would find scanning the image for each layer
+    in turn: runs of selected pixels broken at sprite gutters (Pixel_W), and joints
+    where only diagonal corners of occupied pixels meet. Rows are labelled once and
+    each layer's selection is applied to the whole row with numpy.
 
-    strVertices = strVertices + "# "+str(vert_len)+f" Vertices\n"
+    Args:
+        layers (list): (selected, occupied) label lookups per layer, from selectLayerLabels().
 
-    strNormals = ""
-    # Bit of a Bodge... 
-    for index in range(len(primitive_normals)):
-        n1 = primitive_normals[index][0]
-        n2 = primitive_normals[index][1]
-        n3 = primitive_normals[index][2]
-        strNormals = strNormals + "vn " + str(myFormatter.format(n1)) + " " + str(myFormatter.format(n2)) + " " + str(myFormatter.format(n3)) + "\n"
+    Returns:
+        list: Per layer, a list with an entry per row from Image_MinY to Image_MaxY. Each
+              entry lists (kind, start_x, value) in the order processFile() writes them,
+              kind LAYER_RUN with the run width or LAYER_JOINT with the joint direction.
 
-    strNormals = strNormals + "# "+str(len(primitive_normals))+f" Normals\n"
+    Globals:
+        Image_MinX, Image_MaxX, Image_MinY, Image_MaxY (int): Bounding box scanned.
+        Pixel_W, Pixel_H (int): Sprite sizes, runs stop and joints skip at their edges.
+        JOINTS_REQUIRED (bool): Whether joints are looked for at all.
+    """
+    rows = labelRowSource()
+    tables = [(np.array(selected, dtype=bool), np.array(occupied, dtype=bool)) for selected, occupied in layers]
+    found = [[] for _ in layers]
 
-    #strFaces = "# "+str(vert_len)+f" Vertices\ng Pixel_{primitive_x}_{primitive_y}_F\n"
-    mtl_string=""
+    xs = np.arange(Image_MinX, Image_MaxX + 1)
 
-    if material_index > 1:
-        print
-    if CREATE_MTL_FILE:
-        mtl_string = "mtllib "+os.path.basename(mtl_filename) + "\n" + \
-            f"usemtl {material_index}\n"
+    # A gutter before x closes any run and moves everything after it along by one
+    gutter = (xs > 0) & (xs % Pixel_W == 0)
+    start_x = xs - Image_MinX + np.cumsum(gutter)
 
-    strFaces=f"g ACIS Pixel_{primitive_x}_{primitive_y}_F\n"
+    begins = np.empty(len(xs), dtype=bool)
+    ends = np.empty(len(xs), dtype=bool)
 
-    #
-    # Face List may contain variable length face lists.
-    #
-    for index in range(face_len):
-        # Initial Face Identifier
-        strFaces = strFaces + "f "
+    for y in range(Image_MinY, Image_MaxY + 1):
+        thisRow = np.array(rows.row(y))
+        row = thisRow[xs]
 
-        for faceIndex in range(len(primitive_face[index])):
-            
-            faceID = primitive_face[index][faceIndex] + Current_Face
-            faceIDOpposite = Current_Opposite_Face+faceID
-            if jointFlag:
-                strFaces = strFaces + f"{faceID}//{faceIDOpposite} "
-            else:
-                strFaces = strFaces + f"{faceID}//{faceID} "
-            #f1 = primitive_face[index][0] + Current_Face
-            #f2 = primitive_face[index][1] + Current_Face
-            #f3 = primitive_face[index][2] + Current_Face
+        checkJoints = JOINTS_REQUIRED and y != pattern_h - 1 and not (y > 0 and not (y + 1) % Pixel_H)
+        if checkJoints:
+            rowPair = np.array([thisRow, rows.row(y + 1)])
 
-            #strFaces = strFaces + "f " + f"{f1}//{f1} {f2}//{f2} {f3}//{f3}\n"
-            #if jointFlag:
-            #    strFaces = strFaces + "f " + f"{f1}//{Current_Opposite_Face + f1} {f2}//{Current_Opposite_Face + f2} {f3}//{Current_Opposite_Face + f3}\n"
-            #else:
-                #strFaces = strFaces + "f " + f"{f1}//{(index*3)+1+ Current_Opposite_Face} {f2}//{(index*3)+2+ Current_Opposite_Face} {f3}//{(index*3)+3+ Current_Opposite_Face}\n"
-            #    strFaces = strFaces + "f " + f"{f1}//{f1} {f2}//{f2} {f3}//{f3}\n"
+        for (selected, occupied), layer in zip(tables, found):
+            mask = selected[row]
+            events = []
 
-        strFaces = strFaces + "\n"
+            if mask.any():
+                begins[0] = mask[0]
+                begins[1:] = mask[1:] & (~mask[:-1] | gutter[1:])
+                ends[-1] = mask[-1]
+                ends[:-1] = mask[:-1] & (~mask[1:] | gutter[1:])
 
-    Primitive_String = strVertices + strNormals + mtl_string + strFaces + "# "+str(face_len)+" Faces\n\n"
+                # A run is written when the pixel after it is reached
+                for first, last in zip(np.flatnonzero(begins).tolist(), np.flatnonzero(ends).tolist()):
+                    events.append((last + 1, 0, LAYER_RUN, int(start_x[first]), last - first + 1))
 
+            if checkJoints:
+                direction = findJoints(rowPair, occupied, y)[0]
 
-    # update face Index Counter to next set 
-    #Current_Face += (face_len * 2)
-    #Current_Face += 8
-    Current_Face += len(primitive_vert)
-    Current_Opposite_Face += (len(primitive_normals))
-    return Primitive_String
+                # Joints are written after the run closed at the same pixel
+                for index in np.flatnonzero(direction).tolist():
+                    events.append((index, 1, LAYER_JOINT, int(start_x[index]), int(direction[index])))
+
+            events.sort()
+            layer.append([event[2:] for event in events])
+
+    return found
 
 #
-# Define Material Colour
+# Z offset and layer depth of each --layered file, from the same rules processFile()
+# applies after writing a layer.
 #
-def MaterialColourAsString(r,g,b):
+def layerSchedule(count):
     """
-    Generate an MTL-format material string from RGB values, scaled to 0.0–1.0.
-
-    This defines the 'Kd' (diffuse) property of a new material and appends it to the
-    global material list. Colour values are converted from 0–255 to floating point.
+    Work out the Z state every layer starts with when written in order.
 
     Args:
-        r (int): Red component (0–255)
-        g (int): Green component (0–255)
-        b (int): Blue component (0–255)
+        count (int): Number of layer files.
 
     Returns:
-        str: A formatted MTL material string including diffuse colour and default parameters.
-
-    Globals:
-        mtl_final_list (list): Global list of all emitted material strings.
-        mtl_current_index (int): Name label for the material.
-        default_mtl_params (str): Standard trailing parameters for every material block.
-
-    TODO:
-        - Move formatter and multiplier to reusable helper
-        - Add alpha support or named material aliasing
-        - Remove reliance on global mtl_final_list for testability
+        list: (CurrentZOffset, Primitive_Layer_Depth, Primitive_Initial_Layer_Depth) for
+              each layer, plus one more entry for the state after the last layer.
     """
-    global mtl_final_list
+    z, depth, initial = CurrentZOffset, Primitive_Layer_Depth, Primitive_Initial_Layer_Depth
+    schedule = [(z, depth, initial)]
 
-    myFormatter = "{0:.6f}"
+    for _ in range(count):
+        if not ColoursOnSingleLayerHeight:
+            z += depth * Primitive_Multiplier_Layers
 
-    mult = 1.0/255.0
+            if initial != 0.0:
+                depth = initial
+                initial = 0.0
 
-    Material = f"\nnewmtl {mtl_current_index}\n" + \
-            f"Kd " + str(myFormatter.format(mult * r)) + " " + \
-            str(myFormatter.format(mult * g)) + " " + \
-            str(myFormatter.format(mult * b)) + " " + \
-            default_mtl_params + "\n"
-    
-    mtl_final_list.append(Material)
-    return Material
+        schedule.append((z, depth, initial))
+
+    return schedule
 
 #
-# Add material colour to Material File
+# Module settings handed to each layer worker process
 #
-def addMaterialToFile(r, g, b, pixel =-1):
+def workerState(**extra):
     """
-    Register a new material colour (RGB) if not already in use or excluded.
+    Return the settings in WORKER_SETTINGS (flags, sizes, file names, material tables).
 
-    This function converts an RGB colour to hex, checks inclusion/exclusion lists,
-    and optionally creates a new material block via `MaterialColourAsString()`.
+    Workers started with spawn import the module afresh, so everything processFile()
+    reads is passed to them. The decoded image is not, layer workers get their runs
+    instead and band workers the palette, passed in extra.
+
+    Returns:
+        dict: Name -> value, installed in each worker by initWorker().
+
+    Globals:
+        WORKER_SETTINGS (tuple): Names of the settings passed on.
+    """
+    state = {name: globals()[name] for name in WORKER_SETTINGS}
+    state.update(extra)
+
+    return state
+
+def initWorker(state):
+    """
+    ProcessPoolExecutor initializer, install the settings from workerState().
+    """
+    globals().update(state)
+
+def processLayerJob(job):
+    """
+    Write one --layered file in a worker process.
 
     Args:
-        r (int): Red component (0–255)
-        g (int): Green component (0–255)
-        b (int): Blue component (0–255)
-        pixel (int): Index of pixel for material tracking. Required for material creation.
+        job (tuple): (colour, allowed, excluded, schedule, runs, packages) where schedule is
+                     the layer's entry from layerSchedule(), runs its entry from
+                     scanLayerRuns() and packages says whether 3MF/GLB output is on.
 
     Returns:
-        tuple:
-            - bool: True if material was registered or already present; False if excluded.
-            - str: The hex colour code of the material.
+        tuple: (result of processFile(), ThreeMFPackage or None, GLBPackage or None)
+    """
+    global CurrentZOffset, Primitive_Layer_Depth, Primitive_Initial_Layer_Depth
+    global Model_3MF, Model_GLB
 
-    Globals:
-        mtl_current_index (int): Tracks the active material index.
-        Colour_Exclusion_List (list[str]): Colours to skip during processing.
-        Colour_Process_Only_list (list[str]): Optional allowlist of colours to include.
-        mtl_colour_dict (dict): Tracks known registered colour codes.
+    colour, allowed, excluded, schedule, runs, (threemf, glb) = job
 
-    TODO:
-        - Refactor to separate logic for inclusion checks and material creation
-        - Make exclusion lists injectable or passed as arguments
-        - Move ColourCode generation to shared utility
+    CurrentZOffset, Primitive_Layer_Depth, Primitive_Initial_Layer_Depth = schedule
+
+    # Each file's 3MF/GLB objects are collected here and merged by the parent
+    Model_3MF = ThreeMFPackage() if threemf else None
+    Model_GLB = GLBPackage(glb) if glb is not None else None
+
+    log(f"Processing Colour: {colour}")
+    resp = processFile(colour, allowed, excluded, Primitive_Multiplier_Layers, runs)
+
+    return resp, Model_3MF, Model_GLB
+
+def processLayersInParallel(layers, layerRuns):
     """
-    global mtl_current_index
+    Write the --layered files with Worker_Jobs worker processes.
 
-    # Check to see if we already have this material.
-    ColourCode = "#"+'{:02x}'.format(r)+'{:02x}'.format(g)+'{:02x}'.format(b)
+    The image has already been scanned once by scanLayerRuns(), so each worker only
+    receives its layer's runs along with the Z offset and depth from layerSchedule().
+    Files come out exactly as the serial loop writes them.
 
-    # Is Pixel in excluded list?
-    if ColourCode in Colour_Exclusion_List:
-        return False, ColourCode
-    
-    if len(Colour_Process_Only_list) > 0:
-        if ColourCode not in Colour_Process_Only_list:
-            return False, ColourCode
+    Args:
+        layers (list): (colour, allowed, excluded, selection) for each layer, in order.
+        layerRuns (dict): Colour code -> runs from scanLayerRuns().
 
-    if not ColourCode in mtl_colour_dict and not ColourCode in Colour_Exclusion_List:
-        mtl_colour_dict[ColourCode] = 0
+    Globals:
+        CurrentZOffset, Primitive_Layer_Depth, Primitive_Initial_Layer_Depth: Left as
+            they would be after writing the layers serially.
+        Model_3MF, Model_GLB: Gain each layer's object, in layer order.
+    """
+    global CurrentZOffset, Primitive_Layer_Depth, Primitive_Initial_Layer_Depth
 
+    schedule = layerSchedule(len(layers))
+    packages = (Model_3MF is not None, Model_GLB.instanced if Model_GLB is not None else None)
 
-        #if CREATE_MTL_FILE == True and pixel >= 0:
-        if pixel >= 0:
-            
-            Material = MaterialColourAsString(r,g,b)
-            mtl_current_index += 1
-            #WriteToMTLFile(Material)
-            return True, ColourCode
-        
-    return True, ColourCode
+    jobs = [(colour, allowed, excluded, depths, layerRuns[colour], packages)
+            for (colour, allowed, excluded, _), depths in zip(layers, schedule)]
+
+    log(f"Writing {len(jobs)} layers with {Worker_Jobs} processes")
+
+    with ProcessPoolExecutor(max_workers=Worker_Jobs, initializer=initWorker,
+                             initargs=(workerState(),)) as pool:
+        for resp, threemf, glb in pool.map(processLayerJob, jobs):
+            if resp == False:
+                print("Failed to process file:")
+                exit (0)
+
+            if threemf is not None:
+                Model_3MF.extend(threemf)
+            if glb is not None:
+                Model_GLB.extend(glb)
+
+    CurrentZOffset, Primitive_Layer_Depth, Primitive_Initial_Layer_Depth = schedule[-1]
 
 #
-# Convert Colour To Pixel - Can extend this to exclude colour ranges in future updates.
+# Write one layer's runs and joints, as found by scanLayerRuns()
 #
-def getPixelFromRow(x, row, channels, rowWidth):
+def replayLayerRuns(fp_obj, mesher, layerRuns, layerColour, primitive_y_multiplier):
     """
-    Extract a pixel's RGB(A) data from a given row of image data and determine material index.
-
-    This function interprets raw pixel data (indexed or RGB/RGBA), evaluates transparency,
-    and registers a colour as a material if valid. It returns the pixel intensity,
-    the assigned material index, and the hex colour code.
+    Write the runs and joints of one layer exactly as processFile()'s row loop would.
 
     Args:
-        x (int): Horizontal pixel index within the row.
-        row (list[int]): Flattened image row data (byte list).
-        channels (int): Number of channels per pixel (1=Indexed, 3=RGB, 4=RGBA).
-        rowWidth (int): Total number of pixels in the row.
+        fp_obj (ObjTextWriter): OBJ file being written.
+        mesher: GreedyRectangleMesher, VoxelSurfaceMesher, ContourExtrusionMesher or None.
+        layerRuns (list): This layer's entry from scanLayerRuns().
+        layerColour (int): Material index of the layer.
+        primitive_y_multiplier (float): Height multiplier for the layer.
 
     Returns:
-        tuple:
-            - int: Pixel value (0-255) or -1 for transparent/invalid
-            - int: Index of material in material dictionary, or -1 if invalid
-            - str: Hex colour code (e.g. "#ffcc00") or default "#000000"
+        int: Number of runs written.
+    """
+    # Joints take the material of the last run written, 1 until there is one
+    thisColour = 1
+    runs = 0
+    start_y = 0
 
-    Globals:
-        ALPHACUTOFF (int): Threshold below which alpha is considered transparent.
-        mtl_colour_dict (dict): Maps colour hex codes to usage count.
-        mtl_current_index (int): Material creation tracker.
-        Create_Towered_File (bool): Affects towered output behaviour.
+    for y, events in zip(range(Image_MinY, Image_MaxY + 1), layerRuns):
+        # Sprite gutter rows, as processFile()
+        if y > 0 and not(y % Pixel_H):
+            start_y = start_y + 1
 
-    TODO:
-        - Refactor RGB/Alpha logic into a reusable pixel parser
-        - Expose ALPHACUTOFF and Create_Towered_File as arguments or config
-        - Add support for 16-bit PNGs or grayscale+alpha channels
+        for kind, start_x, value in events:
+            if kind == LAYER_RUN:
+                thisColour = layerColour
+                fp_obj.write( emitPixelRun(mesher, start_x, start_y, value, thisColour, primitive_y_multiplier) )
+                runs += 1
+            else:
+                fp_obj.write( create_primitive(start_x, start_y + 1, 1, 1, joint_verticies, joint_faces, joint_normals, value, thisColour, primitive_y_multiplier) )
+
+        if mesher is not None:
+            fp_obj.write( mesher.end_row() )
+
+        start_y = start_y + 1
+
+    return runs
+
+#
+# Diagonal joints for a block of rows at once, CheckJointRequired()'s rules as
+# shifted boolean ANDs over the occupancy mask.
+#
+def findJoints(labels, occupied, first_y):
     """
-    # Calculate the offset into the ROW for pixel information
-    offset_x = (x * channels) % (rowWidth * channels)
-    pixel = 0
-    ColourCode = "#000000"
+    Work out the joint direction of every pixel in a block of image rows.
 
-    # Need the current Index of Colour or do we? Could use dict len?
-    global mtl_current_index
-    global Create_Towered_File
+    Args:
+        labels (np.ndarray): Palette labels for the block's rows followed by the row
+                             after the last (wrapping as row() does), full image width.
+        occupied (list): Per-label flag, True where a label counts as a solid pixel.
+        first_y (int): Image row of labels[0].
+
+    Returns:
+        np.ndarray: Direction for each block row and column from Image_MinX to Image_MaxX,
+                    1 (↘), -1 (↙) or 0, as CheckJointRequired() would return.
 
-    TowerMultiplier = 1.0
+    Globals:
+        Pixel_W, Pixel_H (int): No joints at the right or bottom edge of a sprite.
+        pattern_w, pattern_h (int): Nor on the last column or row of the image.
+    """
+    occupancy = np.asarray(occupied, dtype=bool)[labels]
 
-    # If Indexed PNG, we're only interested in the index value
-    if channels == 1:
-        pixel = row[x]
+    xs = np.arange(Image_MinX, Image_MaxX + 1)
+    ys = np.arange(first_y, first_y + len(labels) - 1)
+    right = np.minimum(xs + 1, pattern_w - 1)
 
-    else:
-        # Get the RGB Values from the offset
-        r, g, b = row[offset_x:offset_x + 3]
+    a = occupancy[:-1, xs]
+    b = occupancy[:-1, right]
+    c = occupancy[1:, xs]
+    d = occupancy[1:, right]
 
-        # Crude but effective as we're only interested in whether colour data
-        # is prsent or not to determine whether to add a primitive or not
-        pixel = r|g|b
+    direction = (a & d & ~b & ~c).astype(np.int8) - (b & c & ~a & ~d)
 
-    if channels == 4:
-        #Check Alpha
-        a = row[offset_x+3]
-        # If below the cutoff we set the pixel to 0 (No Colour Data)
-        if a <= ALPHACUTOFF:
-            pixel = -1
-            r = 0
-            g = 0
-            b = 0
+    rowsAllowed = (ys != pattern_h - 1) & ~((ys > 0) & ((ys + 1) % Pixel_H == 0))
+    columnsAllowed = (xs < pattern_w - 1) & ~((xs > 0) & ((xs + 1) % Pixel_W == 0))
 
-    valid, ColourCode = addMaterialToFile(r, g, b, pixel)
+    return direction * (rowsAllowed[:, None] & columnsAllowed)
 
-    if not valid:
-        pixel =-1
+def imageJoints(occupied, first_y=None, last_y=None):
+    """
+    Return findJoints() for rows first_y to last_y of an image held in memory.
 
+    Rows default to the bounding box. Returns None when joints are off, or when the
+    image is streamed and its joints are found a row at a time instead.
+    """
+    if not JOINTS_REQUIRED or Streamed_Image is not None:
+        return None
 
-    material_index = -1
-    
-    # Retrieve the index of the Colour Code from the Dictionary
-    if ColourCode in mtl_colour_dict and pixel > -1:
-        material_index = list(mtl_colour_dict).index(ColourCode)
-        mtl_colour_dict[ColourCode] += 1
+    first_y = Image_MinY if first_y is None else first_y
+    last_y = Image_MaxY if last_y is None else last_y
 
-    return pixel, material_index, ColourCode
+    labels = Colour_Palette.labels
+    return findJoints(labels[np.arange(first_y, last_y + 2) % labels.shape[0]], occupied, first_y)
 
 #
-# Process a simple set of rules to determine if a Jointer Block is required.
-# That is missing diagonal pixes.  It's crude and needs refinement.
+# Tower mode, build the height map of the whole image and hand it to a HeightfieldMesher
 #
-def CheckJointRequired(x ,y ,row, nextRow, channels, pattern_w):
+def gridPositions(first, last, spacing):
     """
-    Check if a pixel joint is needed to strengthen corner-only diagonal connections in the print.
+    Return the gutter adjusted grid position of each pixel from first to last.
 
-    This is used to detect weak diagonals where two pixels only touch at the corner,
-    with adjacent spaces in between. Such configurations (e.g. XO/OX or OX/XO)
-    result in fragile prints, especially on flat or thin-layered models.
+    Matches the start_x/start_y counting in meshRows(), one step per pixel and one
+    more wherever a sprite of the given size ends.
+    """
+    pixels = np.arange(first, last + 1)
+    return pixels - first + np.cumsum((pixels > 0) & (pixels % spacing == 0))
 
-    The function inspects a 2x2 pixel area and identifies situations where a
-    small strengthening joint should be added between opposing corners.
+def meshHeightfield(fp_obj, fp_txt, mesher, rows, rowRules, primitive_y_multiplier=1.0):
+    """
+    Fill a HeightfieldMesher from the image, writing any joints as they are found.
+
+    Each row's heights and materials come from per-label lookups, and joints from
+    findJoints(), so no pixel is visited in Python. The tower height of a colour is
+    its place in the colour order (towerHeights in rowRules).
 
     Args:
-        x (int): Pixel's X-coordinate in the current row.
-        y (int): Pixel's Y-coordinate in the image.
-        row (list[int]): Flattened list of pixel data for the current row.
-        nextRow (list[int]): Flattened list of pixel data for the next row.
-        channels (int): Number of channels in the image data (e.g. 3 = RGB).
-        pattern_w (int): Width of the pixel row.
+        fp_obj: Writer for the OBJ data.
+        fp_txt: Debug text file, or None, given the same pixel map as meshRows() writes.
+        mesher (HeightfieldMesher): Mesher for this file.
+        rows: Palette labelled rows, see labelRowSource().
+        rowRules (tuple): Colour rules, see meshRows().
+        primitive_y_multiplier (float): Z scaling factor.
 
     Returns:
-        int:
-            - 0 = No joint needed
-            - 1 = Add joint (↘ diagonal from top-left to bottom-right)
-            - -1 = Add joint (↙ diagonal from top-right to bottom-left)
+        int: Number of joints written.
 
     Globals:
-        Pixel_W (int): Width of a sprite frame (used to avoid placing joints at sprite edges).
-        Pixel_H (int): Height of a sprite frame.
+        Image_MinX, Image_MaxX, Image_MinY, Image_MaxY (bounding box)
+        Pixel_W, Pixel_H (sprite gutters)
+        JOINTS_REQUIRED, pattern_w, pattern_h (joints)
+        Debug_Txt_File (bool): Write the pixel map to fp_txt.
+    """
+    selected, occupied, materials, colourCodes, towerHeights, allowedDictionary, layerColour = rowRules
 
-    Note:
-        This logic is used regardless of print mode (flat, layered, or towered) to ensure print
-        strength and prevent brittle isolated pixels with corner-only contact.
+    selected = np.asarray(selected, dtype=bool)
+    materials = np.asarray(materials)
+    multipliers = primitive_y_multiplier * np.asarray(towerHeights, dtype=float)
 
-    TODO:
-        - Make `Pixel_W` and `Pixel_H` configurable or passed in
-        - Consider returning a label/enum for joint type instead of int
-        - Add optional debug visual output to preview joints pre-print
-    """
-    isJointRequired = 0
+    gx = gridPositions(Image_MinX, Image_MaxX, Pixel_W)
+    gy = gridPositions(Image_MinY, Image_MaxY, Pixel_H)
 
-    # Check if we've Reached the boundary of the Sprite Sheet Sprite
-    if y > 0 and not (y+1) % Pixel_H:
-        return 0
-    
-    if x>0 and not (x+1) % Pixel_W:
-        return 0
+    gridMaterials = np.full((gy[-1] + 1, gx[-1] + 1), -1, dtype=materials.dtype)
+    gridMultipliers = np.ones(gridMaterials.shape)
 
-    # Not Checking last pixel as this is covered 
-    if x >= (pattern_w-1): 
-        return isJointRequired
+    jointMap = imageJoints(occupied)
+    joints = 0
 
-    a, mi, mm = getPixelFromRow(x,   row,     channels, pattern_w)
-    b, mi, mm = getPixelFromRow(x+1, row,     channels, pattern_w)
-    c, mi, mm = getPixelFromRow(x,   nextRow, channels, pattern_w)
-    d, mi, mm = getPixelFromRow(x+1, nextRow, channels, pattern_w)
+    # Columns starting a new sprite, marked '|' in the debug map
+    columns = np.arange(Image_MinX, Image_MaxX + 1)
+    gutters = ((columns > 0) & (columns % Pixel_W == 0)).tolist()
 
-    if (a > 0 and d > 0 and b <= 0 and c <= 0):
-        isJointRequired = 1
+    for y, row_y in zip(range(Image_MinY, Image_MaxY + 1), gy.tolist()):
+        row = rows.row(y)
+        labels = np.asarray(row)[Image_MinX:Image_MaxX + 1]
+        keep = selected[labels]
 
-    if (b > 0 and c > 0 and a <= 0 and d <= 0):
-        isJointRequired = -1
+        if Debug_Txt_File:
+            fp_txt.write('\n\n' if y > 0 and not y % Pixel_H else '\n')
+            fp_txt.write("".join(("|" if gutter else "") + ("*" if pixel else " ")
+                                 for gutter, pixel in zip(gutters, keep.tolist())))
 
-    return isJointRequired
+        gridMaterials[row_y, gx[keep]] = materials[labels[keep]]
+        gridMultipliers[row_y, gx[keep]] = multipliers[labels[keep]]
+
+        if JOINTS_REQUIRED and y < pattern_h - 1:
+            nextRow = rows.row(y + 1)
+
+            if jointMap is not None:
+                rowJoints = jointMap[y - Image_MinY]
+            else:
+                rowJoints = findJoints(np.array([row, nextRow]), occupied, y)[0]
+
+            for index in np.flatnonzero(rowJoints).tolist():
+                x = Image_MinX + index
+                newJoint = int(rowJoints[index])
+
+                # Coloured after the pixel on this row, no taller than the lower column
+                upper = row[x] if newJoint == 1 else row[x + 1]
+                lower = nextRow[x + 1] if newJoint == 1 else nextRow[x]
+                fp_obj.write( create_primitive(int(gx[index]), row_y + 1, 1, 1, joint_verticies, joint_faces, joint_normals, newJoint,
+                                               materials[upper], min(multipliers[upper], multipliers[lower])) )
+                joints += 1
+
+    mesher.set_heightfield(gridMaterials, gridMultipliers)
+
+    return joints
 
 #
-# And this is where all that magic happens.
-#   A real Python Programmer can probably optimise this using some Python Magic.
+# Write the runs and joints found in a range of image rows, the body of processFile()
 #
-def main(noframeRequired):
+def meshRows(fp_obj, fp_txt, mesher, rows, scanRows, rowRules, start_y=0, thisColour=1, primitive_y_multiplier=1.0,
+             joints=None):
     """
-    Execute the main program logic for layered PNG-to-OBJ conversion.
-
-    Depending on the selected mode, this function optionally generates a flat background layer,
-    sorts colour layers by count or explicit order, filters colours based on inclusion/exclusion
-    lists, and processes the image into multiple 3D printable OBJ layers.
+    Scan image rows and write a primitive for every run of selected pixels, plus any joints.
 
     Args:
-        noframeRequired (bool): If True, skips generating the flat background OBJ.
-
-    Globals:
-        WORKING_FILENAME (str): Base filename for output OBJ files.
-        Colour_Exclusion_List (list[str]): Colours to skip.
-        Colour_Process_Only_list (list[str]): Colours to force inclusion.
-        Sort_Colours_Flag (bool): Whether to sort colours by count.
-        Sort_Direction (bool): If True, sort descending; otherwise ascending.
-        FILE_COUNTER (int): Counter to track how many layers have been generated.
-        Primitive_Multiplier_Background (float): Z depth multiplier for background layer.
-        Primitive_Multiplier_Layers (float): Z depth multiplier for each coloured layer.
-        Create_Layered_File (bool): Whether to generate OBJ per colour.
-        ColoursOnSingleLayerHeight (bool): Treat all layers as same height.
-        mtl_colour_dict (dict): Maps colour hex codes to pixel counts.
+        fp_obj: Writer for the OBJ data (anything with a write() method).
+        fp_txt: Debug text file, or None.
+        mesher: GreedyRectangleMesher, VoxelSurfaceMesher etc. collecting the runs, or None.
+        rows: Palette labelled rows, see labelRowSource().
+        scanRows (range): Rows to scan.
+        rowRules (tuple): (selected, occupied, materials, colourCodes, towerHeights,
+                          allowedDictionary, layerColour) as set up by processFile().
+        start_y (int): Primitive row of the first row scanned, counting sprite gutters.
+        thisColour (int): Material of the last run written before these rows, used for joints.
+        primitive_y_multiplier (float): Z scaling factor.
+        joints (np.ndarray, optional): findJoints() for scanRows, found row by row when None.
 
     Returns:
-        None. Writes OBJ files to disk.
-    
-    TODO:
-        - Move layer selection and sorting logic to a helper
-        - Refactor background flat layer creation into `write_background_layer()`
-        - Separate print output from logic for clean testing
+        tuple: (number of primitives written, start_y after the last row, thisColour)
+
+    Globals:
+        Image_MinX, Image_MaxX, pattern_w, pattern_h (row extent)
+        Pixel_W, Pixel_H (sprite gutters)
+        JOINTS_REQUIRED, Create_Layered_File, Create_Towered_File, Debug_Txt_File
     """
-    global WORKING_FILENAME
-    global Colour_Exclusion_List
-    global Debug_Txt_File
-    global Sort_Colours_Flag
-    global Sort_Direction
-    global FILE_COUNTER
-    global Primitive_Multiplier_Background
-    global Primitive_Multiplier_Layers
-    global CurrentZOffset
+    global lastPixelFound
 
-    # Create the Background Object File 
-    # Flat Structure width and height of PNG Image.
-    obj_file = os.path.join(PATTERNS, "{}.obj".format(WORKING_FILENAME))
+    selected, occupied, materials, colourCodes, towerHeights, allowedDictionary, layerColour = rowRules
 
-    if not noframeRequired:
-        try:
-            # TODO: Add some error checking here, rather than rely on TRY/CATCH Scenarios.
-            with open(obj_file,'w') as fp_obj:
-                    fp_obj.write(create_primitive(0, 0, pattern_w, pattern_h, cube_vertices, cube_faces, cube_normals, 0, 0, Primitive_Multiplier_Background))
-                    fp_obj.flush()
-                    fp_obj.close()
-                    # Update Current Offset with multiplier requested
-                    #CurrentZOffset += (abs(CUBE_Y*Primitive_Multiplier_Background)) # Shift Vertices Up a Layer...
-                    #CurrentZOffset += (abs(CUBE_Y*Primitive_Multiplier_Background*Primitive_Multipler)) # Shift Vertices Up a Layer...
-                    CurrentZOffset += Primitive_Layer_Depth*Primitive_Multiplier_Background # Shift Vertices Up a Layer...
-                
-        except Exception as error:
-        # Bad Practice I know...
-            print(f"Failed to create Initial file: {obj_file}, error: {error}")
-            exit(0)
+    Total_Primitives = 0
+
+    # If we're adding Jointer Blocks this will be required.
+    LastRow = False
+
+    # Work our way through each row of the PNG File.
+    #for y in range(pattern_h):
+    for y in scanRows:
+        row = rows.row(y)
 
+        # Get Next Row for Jointer Block Processing.
+        # We're cheating by MOD by the PNG Height
+        # But will set the Last row flag so we don't 
+        # Process the rules for this. 
+        nextRow = rows.row(y + 1)
 
-    ToSort = {}
+        if Debug_Txt_File:
+            fp_txt.write('\n')
 
-    if len(Colour_Process_Only_list) > 0:
-        SortedColours = list(Colour_Process_Only_list)
-        for x in range(0,len(Colour_Process_Only_list)):
-            ToSort[Colour_Process_Only_list[x]] = x
-    else:
-        # Set the Sorted Colours Dictionary to Default
-        # Remove any layes that have no pixels
-        # Colour layers that are all below the Alpha Threshold will have a count of 0
-        for key in mtl_colour_dict:
-            if mtl_colour_dict[key] > 0:
-                ToSort[key] = mtl_colour_dict[key]
+        # Check If We're processing the last row of Pixels
+        if y == (pattern_h-1):
+            LastRow = True
+
+        # Joint directions for the row, checked pixel by pixel below
+        if JOINTS_REQUIRED and not LastRow:
+            if joints is not None:
+                rowJoints = joints[y - scanRows.start].tolist()
             else:
-                print(f"Removing Colour: {key} from processing, pixel count of Zero Detected (Check Alpha Threshold If Required)")
+                rowJoints = findJoints(np.array([row, nextRow]), occupied, y)[0].tolist()
 
-    # Check if we want to sort by Highest Colour Count First
-    if Sort_Colours_Flag:
-        #SortedColours = {key: val for key, val in sorted(mtl_colour_dict.items(), key = lambda ele: ele[1], reverse=Sort_Direction)}
-        SortedColours = {key: val for key, val in sorted(ToSort.items(), key = lambda ele: ele[1], reverse=Sort_Direction)}
-    else:
-        SortedColours = dict(ToSort)
+        # If we're splitting models based on pixel width and height add and extra line
+        #   And ensure we start the next primitive further down to enforce a gap in the model
+        if y >0 and not(y % Pixel_H):
+            start_y = start_y + 1
+            if Debug_Txt_File:
+                fp_txt.write('\n')
 
-    # Remove Colours from Excluded List 
-    for excluded in Colour_Exclusion_List:
-        if excluded in SortedColours:
-            del SortedColours[excluded]
+        # Iterate through the data with
+        start_x = 0
+        pixel_found = False
+        pixel_found_colour_index = 0
+        primitive_width = 0
+        primitive_x = 0
+        lastPixelFound = -1
+        LastTowerMultiplier = 1.0
+        TowerMultiplier = 1.0
+
+        #for x in range(pattern_w):
+        for x in range(Image_MinX,Image_MaxX + 1):
+            # Check if We're Adding extra space between each sprite based
+            #   on fixed pixel width per sprite.
+            if x > 0 and not(x % Pixel_W):
+                if Debug_Txt_File:
+                    fp_txt.write("|")
 
-    print("Layer Order:")
-    for nextLayer in SortedColours:
-        print(f"{nextLayer}")
+                # Close off this sprite.
+                if pixel_found:
+                    thisColour = pixel_found_colour_index
+                    if Create_Layered_File:
+                        thisColour = layerColour
+                    pixel_found = False
+                    fp_obj.write( emitPixelRun(mesher, primitive_x, start_y, primitive_width, thisColour, primitive_y_multiplier * TowerMultiplier) )
+                    Total_Primitives += 1
+                # Reset Start Position of next Sprite
+                start_x=start_x+1
+                primitive_width = 0
+                primitive_x = start_x
+                lastPixelFound = -1
 
-    print(f"       Found : {len(mtl_colour_dict)} Colours")
-    print(f"Working with : {len(SortedColours)} Colours\n")
+            # Get Pixel Label from Row
+            label = row[x]
+            mi = materials[label]
+            mm = colourCodes[label]
 
-    FILE_COUNTER +=1
+            if Create_Towered_File:
+                LastTowerMultiplier = TowerMultiplier
+                TowerMultiplier = towerHeights[label]
 
-    if Create_Layered_File:
-        while len(SortedColours) > 0:
-            nextLayer = list(SortedColours.keys())[0]
-            log(f"Processing Colour: {nextLayer}")
 
-            if nextLayer in mtl_colour_dict:
-                if ColoursOnSingleLayerHeight:
-                    resp = processFile(nextLayer, nextLayer, Colour_Exclusion_List, Primitive_Multiplier_Layers)
+            # If Pixel present then add to TXT File and create primitive.
+            # if pixel > 0 and mi==colourIndex:
+            # if mi==colourIndex:
+            #if mm in allowedDictionary:
+
+            if selected[label]:
+                if Debug_Txt_File:
+                    fp_txt.write("*")
+
+                if not pixel_found:
+                    pixel_found = True
+                    primitive_x = start_x
+                    pixel_found_colour_index = mi
                 else:
-                    resp = processFile(nextLayer, SortedColours, Colour_Exclusion_List, Primitive_Multiplier_Layers)
-                
-                if resp == False:
-                    print("Failed to process file:")
-                    exit (0)
+                    # Check we're on the same colour
+                    if mi != pixel_found_colour_index:
+                    #if mm not in allowedDictionary:
+                        if not checkNextPixelProcessingRules(allowedDictionary, mm):
+                            thisColour = pixel_found_colour_index
+                            if Create_Layered_File:
+                                thisColour = layerColour
+                            #fp_obj.write(  create_primitive(primitive_x, start_y, primitive_width, 1, cube_vertices, cube_faces, False , pixel_found_colour_index) )
+                            #fp_obj.write( create_primitive(primitive_x, start_y, primitive_width, 1, cube_vertices, cube_faces, False , thisColour, primitive_y_multiplier, Primitive_Multiplier_Layers) )
+                            fp_obj.write( emitPixelRun(mesher, primitive_x, start_y, primitive_width, thisColour, primitive_y_multiplier * LastTowerMultiplier) )
+                            primitive_width = 0
+                            Total_Primitives += 1
+                            pixel_found_colour_index = mi
+                            primitive_x = start_x
+
+                # Update Primitive Width
+                primitive_width = primitive_width + 1
+
             else:
-                print(f"Colour: {nextLayer} is not present, skipping...")
-            # Add colour to excluded list to avoid repeat processing
-            Colour_Exclusion_List+=[nextLayer]
-            del SortedColours[nextLayer]
-    else:
-        resp = processFile(list(SortedColours.keys())[0], SortedColours, Colour_Exclusion_List)
+
+                if pixel_found:
+                    thisColour = pixel_found_colour_index
+                    if Create_Layered_File:
+                        thisColour = layerColour
+                    #fp_obj.write(  create_primitive(primitive_x, start_y, primitive_width, 1, cube_vertices, cube_faces, False , pixel_found_colour_index) )
+                    fp_obj.write( emitPixelRun(mesher, primitive_x, start_y, primitive_width, thisColour, primitive_y_multiplier * LastTowerMultiplier) )
+                    pixel_found = False
+                    primitive_width = 0
+                    Total_Primitives += 1
+
+                if Debug_Txt_File:
+                    fp_txt.write(" ")
+
+            # Check if we're to add Jointer Blocks
+            if JOINTS_REQUIRED and not LastRow:
+                # Check if Blocks meet the Jointer rule
+                newJoint = rowJoints[x - Image_MinX]
+
+                if newJoint:
+                    fp_obj.write(  create_primitive(start_x, start_y + 1, 1, 1, joint_verticies, joint_faces, joint_normals, newJoint, thisColour, primitive_y_multiplier * LastTowerMultiplier) )
+                    newJoint = False
+
+
+
+            # Update X Position (Taking into account an offset if we're adding space between sprites)
+            start_x = start_x + 1
+
+        # Update to the next Y Postion and check if we have an unwritten primitive to complete
+        if pixel_found:
+            thisColour = pixel_found_colour_index
+            if Create_Layered_File:
+                thisColour = layerColour
+            fp_obj.write( emitPixelRun(mesher, primitive_x, start_y, primitive_width, thisColour, primitive_y_multiplier * TowerMultiplier) )
+            pixel_found = False
+            primitive_width = 0
+            primitive_x = 0
+            Total_Primitives += 1
+
+        # Rectangles not continued by this row are complete
+        if mesher is not None:
+            fp_obj.write( mesher.end_row() )
+
+        start_y = start_y + 1
+
+    return Total_Primitives, start_y, thisColour
 
 #
-# Load PNG File to Memory and perform some initial processing
-#   Check number of Channels, is Alpha Available, discover all colours in image
+# Row bands for --bands, each band can be written without the rows above it
 #
-def loadPNGToMemory(Filename):
+def splitRowBands(selected):
     """
-    Load a PNG file from disk into memory and validate its structure.
+    Split the rows of the bounding box into Row_Bands bands, when the file allows it.
 
-    This function reads the image file, checks the bit depth, detects alpha channel presence,
-    and assigns global pattern data required for further processing. It also triggers
-    discovery of colour layers used for slicing or object generation.
+    A band needs the primitive row (start_y) it starts on, which counts the sprite
+    gutters above it, and the colour joints would take from the run before it. That
+    run is on the last row above the band holding any selected pixel, so the band
+    rescans that row rather than everything above it.
 
     Args:
-        Filename (str): Path to the PNG file to load.
+        selected (list): Per-label flag, True for pixels written to this file.
 
     Returns:
-        bool: True if file loaded and passed basic checks; False if unsupported or missing.
+        list: (rows, seedRow, start_y) for each band, seedRow None for the first
+              band. None when the file is written in one pass.
 
     Globals:
-        pattern (list[list[int]]): Raw pixel data grid.
-        pattern_w (int): Width in pixels.
-        pattern_h (int): Height in pixels.
-        pattern_meta (dict): Metadata including planes and alpha presence.
-        channels (int): Number of channels (3 = RGB, 4 = RGBA).
-
-    TODO:
-        - Refactor to return pattern metadata instead of using globals
-        - Consider supporting more colour modes or bit depths
-        - Expand error reporting to include file format and image mode issues
+        Row_Bands (int): Set by --bands.
+        Debug_Txt_File, Indexed_Mesh_Output, Stl_Output_Mode, Model_3MF, Model_GLB:
+            Output needing the primitives in one process, no bands.
+        Streamed_Image (PNGRowStream): Streamed images are only read top to bottom.
     """
-    # Load the PNG File, Check if Valid
-    global pattern, pattern_w, pattern_h, pattern_meta, channels
+    if Row_Bands < 1 or Debug_Txt_File or Indexed_Mesh_Output or Stl_Output_Mode or \
+       Model_3MF is not None or Model_GLB is not None or Streamed_Image is not None:
+        return None
 
-    pattern, pattern_w, pattern_h, pattern_meta = load_pattern(Filename)
+    scanRows = range(Image_MinY, Image_MaxY + 1)
+    count = min(Row_Bands, len(scanRows))
 
-    # If File Wasn't Found Time to Quit
-    if pattern == None:
-        return False
-    
-    # Check we're dealing with 8 Bits per channel.
-    if pattern_meta['planes'] < 3:
-        log(f"PNG File Unsupported, convert to 8 Bits per Channel - 24 bit")
-        return False
+    if count < 1:
+        return None
 
-    # Check if We've loaded a Valid PNG File
-    if pattern is None:
-        log(f"File: {Filename} is not a valid PNG File")
-        return False
+    written = np.asarray(selected, dtype=bool)[Colour_Palette.labels[Image_MinY:Image_MaxY + 1, Image_MinX:Image_MaxX + 1]]
+    writtenRows = (np.flatnonzero(written.any(axis=1)) + Image_MinY).tolist()
 
-    # Check to see if Alpha Byte Present and set number of channels accordingly
-    alpha = pattern_meta['alpha']
-    channels = 4 if alpha else 3
+    bands = []
+    start_y = 0
+    first = Image_MinY
 
-    discoverPixelLayers()
+    for index in range(count):
+        last = Image_MinY + (len(scanRows) * (index + 1)) // count
+        position = bisect.bisect_left(writtenRows, first)
+        seedRow = writtenRows[position - 1] if position else None
 
-    return True
+        bands.append((range(first, last), seedRow, start_y))
 
-# Work out the number of colours in the PNG
-# Also the True Width/Height taking out Pixels with Alpha Channels
-def discoverPixelLayers():
+        # Same as meshRows(), one row per image row plus the gutters
+        start_y += sum(1 + (y > 0 and not y % Pixel_H) for y in range(first, last))
+        first = last
+
+    return bands
+
+def meshRowBand(job):
     """
-    Analyse the loaded PNG pattern to find the bounding box of active pixels.
+    Write one row band, in a worker process or in process.
 
-    This function calculates the minimum and maximum X/Y coordinates of all visible
-    pixels (i.e., those above the alpha cutoff) and stores them in global variables.
-    These bounds define the real sprite dimensions used for layout and scaling.
+    Args:
+        job (tuple): (band, rowRules, primitive_y_multiplier) with band an entry from
+                     splitRowBands().
 
     Returns:
-        None. Updates global image metrics in-place.
+        tuple: (OBJ text for the band, number of primitives)
+    """
+    global Relative_Obj_Indices
 
-    Globals:
-        pattern (list[list[int]]): Loaded image data.
-        pattern_w (int): Width of the loaded PNG.
-        pattern_h (int): Height of the loaded PNG.
-        channels (int): Number of channels per pixel.
-        Image_MinX (int): Minimum X of visible area.
-        Image_MaxX (int): Maximum X of visible area.
-        Image_MinY (int): Minimum Y of visible area.
-        Image_MaxY (int): Maximum Y of visible area.
-        Image_Real_Width (int): Width of bounding box.
-        Image_Real_Height (int): Height of bounding box.
+    (scanRows, seedRow, start_y), rowRules, primitive_y_multiplier = job
 
-    TODO:
-        - Support trimming transparent borders automatically
-        - Move pixel logic to a re-usable pixel scanner
-        - Consider returning a bounding box object
-    """
-    # Work our way through each row of the PNG File.
-    global Image_MinX
-    global Image_MaxX
-    global Image_MinY
-    global Image_MaxY
-    global Image_Real_Width
-    global Image_Real_Height
-    global Image_Total_Colours
-
-    minx = 999999999
-    maxx = 0
-    miny = 999999999
-    maxy = 0 
-    for y in range(pattern_h):
-        row = pattern[int(y % pattern_h)]
-
-        for x in range(pattern_w):
-            # Get Pixel from Row
-            pixel = getPixelFromRow(x, row, channels, pattern_w)[0]
-
-            # Pixel set to -1 for Transperent Pixel (Based on ALPHA Cutoff)
-            if pixel >= 0:
-                if x < minx:
-                    minx = x
-                if x > maxx:
-                    maxx = x
-                if y < miny:
-                    miny = y
-                if y > maxy:
-                    maxy = y
+    Relative_Obj_Indices = True
 
-    Image_MinX = minx
-    Image_MaxX = maxx
-    Image_MinY = miny
-    Image_MaxY = maxy
-    Image_Real_Width = maxx - minx + 1
-    Image_Real_Height = maxy - miny + 1
+    # Recover the joint colour left by the rows above
+    thisColour = 1
+    if seedRow is not None:
+        _, _, thisColour = meshRows(io.StringIO(), None, None, Colour_Palette, range(seedRow, seedRow + 1),
+                                    rowRules, 0, thisColour, primitive_y_multiplier)
 
-def displayColourInformation():
+    band = io.StringIO()
+    joints = imageJoints(rowRules[1], scanRows.start, scanRows.stop - 1)
+    primitives, _, _ = meshRows(band, None, None, Colour_Palette, scanRows, rowRules,
+                                start_y, thisColour, primitive_y_multiplier, joints)
+
+    return band.getvalue(), primitives
+
+def meshRowBands(fp_obj, rowBands, rowRules, primitive_y_multiplier):
     """
-    Print a summary of all detected colours and their associated pixel counts.
+    Write a file as row bands, meshed by Worker_Jobs processes and joined in order.
 
-    This function sorts the colours found in the loaded PNG based on how frequently
-    they occur, and displays the hex code alongside the pixel count for each.
+    Faces use negative OBJ indices, counting back from the end of their primitive, so
+    a band's text doesn't depend on how many vertices came before it and the bands
+    are written out as they are, without renumbering. The output is the same for
+    any number of bands.
+
+    Args:
+        fp_obj (ObjTextWriter): File being written.
+        rowBands (list): Bands from splitRowBands().
+        rowRules (tuple): Colour rules, see meshRows().
+        primitive_y_multiplier (float): Z scaling factor.
 
     Returns:
-        None. Output is printed to stdout.
+        int: Number of primitives written.
+    """
+    global Relative_Obj_Indices
 
-    Globals:
-        mtl_colour_dict (dict): Dictionary mapping hex colour codes to pixel usage counts.
+    jobs = [(band, rowRules, primitive_y_multiplier) for band in rowBands]
+    log(f"Meshing {len(jobs)} row bands with {Worker_Jobs} processes")
 
-    TODO:
-        - Add CSV or JSON export option for colour statistics
-        - Allow filtering or sorting by hex code
-        - Consider aligning this with layer preview generation
-    """
-    SortedColours = {key: val for key, val in sorted(mtl_colour_dict.items(), key = lambda ele: ele[1], reverse=True)}
-    
-    print("         Layer Order :")
-    print("         -------------")
-    print()
-    print("         Colour Code : Number of Pixels")
-    print("         -----------   ----------------\n")   
-    for nextLayer in SortedColours:
-        print(f"             {nextLayer} : {SortedColours[nextLayer]}")
+    pool = None
+    if Worker_Jobs > 1:
+        pool = ProcessPoolExecutor(max_workers=Worker_Jobs, initializer=initWorker,
+                                   initargs=(workerState(Colour_Palette=Colour_Palette),))
 
-    print(f"\n               Found : {len(mtl_colour_dict)} Colours")
+    Total_Primitives = 0
+    try:
+        for text, primitives in (pool.map if pool is not None else map)(meshRowBand, jobs):
+            fp_obj.write(text)
+            Total_Primitives += primitives
+    finally:
+        Relative_Obj_Indices = False
+        if pool is not None:
+            pool.shutdown()
 
-    
-def processFile(colourMatch, allowedDictionary, excludedColours, primitive_y_multiplier=1.0):
+    return Total_Primitives
+
+def processFile(colourMatch, allowedDictionary, excludedColours, primitive_y_multiplier=1.0, layerRuns=None):
     """
     Process a single colour or sprite into an OBJ file, writing its 3D geometry.
 
@@ -2358,22 +6454,26 @@ def processFile(colourMatch, allowedDictionary, excludedColours, primitive_y_mul
         allowedDictionary (dict): Colour keys to allow for inclusion.
         excludedColours (list): List of hex codes to exclude from processing.
         primitive_y_multiplier (float): Y scaling factor for vertical print depth.
+        layerRuns (list, optional): This layer's runs and joints from scanLayerRuns(),
+                                    written instead of scanning the image again.
 
     Returns:
         bool: True if file written successfully, False on error.
 
     Globals:
-        pattern, pattern_w, pattern_h (image grid data)
+        Colour_Palette, pattern_w, pattern_h (label image and material table)
         Image_MinX, Image_MaxX, Image_MinY, Image_MaxY (bounding box)
         mtl_colour_dict, mtl_current_index (material data)
         Debug_Txt_File, WORKING_FILENAME, FILE_COUNTER (output state)
         Create_Towered_File, Create_Layered_File, ColoursOnSingleLayerHeight (mode flags)
-        cube_vertices, cube_faces, cube_normals (OBJ geometry templates)
-        joint_verticies, joint_faces, joint_normals (optional joint templates)
+        Greedy_Meshing (merge runs into rectangles via GreedyRectangleMesher)
+        Surface_Meshing (exterior faces only via VoxelSurfaceMesher)
+        Contour_Meshing (traced, extruded outlines via ContourExtrusionMesher)
+        Create_Towered_File (height map surface via HeightfieldMesher, unless --greedy)
+        Row_Bands, Worker_Jobs (row bands written by meshRowBands())
         CurrentZOffset, Primitive_Layer_Depth, Primitive_Initial_Layer_Depth (layering)
 
     TODO:
-        - Break out inner row loop into reusable `processRow()` helper
         - Refactor joint-check logic into `applyDiagonalJointsIfNeeded()`
         - Use dataclass or config object for global state
         - Add verbose mode and structured logging
@@ -2405,15 +6505,10 @@ def processFile(colourMatch, allowedDictionary, excludedColours, primitive_y_mul
     global mtl_filename
     global FILE_COUNTER
 
-    global lastPixelFound
-
     # Define output Filenames based on Input, creating
     #   an  OBJ file with 3D Mesh Details
     #       TXT file with pixel data as seen
 
-    TowerMultiplier = 1.0
-    LastTowerMultiplier = 1.0
-
     if Create_Layered_File:
         obj_file = os.path.join(PATTERNS, "{}_Y{}{}.obj".format(WORKING_FILENAME,FILE_COUNTER,str(colourMatch)))
     else:
@@ -2422,11 +6517,48 @@ def processFile(colourMatch, allowedDictionary, excludedColours, primitive_y_mul
     if Debug_Txt_File:
         txt_file = os.path.join(PATTERNS, "{}_Y{}{}.txt".format(WORKING_FILENAME,FILE_COUNTER,str(colourMatch)))
 
-    # If we're adding Jointer Blocks this will be required.
-    LastRow = False
+    layerColour = mtl_colour_index.get(colourMatch, -1) if Create_Layered_File else None
+    towerHeights = None
+    rowRules = None
+
+    # Replayed layers never look at the image (or palette), which --jobs workers don't have
+    if layerRuns is None:
+        # Evaluate the colour rules once per palette colour, the pixel loop then
+        # only needs a list lookup by label.
+        selected, occupied = selectLayerLabels(allowedDictionary, excludedColours, Colour_Exclusion_List)
+
+        materials = Colour_Palette.materials
+        colourCodes = Colour_Palette.hex
+
+        if Create_Towered_File:
+            towerOrder = {code: index + 1.0 for index, code in enumerate(allowedDictionary)}
+            towerHeights = [towerOrder.get(code, 0.01) for code in colourCodes]
+
+        # Rows come from the in-memory label image, or a streamed two row window
+        rows = labelRowSource()
+
+        rowRules = (selected, occupied, materials, colourCodes, towerHeights, allowedDictionary, layerColour)
+
+    # Runs are either written as found, merged into rectangles first,
+    # collected into a single exterior surface, or traced and extruded.
+    # Towers are meshed from their height map as a single surface.
+    if Contour_Meshing:
+        mesher = ContourExtrusionMesher(Path(obj_file).stem)
+    elif Create_Towered_File and layerRuns is None and not Greedy_Meshing:
+        mesher = HeightfieldMesher(Path(obj_file).stem)
+    elif Surface_Meshing:
+        mesher = VoxelSurfaceMesher(Path(obj_file).stem)
+    elif Greedy_Meshing:
+        mesher = GreedyRectangleMesher()
+    else:
+        mesher = None
+
+    # Plain runs and joints keep next to no state between rows, so the file may be split into bands
+    rowBands = splitRowBands(selected) if rowRules is not None and mesher is None else None
 
     # open files for Writing, Note we're not checking their presence as we're overwriting/creating
     #   from scratch each time.
+    fp_txt = None
     try:
         if Debug_Txt_File:
            fp_txt=open(txt_file,'w')
@@ -2437,7 +6569,7 @@ def processFile(colourMatch, allowedDictionary, excludedColours, primitive_y_mul
 
     try:
         # TODO: Add some error checking here, rather than relay on TRY/CATCH Scenarios.
-        with open(obj_file,'w') as fp_obj:
+        with ObjTextWriter(None if Stl_Output_Mode == "only" else obj_file) as fp_obj:
             log(f"Creating Object File: {obj_file}")
                 # Create Header for OBJ File
             header = (
@@ -2449,167 +6581,43 @@ def processFile(colourMatch, allowedDictionary, excludedColours, primitive_y_mul
             )
 
             fp_obj.write( header )
+            startMeshExports(obj_file)
+
+            # The surface and contour meshers weld their own vertices, joints stay as they are
+            if not (Surface_Meshing or Contour_Meshing):
+                fp_obj.write( startIndexedMesh(Path(obj_file).stem) )
+
+            # Layers found by the single pass in main() are written from their runs,
+            # large flat files may be split into row bands (--bands)
+            if layerRuns is not None:
+                Total_Primitives = replayLayerRuns(fp_obj, mesher, layerRuns, layerColour, primitive_y_multiplier)
+            elif isinstance(mesher, HeightfieldMesher):
+                Total_Primitives = meshHeightfield(fp_obj, fp_txt, mesher, rows, rowRules, primitive_y_multiplier)
+            elif rowBands:
+                Total_Primitives = meshRowBands(fp_obj, rowBands, rowRules, primitive_y_multiplier)
+            else:
+                Total_Primitives, _, _ = meshRows(fp_obj, fp_txt, mesher, rows, range(Image_MinY, Image_MaxY + 1),
+                                                  rowRules, 0, thisColour, primitive_y_multiplier, imageJoints(occupied))
 
-            # Set Current Y Position, we're only using this for situations where sprite files
-            #   make it difficult to seperate the blocks post conversion, so we add a space
-            #   between the primitives on the 3D OBJ File
-            start_y = 0
-
-            # Work our way through each row of the PNG File.
-            #for y in range(pattern_h):
-            for y in range(Image_MinY, Image_MaxY + 1):
-                row = pattern[int(y % pattern_h)]
-                
-                # Get Next Row for Jointer Block Processing.
-                # We're cheating by MOD by the PNG Height
-                # But will set the Last row flag so we don't 
-                # Process the rules for this. 
-                nextRow = pattern[int((y+1) % pattern_h)]
-
-                if Debug_Txt_File:
-                    fp_txt.write('\n')
-
-                # Check If We're processing the last row of Pixels
-                if y == (pattern_h-1):
-                    LastRow = True
-
-                # If we're splitting models based on pixel width and height add and extra line
-                #   And ensure we start the next primitive further down to enforce a gap in the model
-                if y >0 and not(y % Pixel_H):
-                    start_y = start_y + 1
-                    if Debug_Txt_File:
-                        fp_txt.write('\n')
-                
-                # Iterate through the data with
-                start_x = 0
-                pixel_found = False
-                pixel_found_colour_index = 0
-                primitive_width = 0
-                primitive_x = 0
-                lastPixelFound = -1
-                LastTowerMultiplier = 1.0
-                TowerMultiplier = 1.0
-
-                #for x in range(pattern_w):
-                for x in range(Image_MinX,Image_MaxX + 1):
-                    # Check if We're Adding extra space between each sprite based
-                    #   on fixed pixel width per sprite.
-                    if x > 0 and not(x % Pixel_W):
-                        if Debug_Txt_File:
-                            fp_txt.write("|")
-
-                        # Close off this sprite.
-                        if pixel_found:
-                            thisColour = pixel_found_colour_index
-                            if Create_Layered_File:
-                                thisColour = list(mtl_colour_dict).index(colourMatch)
-                            pixel_found = False
-                            fp_obj.write( create_primitive(primitive_x, start_y, primitive_width, 1, cube_vertices, cube_faces, cube_normals, False, thisColour, primitive_y_multiplier * TowerMultiplier) )
-                            Total_Primitives += 1
-                        # Reset Start Position of next Sprite
-                        start_x=start_x+1
-                        primitive_width = 0
-                        primitive_x = start_x
-                        lastPixelFound = -1
-
-                    # Get Pixel from Row
-                    pixel,mi, mm = getPixelFromRow(x, row, channels, pattern_w)
-
-                    if Create_Towered_File:
-                        LastTowerMultiplier = TowerMultiplier
-                        if mm in allowedDictionary:
-                            TowerMultiplier = list(allowedDictionary.keys()).index(mm) + 1.0
-                        else:
-                            TowerMultiplier = 0.01
-
-
-                    # If Pixel present then add to TXT File and create primitive.
-                    # if pixel > 0 and mi==colourIndex:
-                    # if mi==colourIndex:
-                    #if mm in allowedDictionary:
-
-                    if checkProcessingRules(allowedDictionary, mm, excludedColours, pixel):
-                        if Debug_Txt_File:
-                            fp_txt.write("*")
-
-                        if not pixel_found:
-                            pixel_found = True
-                            primitive_x = start_x
-                            pixel_found_colour_index = mi
-                        else:
-                            # Check we're on the same colour
-                            if mi != pixel_found_colour_index:
-                            #if mm not in allowedDictionary:
-                                if not checkNextPixelProcessingRules(allowedDictionary, mm):
-                                    thisColour = pixel_found_colour_index
-                                    if Create_Layered_File:
-                                        thisColour = list(mtl_colour_dict).index(colourMatch)
-                                    #fp_obj.write(  create_primitive(primitive_x, start_y, primitive_width, 1, cube_vertices, cube_faces, False , pixel_found_colour_index) )
-                                    #fp_obj.write( create_primitive(primitive_x, start_y, primitive_width, 1, cube_vertices, cube_faces, False , thisColour, primitive_y_multiplier, Primitive_Multiplier_Layers) )
-                                    fp_obj.write( create_primitive(primitive_x, start_y, primitive_width, 1, cube_vertices, cube_faces, cube_normals, False , thisColour, primitive_y_multiplier * LastTowerMultiplier))
-                                    primitive_width = 0
-                                    Total_Primitives += 1
-                                    pixel_found_colour_index = mi
-                                    primitive_x = start_x
-
-                        # Update Primitive Width
-                        primitive_width = primitive_width + 1
-
-                    else:
-
-                        if pixel_found:
-                            thisColour = pixel_found_colour_index
-                            if Create_Layered_File:
-                                thisColour = list(mtl_colour_dict).index(colourMatch)
-                            #fp_obj.write(  create_primitive(primitive_x, start_y, primitive_width, 1, cube_vertices, cube_faces, False , pixel_found_colour_index) )
-                            fp_obj.write(  create_primitive(primitive_x, start_y, primitive_width, 1, cube_vertices, cube_faces, cube_normals, False , thisColour, primitive_y_multiplier * LastTowerMultiplier) )
-                            pixel_found = False
-                            primitive_width = 0
-                            Total_Primitives += 1
-
-                        if Debug_Txt_File:
-                            fp_txt.write(" ")
-
-                    # Check if we're to add Jointer Blocks
-                    if JOINTS_REQUIRED and not LastRow:
-                        # Check if Blocks meet the Jointer rule
-                        newJoint = CheckJointRequired(x, y, row, nextRow, channels, pattern_w)
-
-                        if newJoint:
-                            fp_obj.write(  create_primitive(start_x, start_y + 1, 1, 1, joint_verticies, joint_faces, joint_normals, newJoint, thisColour, primitive_y_multiplier * LastTowerMultiplier) )
-                            newJoint = False
-
-
-
-                    # Update X Position (Taking into account an offset if we're adding space between sprites)
-                    start_x = start_x + 1
-
-                # Update to the next Y Postion and check if we have an unwritten primitive to complete
-                if pixel_found:
-                    thisColour = pixel_found_colour_index
-                    if Create_Layered_File:
-                        thisColour = list(mtl_colour_dict).index(colourMatch)
-                    fp_obj.write( create_primitive(primitive_x, start_y, primitive_width, 1, cube_vertices, cube_faces, cube_normals, False, thisColour, primitive_y_multiplier * TowerMultiplier) )
-                    pixel_found = False
-                    primitive_width = 0
-                    primitive_x = 0
-                    Total_Primitives += 1
-
-                start_y = start_y + 1
-
-            # Write and Flush the Object File
-            if primitive_width > 0:
-                
-                fp_obj.write(  create_primitive(start_x, start_y, primitive_width, 1, cube_vertices, cube_faces, cube_normals, False , 0, primitive_y_multiplier * TowerMultiplier) )
+            if mesher is not None:
+                fp_obj.write( mesher.finish() )
+                log(mesher.summary())
+                Total_Primitives = mesher.primitives
 
+            fp_obj.write( finishIndexedMesh() )
             fp_obj.write(f"#\n# Total Primitives Created: {Total_Primitives}\n#\n")
+            finishMeshExports()
 
+            fp_obj.flush()
+            log(fp_obj.summary())
             log(f"Successfully Created Object File: {obj_file}\n")
 
     except Exception as error:
     # Bad Practice I know...
        print(f"Failed to write file: {obj_file}",obj_file)
        print(f"Exception: {error}")
+       finishIndexedMesh()
+       finishMeshExports(write=False)
        return False
     
 
@@ -2732,14 +6740,14 @@ def load_pattern(pattern_name):
 
     This is used for frame overlays, template elements, or repeatable embedded
     components. The function attempts to read the file, parse its PNG metadata,
-    and convert the result to a usable list.
+    and decode the rows straight into a preallocated PNGImage array.
 
     Args:
         pattern_name (str): Name of the pattern PNG file (without extension).
 
     Returns:
         tuple:
-            - pattern (list): Raw pixel data from PNG
+            - image (PNGImage): Decoded pixel data from PNG
             - pattern_w (int): Width of the pattern
             - pattern_h (int): Height of the pattern
             - pattern_meta (dict): PNG metadata (e.g. bit depth, channels)
@@ -2756,11 +6764,22 @@ def load_pattern(pattern_name):
 
     log(f"Attempting to pre-process file: {pattern_file}")
     if os.path.isfile(pattern_file):
-        r = png.Reader(file=open(pattern_file, 'rb'))
-        pattern_w, pattern_h, pattern, pattern_meta = r.read()
-        pattern = list(pattern)
+        r = png.Reader(filename=pattern_file)
+        pattern_w, pattern_h, rows, pattern_meta = r.read()
+
+        if pattern_meta['bitdepth'] > 8:
+            log("PNG File Unsupported, convert to 8 Bits per Channel: {}".format(pattern_file))
+            return None, 0, 0, None
+
+        # Decode row by row into a single contiguous array
+        planes = pattern_meta['planes']
+        pixels = np.empty((pattern_h, pattern_w * planes), dtype=np.uint8)
+        for y, row in enumerate(rows):
+            pixels[y] = row
+
+        image = PNGImage(pixels.reshape(pattern_h, pattern_w, planes), ALPHACUTOFF)
         log("Loaded PNG file: {}".format(pattern_file))
-        return pattern, pattern_w, pattern_h, pattern_meta
+        return image, pattern_w, pattern_h, pattern_meta
     else:
         log("Invalid PNG file: {}".format(pattern_file))
         return None, 0, 0, None
@@ -3160,7 +7179,7 @@ def ApplyPNGColoursToParametricObjects(vertDict, offsetX, offsetY, allowedDictio
         None. Modifies vertDict in-place by updating the colour/material index in entry [3].
 
     Globals:
-        pattern, pattern_h, pattern_w (image data)
+        Colour_Palette (ColourPalette): Label image and material table.
         channels (int): Number of colour channels in the PNG.
         Image_MinX, Image_MaxX, Image_MinY, Image_MaxY: Bounding box.
         Pixel_W, Pixel_H: Used for sprite sheet separation logic.
@@ -3170,9 +7189,12 @@ def ApplyPNGColoursToParametricObjects(vertDict, offsetX, offsetY, allowedDictio
         - Replace `print` placeholder with meaningful logging
         - Consider modularising sprite-spacing logic
     """
+    # Evaluate the processing rules once per palette colour
+    selected, _ = selectLayerLabels(allowedDictionary, excludedColours, Colour_Exclusion_List)
+
     start_y = offsetY
     for y in range(Image_MinY, Image_MaxY + 1):
-        row = pattern[int(y % pattern_h)]
+        row = Colour_Palette.row(y)
 
         # If we're splitting models based on pixel width and height add and extra line
         #   And ensure we start the next primitive further down to enforce a gap in the model
@@ -3189,12 +7211,11 @@ def ApplyPNGColoursToParametricObjects(vertDict, offsetX, offsetY, allowedDictio
             if x > 0 and not(x % Pixel_W):
                 start_x += 1
 
-            # Get Pixel from Row
-            pixel,mi, mm = getPixelFromRow(x, row, channels, pattern_w)
+            # Get Pixel Label from Row
+            label = row[x]
 
-            if checkProcessingRules(allowedDictionary, mm, excludedColours, pixel):
-                if pixel > 0:
-                    print
+            if selected[label]:
+                mi = Colour_Palette.materials[label]
                 myKey = f"{(x+offsetX):04d}:{(y+offsetY):04d}"
                 if myKey in vertDict:
                     VertexData = vertDict[myKey]
@@ -3574,6 +7595,11 @@ def process_SVG_File(args):
     global SVG_ILLUSION_COLOUR_TABLE
     global ILLUSION_TYPE_CIRCLE
     global ILLUSION_MAX_STREAK
+    global SVG_USE_SYMBOLS
+    global SVG_MERGE_PATHS
+    global SVG_GRID_PATTERN
+    global ILLUSION_SEED
+    global ILLUSION_CACHE_FOLDER
 
     if len(args.illusioncolourtable) == 4:
         SVG_ILLUSION_COLOUR_TABLE = args.illusioncolourtable
@@ -3585,6 +7611,8 @@ def process_SVG_File(args):
         SVG_ILLUSION_COLOUR_TABLE = SVG_COLOUR_SETS[args.colourset % len(SVG_COLOUR_SETS)]
 
     ILLUSION_MAX_STREAK = args.maxstreak if args.maxstreak > 0 else ILLUSION_MAX_STREAK
+    ILLUSION_SEED = args.seed
+    ILLUSION_CACHE_FOLDER = args.illusioncache
 
     if len(args.outfilename[0]) > 0:
         outfilename = os.path.join("{}.svg".format(Path(''.join(args.outfilename)).with_suffix('')))
@@ -3617,6 +7645,10 @@ def process_SVG_File(args):
         else:
             print(f"               Illusion Type : Circular")
         print(f"     Maximum Illusion Streak : {ILLUSION_MAX_STREAK}")
+        if ILLUSION_SEED is not None:
+            print(f"               Illusion Seed : {ILLUSION_SEED}")
+        if ILLUSION_CACHE_FOLDER:
+            print(f"       Illusion Cache Folder : {ILLUSION_CACHE_FOLDER}")
         print(f"   Minimum Border to Add PNG : {args.minimumborder}")
         print(f"          Minimum Grid Width : {args.minimumgridwidth}")
         print(f"         Minimum Grid Height : {args.minimumgridheight}")
@@ -3624,43 +7656,67 @@ def process_SVG_File(args):
             print(f"        Colour Set Requested : {args.colourset % len(SVG_COLOUR_SETS)}")
 
     print(f"              Create Outline : {args.outlineOnly}")
+    if args.svguse:
+        print(f"      Reuse Tiles with <use> : {args.svguse}")
+    if args.svgmerge:
+        print(f"  Merge PNG Colours to Paths : {args.svgmerge}")
+    if args.svgpattern:
+        print(f"      Grid as <pattern> Tile : {args.svgpattern}")
     print(f"             Output Filename : {outfilename}")
     print(f"Open SVG File after creation : {args.svgopen}\n")
 
     ILLUSION_TYPE_CIRCLE = args.illusioncircle
+    SVG_USE_SYMBOLS = args.svguse
+    SVG_MERGE_PATHS = args.svgmerge
+    SVG_GRID_PATTERN = args.svgpattern
 
-    if args.frame400:
-        # Create an SVG File for The Range Frames with 400mm internal size and 405mm external size.
-        # Creates the grid of pieces with PNG Image pieces represented by circles
-        # and adds the registration marks for cutting mountboard using a Maped Ruler and Cutter (60mm offsets)
-        create_svg_frame400(args.outlineOnly, args.svgaddpng,
-                            args.svg_radius_percent_x,
-                            args.svg_radius_percent_y)
+    blocks_horizontal = max((args.minimumborder * 2) + Image_Real_Width, args.minimumgridwidth)
+    blocks_vertical = max((args.minimumborder * 2) + Image_Real_Height, args.minimumgridheight)
 
+    # The canvas size is written before any content, so work it out first
+    if args.frame400:
+        multiplier, rect_width, rect_height, offset = frame400_layout()
+        svg_canvas_for_illusion(multiplier, multiplier, args.svgaddpng, offset, offset, rect_width, rect_height)
     elif args.illusion:
-        # Create the Optical Illusion Images using two contrasting colours for the tiles
-        # and two contrasting tiles for the PNG Image
-
-        # Create the Optical Illusion, using
-        #   Number of block horizontal, vertical
-        #   Draw Outlines Only
-        #   Use the Real Colours of the PNG Image
-        #   Add the PNG to the SVG File (False if you just want to create the illusion without the image.)
-        blocks_horizontal = max((args.minimumborder * 2) + Image_Real_Width, args.minimumgridwidth)
-        blocks_vertical = max((args.minimumborder * 2) + Image_Real_Height, args.minimumgridheight)
-        create_svg(blocks_horizontal, blocks_vertical,
-                    args.outlineOnly,
-                    not args.usegridcolours,
-                    args.svgaddpng ,
-                    0.0, 0.0,
-                    args.svg_pixel_width, args.svg_pixel_height,
-                    args.svg_radius_percent_x, args.svg_radius_percent_y)
+        svg_canvas_for_illusion(blocks_horizontal, blocks_vertical, args.svgaddpng,
+                                0.0, 0.0, args.svg_pixel_width, args.svg_pixel_height)
     else:
-        # Simply create an SVG Block File from a PNG no other features.
-        print ("Creating SVG File from PNG: ")
-        create_svg_from_PNG(args.outlineOnly, not args.usegridcolours,
-                            args.svg_pixel_width,args.svg_pixel_height,
-                            args.svg_radius_percent_x, args.svg_radius_percent_y)
+        svg_canvas_for_PNG(args.svg_pixel_width, args.svg_pixel_height)
+
+    def render():
+        if args.frame400:
+            # Create an SVG File for The Range Frames with 400mm internal size and 405mm external size.
+            # Creates the grid of pieces with PNG Image pieces represented by circles
+            # and adds the registration marks for cutting mountboard using a Maped Ruler and Cutter (60mm offsets)
+            create_svg_frame400(args.outlineOnly, args.svgaddpng,
+                                args.svg_radius_percent_x,
+                                args.svg_radius_percent_y)
+
+        elif args.illusion:
+            # Create the Optical Illusion Images using two contrasting colours for the tiles
+            # and two contrasting tiles for the PNG Image
+
+            # Create the Optical Illusion, using
+            #   Number of block horizontal, vertical
+            #   Draw Outlines Only
+            #   Use the Real Colours of the PNG Image
+            #   Add the PNG to the SVG File (False if you just want to create the illusion without the image.)
+            create_svg(blocks_horizontal, blocks_vertical,
+                        args.outlineOnly,
+                        not args.usegridcolours,
+                        args.svgaddpng ,
+                        0.0, 0.0,
+                        args.svg_pixel_width, args.svg_pixel_height,
+                        args.svg_radius_percent_x, args.svg_radius_percent_y)
+        else:
+            # Simply create an SVG Block File from a PNG no other features.
+            print ("Creating SVG File from PNG: ")
+            create_svg_from_PNG(args.outlineOnly, not args.usegridcolours,
+                                args.svg_pixel_width,args.svg_pixel_height,
+                                args.svg_radius_percent_x, args.svg_radius_percent_y)
+
+    # Create the SVG File, streaming each group to it as it is generated.
+    svg_savefile(outfilename, render)
 
     # Report the Stats
     print(f'     Total PNG Pixels : {SVG_PNG_PIXEL_COUNT}')
@@ -3673,10 +7729,6 @@ def process_SVG_File(args):
     if SVG_DARK_COUNT:
         print(f'   Total Dark Inserts : {SVG_DARK_COUNT}')
 
-    # Create the Final SVG File.
-
-    svg_savefile(outfilename)
-
     # Open file automatically?
     if args.svgopen:
         try:
@@ -3743,12 +7795,29 @@ if __name__ == "__main__":
     parser.add_argument("-ild","--initialLayerDepth",help="First Layer depth of OBJ in mm (Affects Multipliers)",type=float,default=0.0)
     parser.add_argument("-nf","--noframe",help="Don't Generate a Bounding Frame",action="store_true", default=False)
     parser.add_argument("-sz","--startZ",help="Initial Z Height Starting Position",type=float,default=0.0)
+    parser.add_argument("-ct","--colourtolerance",help="Match --processcolours and --excludelist to the nearest image colour within this distance, default 0 (exact)",type=float,default=0.0)
+    parser.add_argument("-cm","--colourmatch",help="Distance used by --colourtolerance, RGB (0-441) or CIE76 delta E",choices=["rgb","deltae"],default="rgb")
+    parser.add_argument("-mc","--maxcolours",help="Reduce the image to at most this many colours (median cut) before finding layers",type=int,default=0)
+    parser.add_argument("-st","--stream",help="Decode the PNG row by row when creating OBJ files, for images too large to hold in memory",action="store_true", default=False)
+    parser.add_argument("-im","--indexedmesh",help="Weld each OBJ into one mesh with shared vertices and a single normal table, much smaller files. Only removes duplicates, internal walls stay so the mesh is not manifold, use --surface for that",action="store_true", default=False)
+
+    # How runs of pixels are turned into geometry, boxes per run by default
+    group3=parser.add_mutually_exclusive_group()
+    group3.add_argument("-gm","--greedy",help="Cover each OBJ with large same-colour rectangles instead of a box per run, far fewer primitives for solid areas",action="store_true", default=False)
+    group3.add_argument("-vs","--surface",help="Write only the outside faces of each OBJ as a single watertight mesh (replaces --indexedmesh for the layers)",action="store_true", default=False)
+    group3.add_argument("-ce","--contour",help="Trace the outline of each colour region and extrude it as a polygon (replaces --indexedmesh)",action="store_true", default=False)
+    parser.add_argument("-stl","--stl",help="Write a binary STL for every OBJ (layer and frame), 'only' skips the OBJ files",nargs="?",choices=["also","only"],const="also",default=None)
+    parser.add_argument("-3mf","--threemf",help="Also write every OBJ of the run into one multi-material 3MF file, one object per layer",action="store_true", default=False)
+    parser.add_argument("-glb","--glb",help="Also write every OBJ of the run into one binary glTF for previews, 'instanced' writes pixel boxes as instances of one cube",nargs="?",choices=["mesh","instanced"],const="mesh",default=None)
+    parser.add_argument("-jobs","--jobs",help="Write --layered files (or --bands) with this many processes",type=int,default=1)
+    parser.add_argument("-bands","--bands",help="Mesh flat files in this many row bands, written with relative OBJ indices",type=int,default=0)
+    parser.add_argument("-bb","--boundingbox",help="Only process pixels inside this box (in pixels), everything outside is treated as transparent",nargs=4,type=int,metavar=("MINX","MINY","MAXX","MAXY"),default=None)
 
     # First Mutually Excluded Group of Flags
     group=parser.add_mutually_exclusive_group()
     group.add_argument("-fl","--flat",help="Create a Single OBJ File with all colour information",action="store_true", default=True)
     group.add_argument("--layered",help="Create a Multi Layer Set of files for each colour code",action="store_true",default=False)
-    group.add_argument("--tower",help="Create a single layer, different heights based on colour order",action="store_true",default=False)
+    group.add_argument("--tower",help="Create a single layer, different heights based on colour order, meshed as one heightfield surface",action="store_true",default=False)
     # Parametric Testing
     parser.add_argument("-pt","--parametricTest",help="Testing a new idea",action="store_true", default=False)
     # SVG Files
@@ -3770,6 +7839,9 @@ if __name__ == "__main__":
     parser.add_argument("-outline","--outlineOnly",help="Draw Outline only ready for machining",action="store_true",default=False)
     parser.add_argument("-svgaddpng","--svgaddpng",help="Add loaded PNG to SVG Output",action="store_true",default=False)
     parser.add_argument("-svgopen",help="Open SVG File with Default Application",action="store_true",default=False)
+    parser.add_argument("-svgmerge","--svgmerge",help="Draw the PNG as one <path> per colour, traced outlines with rounded corners or row runs when the corners are square",action="store_true",default=False)
+    parser.add_argument("-svguse","--svguse",help="Define each distinct tile once and place copies of it with <use>, much smaller SVG files",action="store_true",default=False)
+    parser.add_argument("-svgpattern","--svgpattern",help="Draw the illusion grid as one rectangle filled with a repeating <pattern> tile, ignored with --outline",action="store_true",default=False)
     parser.add_argument("-ict","--illusioncolourtable",help="Colour Table for Optical Illusion",nargs=4,type=str, default=["#3F53FF","#020078","#D93C41","#781314"])
     parser.add_argument("-mb","--minimumborder", help="Minimum Border to add to PNG Image",type=int,default=0)
     parser.add_argument("-mgw","--minimumgridwidth", help="Minimum Border to add to PNG Image",type=int,default=4)
@@ -3777,6 +7849,8 @@ if __name__ == "__main__":
     parser.add_argument("-ilc","--illusioncircle", help="Illusion type circle not diagonals",action="store_true",default=False)
     parser.add_argument("-cset","--colourset", help="Which Colour Set to Use for Illusion",type=int,default=-1)
     parser.add_argument("-stmax","--maxstreak", help="Set Maximum Colour Run Streak for Optical Illusion",type=int,default=-1)
+    parser.add_argument("-seed","--seed", help="Seed for the Optical Illusion pattern, the same seed gives the same pattern",type=int,default=None)
+    parser.add_argument("-icache","--illusioncache", help="Folder to keep seeded Optical Illusion patterns in for reuse by later runs",type=str,default="")
     
     group2=parser.add_mutually_exclusive_group()
     group2.add_argument("-urc","--userealcolours", help="Use PNG Actual Colours?",action="store_true",default=True)
@@ -3807,6 +7881,18 @@ if __name__ == "__main__":
     Create_Layered_File = args.flat
     Create_Layered_File = args.layered
     Create_Towered_File = args.tower
+    Greedy_Meshing = args.greedy
+    Indexed_Mesh_Output = args.indexedmesh
+    Surface_Meshing = args.surface
+    Contour_Meshing = args.contour
+    Stl_Output_Mode = args.stl
+    Model_3MF = ThreeMFPackage() if args.threemf else None
+    Model_GLB = GLBPackage(args.glb == "instanced") if args.glb else None
+    Worker_Jobs = max(1, args.jobs)
+    Max_Colours = max(0, args.maxcolours)
+    Colour_Tolerance = max(0.0, args.colourtolerance)
+    Colour_Match_Metric = args.colourmatch
+    Row_Bands = max(0, args.bands)
 
     ALPHACUTOFF = args.alphacutoff
 
@@ -3831,8 +7917,13 @@ if __name__ == "__main__":
 
 
     # First Stage, Get Colours In Memory first and see if we have something
-    # Attempt to Load the PNG to memory.
-    if loadPNGToMemory(args.filename) == False:
+    # Attempt to Load the PNG to memory, or stream it when creating OBJ files.
+    if args.stream and ThreeD and not args.parametricTest:
+        loaded = loadPNGAsStream(args.filename, args.boundingbox)
+    else:
+        loaded = loadPNGToMemory(args.filename, args.boundingbox)
+
+    if loaded == False:
         print(f"Unable to open file: {args.filename}.png")
         exit (0)
     
@@ -3855,6 +7946,8 @@ if __name__ == "__main__":
         print(f"Only Processing the following colours: {args.processcolours}")
         Colour_Process_Only_list = args.processcolours
 
+    resolveColourSelectors(Colour_Palette)
+
     Debug_Txt_File = args.debug
 
     Pixel_W = args.spriteWidth
@@ -3877,6 +7970,14 @@ if __name__ == "__main__":
     print(f"     Joints Requested : {JOINTS_REQUIRED}\n Create Material File : {CREATE_MTL_FILE}")
     print(f" Reverse Sort Colours : {Sort_Colours_Flag}")
     print(f"Create Flat File Only : {not Create_Layered_File}" )
+    if Greedy_Meshing:
+        print(f"       Greedy Meshing : {Greedy_Meshing}")
+    if Indexed_Mesh_Output:
+        print(f"  Indexed Mesh Output : {Indexed_Mesh_Output}")
+    if Surface_Meshing:
+        print(f"      Surface Meshing : {Surface_Meshing}")
+    if Contour_Meshing:
+        print(f"    Contour Extrusion : {Contour_Meshing}")
     print(f"         Alpha Cutoff : {ALPHACUTOFF}")
 
 
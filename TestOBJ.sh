@@ -65,4 +65,21 @@ PARMS="--processcolours #bf00bf #bdbdbd -m -outfile $OUTDir/JSWTest10 -nf --laye
 
 
 # Test Basic PNG To OBJ Functionality Background Height
-./PNG2ObjV3.py $PNGTestFile2 -outfile $OUTDir/JSWTest13 --mtl -bgh 2.0 -lm 5.0  --layered
\ No newline at end of file
+./PNG2ObjV3.py $PNGTestFile2 -outfile $OUTDir/JSWTest13 --mtl -bgh 2.0 -lm 5.0  --layered
+
+# Test Surface Meshing with Sprite Gutters, every edge of a closed mesh is used
+# once in each direction
+./PNG2ObjV3.py $PNGTestFile3 -outfile $OUTDir/JSWTest14 --mtl -vs -sw 4 -sh 4 --layered
+python3 - $OUTDir/JSWTest14*.obj <<'CHECK'
+import sys
+from collections import Counter
+
+for name in sys.argv[1:]:
+    edges = Counter()
+    for line in open(name):
+        if line.startswith("f "):
+            face = [int(corner.split("/")[0]) for corner in line.split()[1:]]
+            edges.update(zip(face, face[1:] + face[:1]))
+    open_edges = sum(1 for (a, b), count in edges.items() if count != 1 or edges[(b, a)] != 1)
+    print(f"{name}: {'closed' if not open_edges else f'{open_edges} open edges'}")
+CHECK